@@ -0,0 +1,371 @@
+"""
+Offline benchmarks of the EmbedPython pipeline.
+
+Synthetic embedded distributions, Python source tarballs and a package index
+are served by a local HTTP server, and distributions of several sizes are
+cross-built, so the benchmarks run on any platform without network access.
+The wheels of the project are installed with the built-in installer and, in
+the ``pip`` scenario, requirements are installed by pip from the index.
+``get-pip.py`` is only run by native builds, which need a real interpreter
+on Windows, so it is not benchmarked.
+The duration of each stage and of the whole :meth:`EmbedPython.run` is
+measured with the build report.
+
+py2win must be installed (e.g. ``pip install -e .``).
+
+Usage::
+
+    python benchmarks/bench_embed.py --sizes small medium --output results.json
+    python benchmarks/bench_embed.py --baseline results.json
+
+With ``--baseline``, the exit code is ``1`` if a stage is slower than in the
+baseline by more than the tolerance.
+"""
+
+# Standard library modules.
+from pathlib import Path
+import io
+import os
+import sys
+import json
+import time
+import base64
+import marshal
+import tarfile
+import zipfile
+import hashlib
+import importlib.util
+import argparse
+import tempfile
+import functools
+import threading
+import statistics
+import http.server
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+from py2win.embed import EmbedPython
+
+# Globals and constants variables.
+PYTHON_VERSION = "3.10.11"
+ARCH = "amd64"
+
+"""
+Number of standard library modules, wheels and modules per wheel of each
+distribution size. As many wheels are served by the package index.
+"""
+SIZES = {
+    "tiny": (20, 2, 5),
+    "small": (200, 5, 20),
+    "medium": (1000, 20, 50),
+    "large": (4000, 60, 100),
+}
+
+"""
+Relative slowdown tolerated before a stage is reported as a regression, and
+minimum absolute slowdown in seconds, to ignore the noise of short stages.
+"""
+DEFAULT_TOLERANCE = 0.25
+MIN_SLOWDOWN = 0.05
+
+RESULTS_VERSION = 1
+
+
+class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """
+    Serves a directory over HTTP in a background thread, as a stand-in for
+    python.org and PyPI.
+    """
+
+    def __init__(self, dirpath):
+        handler = functools.partial(QuietHTTPRequestHandler, directory=str(dirpath))
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.baseurl = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _module_source(i):
+    # Some code, so files have realistic sizes and compress realistically
+    return "".join(
+        "def function{0}_{1}(x):\n    return x * {1} + {0}\n\n".format(i, j)
+        for j in range(20)
+    )
+
+
+def _module_bytecode(i):
+    # Bytecode of the running interpreter, with a timestamp-based header
+    code = compile(_module_source(i), "module{0}.py".format(i), "exec")
+    return importlib.util.MAGIC_NUMBER + bytes(12) + marshal.dumps(code)
+
+
+def create_embed_zip(dirpath, module_count):
+    """
+    Creates a synthetic embedded distribution with *module_count* compiled
+    modules in the standard library zip.
+    """
+    name = "python{0}{1}".format(*PYTHON_VERSION.split(".")[:2])
+    filepath = dirpath / "python-{0}-embed-{1}.zip".format(PYTHON_VERSION, ARCH)
+    with zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("python.exe", os.urandom(100 * 1024))
+        zf.writestr(name + ".dll", os.urandom(4 * 1024 * 1024))
+        zf.writestr(name + "._pth", name + ".zip\n.\n")
+
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf_stdlib:
+            zf_stdlib.writestr("lib2to3/__init__.pyc", b"")
+            for i in range(module_count):
+                zf_stdlib.writestr(
+                    "package{0}/module{1}.pyc".format(i // 50, i),
+                    _module_bytecode(i),
+                )
+        zf.writestr(name + ".zip", buf.getvalue())
+
+
+def create_source_tarball(dirpath):
+    """
+    Creates a synthetic Python source tarball with lib2to3 fixers.
+    """
+    filepath = dirpath / "Python-{0}.tgz".format(PYTHON_VERSION)
+    with tarfile.open(filepath, "w:gz") as tar:
+        names = ["Lib/os.py"]
+        names += ["Lib/lib2to3/fixes/fix_{0}.py".format(i) for i in range(50)]
+        names += ["Lib/lib2to3/pgen2/module{0}.py".format(i) for i in range(10)]
+        names += ["Lib/lib2to3/tests/test_{0}.py".format(i) for i in range(50)]
+        names += ["Lib/test/test_{0}.py".format(i) for i in range(500)]
+
+        for name in names:
+            data = _module_source(len(name)).encode("ascii")
+            info = tarfile.TarInfo("Python-{0}/{1}".format(PYTHON_VERSION, name))
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def _record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def create_wheel(dirpath, name, module_count):
+    """
+    Creates a pure Python wheel with *module_count* modules.
+    """
+    distinfo = "{0}-1.0.dist-info".format(name)
+    files = {
+        "{0}/module{1}.py".format(name, i): _module_source(i)
+        for i in range(module_count)
+    }
+    files["{0}/__init__.py".format(name)] = ""
+    files[distinfo + "/METADATA"] = (
+        "Metadata-Version: 2.1\nName: {0}\nVersion: 1.0\n".format(name)
+    )
+    files[distinfo + "/WHEEL"] = (
+        "Wheel-Version: 1.0\nGenerator: bench\nRoot-Is-Purelib: true\n"
+        "Tag: py3-none-any\n"
+    )
+
+    filepath = dirpath / "{0}-1.0-py3-none-any.whl".format(name)
+    records = []
+    with zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED) as zf:
+        for arcname, content in files.items():
+            content = content.encode("utf-8")
+            zf.writestr(arcname, content)
+            records.append(
+                "{0},{1},{2}".format(arcname, _record_hash(content), len(content))
+            )
+        records.append(distinfo + "/RECORD,,")
+        zf.writestr(distinfo + "/RECORD", "\n".join(records) + "\n")
+
+    return filepath
+
+
+def create_artifacts(dirpath, size):
+    """
+    Creates the artifacts served for a distribution *size* in ``www``, with
+    the package index in ``www/simple``, and the wheels of the project in
+    ``wheels``.
+
+    :return: :class:`tuple` of the wheels of the project and the
+        requirements available in the package index
+    """
+    module_count, wheel_count, wheel_module_count = SIZES[size]
+
+    wwwdir = dirpath / "www"
+    wwwdir.mkdir()
+    wheeldir = dirpath / "wheels"
+    wheeldir.mkdir()
+
+    create_embed_zip(wwwdir, module_count)
+    create_source_tarball(wwwdir)
+
+    wheel_filepaths = [
+        create_wheel(wheeldir, "pkg{0}".format(i), wheel_module_count)
+        for i in range(wheel_count)
+    ]
+
+    # Directory listings of the server are a simple repository API
+    requirements = []
+    for i in range(wheel_count):
+        name = "dep{0}".format(i)
+        projectdir = wwwdir / "simple" / name
+        projectdir.mkdir(parents=True)
+        create_wheel(projectdir, name, wheel_module_count)
+        requirements.append(name)
+
+    return wheel_filepaths, requirements
+
+
+def create_embed(baseurl, wheel_filepaths, cache_dir, requirements=()):
+    embed = EmbedPython(
+        "bench",
+        "1.0",
+        cache_dir=cache_dir,
+        python_version=PYTHON_VERSION,
+        arch=ARCH,
+        cross_build=True,
+        installer="builtin",
+        index_url=baseurl + "/simple",
+    )
+    embed.PYTHON_EMBED_BASEURL = baseurl + "/python-{version}-embed-{arch}.zip"
+    embed.PYTHON_SOURCE_BASEURL = baseurl + "/Python-{version}.tgz"
+
+    for filepath in wheel_filepaths:
+        embed.add_wheel(filepath)
+    for requirement in requirements:
+        embed.add_requirement(requirement)
+
+    return embed
+
+
+def _timings(embed, start):
+    timings = {"run": time.perf_counter() - start}
+    for stage in embed.report.to_dict()["stages"]:
+        if not stage["skipped"]:
+            timings[stage["name"]] = (
+                timings.get(stage["name"], 0.0) + stage["wall_time"]
+            )
+    return timings
+
+
+def benchmark_size(size, repeat=3):
+    """
+    Builds a distribution of *size* *repeat* times, from a cold cache, from a
+    warm cache and incrementally, and with requirements installed by pip,
+    and returns the median duration of each stage in seconds.
+    """
+    samples = {}
+
+    def add(scenario, timings):
+        for name, value in timings.items():
+            samples.setdefault("{0}/{1}".format(scenario, name), []).append(value)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        wheel_filepaths, requirements = create_artifacts(tmpdir, size)
+
+        with LocalServer(tmpdir / "www") as server:
+            for i in range(repeat):
+                cache_dir = tmpdir / "cache{0}".format(i)
+                dist_dir = tmpdir / "dist{0}".format(i)
+                embed = create_embed(server.baseurl, wheel_filepaths, cache_dir)
+
+                start = time.perf_counter()
+                embed.run(dist_dir, zip_dist=True)
+                add("cold", _timings(embed, start))
+
+                start = time.perf_counter()
+                embed.run(dist_dir, zip_dist=True)
+                add("warm", _timings(embed, start))
+
+                start = time.perf_counter()
+                embed.run(dist_dir, clean=False, zip_dist=True)
+                add("incremental", _timings(embed, start))
+
+                embed = create_embed(
+                    server.baseurl, wheel_filepaths, cache_dir, requirements
+                )
+                start = time.perf_counter()
+                embed.run(dist_dir, zip_dist=True)
+                add("pip", _timings(embed, start))
+
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns the regressions of *results* compared to *baseline*, as a list of
+    ``(size, name, baseline duration, duration)``.
+    """
+    regressions = []
+    for size, timings in sorted(results["sizes"].items()):
+        baseline_timings = baseline["sizes"].get(size, {})
+        for name, value in sorted(timings.items()):
+            reference = baseline_timings.get(name)
+            if reference is None:
+                continue
+            if value > reference * (1 + tolerance) and value - reference > MIN_SLOWDOWN:
+                regressions.append((size, name, reference, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of EmbedPython")
+    parser.add_argument(
+        "--sizes", nargs="+", choices=sorted(SIZES), default=["small", "medium"]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="path of the JSON results")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    results = {"version": RESULTS_VERSION, "python": sys.version, "sizes": {}}
+    for size in args.sizes:
+        print("benchmarking {0} distribution".format(size))
+        results["sizes"][size] = benchmark_size(size, args.repeat)
+
+        for name, value in sorted(results["sizes"][size].items()):
+            print("  {0:<40} {1:8.3f} s".format(name, value))
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+            fp.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r") as fp:
+            baseline = json.load(fp)
+
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, reference, value in regressions:
+            print(
+                "REGRESSION {0} {1}: {2:.3f} s -> {3:.3f} s".format(
+                    size, name, reference, value
+                )
+            )
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Applies a delta package created by :func:`py2win.delta.create_delta` to an
+installed distribution.
+
+This module only depends on the standard library: it is embedded in every
+delta package as ``__main__.py``, so a delta can be applied with any Python
+interpreter, without py2win::
+
+    python sample-1.3.0.delta.zip C:\\Programs\\sample
+
+The interpreter of the distribution itself cannot be used, since its files
+may be replaced.
+"""
+
+# Standard library modules.
+from pathlib import Path, PurePosixPath
+import os
+import sys
+import json
+import zipfile
+import hashlib
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+DELTA_VERSION = 1
+
+MANIFEST_ARCNAME = "py2win-delta.json"
+
+"""
+Folder of the delta package containing the added and changed files.
+"""
+FILES_ARCNAME = "files/"
+
+"""
+Suffix of the new files while they are staged next to the files they replace.
+"""
+STAGED_SUFFIX = ".py2win-new"
+
+
+def _sha256sum(fp, chunk_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: fp.read(chunk_size), b""):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _file_sha256(filepath):
+    with open(filepath, "rb") as fp:
+        return _sha256sum(fp)
+
+
+def _safe_path(dirpath, relpath):
+    """
+    Returns the path of *relpath* in *dirpath*, refusing paths escaping it.
+    """
+    path = PurePosixPath(relpath)
+    if path.is_absolute() or ".." in path.parts or not path.parts:
+        raise ValueError("Invalid path in delta: {0}".format(relpath))
+    return Path(dirpath, *path.parts)
+
+
+def read_manifest(zf):
+    """
+    Returns the manifest of the opened delta package *zf*.
+    """
+    manifest = json.loads(zf.read(MANIFEST_ARCNAME).decode("utf-8"))
+    if manifest.get("version") != DELTA_VERSION:
+        raise ValueError(
+            "Unsupported delta version: {0}".format(manifest.get("version"))
+        )
+    return manifest
+
+
+def check_delta(manifest, dirpath):
+    """
+    Returns the problems preventing the delta *manifest* from being applied
+    to *dirpath*: changed or removed files with unexpected content, missing
+    files and added files already existing with another content.
+    """
+    problems = []
+
+    for relpath, (old_sha256, _new_sha256) in sorted(manifest["changed"].items()):
+        filepath = _safe_path(dirpath, relpath)
+        if not filepath.is_file():
+            problems.append("missing {0}".format(relpath))
+        elif _file_sha256(filepath) != old_sha256:
+            problems.append("modified {0}".format(relpath))
+
+    for relpath, old_sha256 in sorted(manifest["removed"].items()):
+        filepath = _safe_path(dirpath, relpath)
+        if filepath.is_file() and _file_sha256(filepath) != old_sha256:
+            problems.append("modified {0}".format(relpath))
+
+    for relpath, new_sha256 in sorted(manifest["added"].items()):
+        filepath = _safe_path(dirpath, relpath)
+        if filepath.exists() and (
+            not filepath.is_file() or _file_sha256(filepath) != new_sha256
+        ):
+            problems.append("conflicting {0}".format(relpath))
+
+    return problems
+
+
+def apply_delta(delta_filepath, dirpath):
+    """
+    Updates the distribution in *dirpath* with the delta package at
+    *delta_filepath*.
+
+    The current files are verified before anything is modified and the new
+    files are first extracted next to the files they replace and verified,
+    then moved in place, so a corrupted delta or a modified distribution
+    leaves the distribution untouched.
+
+    :return: manifest of the delta
+    """
+    dirpath = Path(dirpath)
+    if not dirpath.is_dir():
+        raise IOError("No distribution in {0}".format(dirpath))
+
+    with zipfile.ZipFile(delta_filepath, "r") as zf:
+        manifest = read_manifest(zf)
+
+        problems = check_delta(manifest, dirpath)
+        if problems:
+            raise IOError(
+                "Cannot apply delta to {0}: {1}".format(dirpath, ", ".join(problems))
+            )
+
+        # Stage new files
+        new_files = dict(manifest["added"])
+        new_files.update(
+            (relpath, new_sha256)
+            for relpath, (_old_sha256, new_sha256) in manifest["changed"].items()
+        )
+
+        staged = []
+        try:
+            for relpath, sha256 in sorted(new_files.items()):
+                filepath = _safe_path(dirpath, relpath)
+                staged_filepath = filepath.with_name(filepath.name + STAGED_SUFFIX)
+                filepath.parent.mkdir(parents=True, exist_ok=True)
+
+                staged.append((staged_filepath, filepath))
+                with zf.open(FILES_ARCNAME + relpath, "r") as src, open(
+                    staged_filepath, "wb"
+                ) as dst:
+                    while True:
+                        chunk = src.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+
+                if _file_sha256(staged_filepath) != sha256:
+                    raise IOError("Checksum mismatch for {0}".format(relpath))
+        except BaseException:
+            for staged_filepath, _filepath in staged:
+                if staged_filepath.exists():
+                    staged_filepath.unlink()
+            raise
+
+    # Replace files
+    for staged_filepath, filepath in staged:
+        os.replace(staged_filepath, filepath)
+
+    # Remove files and the folders left empty
+    dirpaths = set()
+    for relpath in sorted(manifest["removed"]):
+        filepath = _safe_path(dirpath, relpath)
+        if filepath.exists():
+            filepath.unlink()
+        dirpaths.update(filepath.parents)
+
+    for path in sorted(dirpaths, key=lambda path: len(path.parts), reverse=True):
+        if path != dirpath and dirpath in path.parents:
+            try:
+                path.rmdir()
+            except OSError:
+                pass  # Not empty
+
+    logger.info(
+        "applied delta: {0} added, {1} changed, {2} removed".format(
+            len(manifest["added"]), len(manifest["changed"]), len(manifest["removed"])
+        )
+    )
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a py2win delta package")
+    parser.add_argument("dirpath", help="directory of the installed distribution")
+    parser.add_argument(
+        "--delta",
+        default=os.path.dirname(os.path.abspath(__file__)),
+        help="path of the delta package (default: this package)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    try:
+        apply_delta(args.delta, args.dirpath)
+    except (IOError, ValueError) as ex:
+        logger.error(str(ex))
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
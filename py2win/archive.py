@@ -0,0 +1,321 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import time
+import zlib
+import zipfile
+import collections
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+from py2win.cache import sha256sum
+
+# Globals and constants variables.
+DEFAULT_COMPRESSLEVEL = 6
+
+"""
+Suffixes of files which are already compressed and stored as is.
+"""
+STORED_SUFFIXES = {
+    ".pyd",
+    ".dll",
+    ".zip",
+    ".whl",
+    ".gz",
+    ".bz2",
+    ".xz",
+    ".7z",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".ico",
+}
+
+"""
+Timestamp of all members when ``SOURCE_DATE_EPOCH`` is not defined, the
+earliest date supported by the zip format.
+"""
+DEFAULT_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+"""
+Minimum size of the files compressed once for all identical copies, smaller
+files are cheaper to compress again than to hash.
+"""
+DEDUP_MIN_SIZE = 64 * 1024
+
+FILE_MODE = 0o644
+DIR_MODE = 0o755
+
+CompressedMember = collections.namedtuple(
+    "CompressedMember", ["compress_type", "crc", "file_size", "data"]
+)
+
+
+def zip_date_time():
+    """
+    Returns the timestamp of the members of reproducible archives: the date of
+    the ``SOURCE_DATE_EPOCH`` environment variable if defined, otherwise
+    1980-01-01.
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch is None:
+        return DEFAULT_DATE_TIME
+
+    date_time = time.gmtime(int(epoch))[:6]
+    return max(date_time, DEFAULT_DATE_TIME)
+
+
+def get_compresslevel(
+    filename, compresslevel=DEFAULT_COMPRESSLEVEL, compresslevels=None
+):
+    """
+    Returns the deflate level of the file *filename*, ``0`` if it is stored
+    without compression.
+
+    :arg compresslevel: default level
+    :arg compresslevels: :class:`dict` of levels per suffix (e.g. ``.pyc``),
+        overriding the default level and the stored suffixes
+    """
+    suffix = os.path.splitext(filename)[1].lower()
+    if compresslevels and suffix in compresslevels:
+        return compresslevels[suffix]
+    if suffix in STORED_SUFFIXES:
+        return 0
+    return compresslevel
+
+
+def compress_file(filepath, compresslevel):
+    """
+    Reads and compresses the file at *filepath* with raw deflate.
+    The compression runs without the GIL, so files can be compressed
+    concurrently in threads.
+    """
+    with open(filepath, "rb") as fp:
+        data = fp.read()
+
+    return compress_data(data, compresslevel)
+
+
+def compress_data(data, compresslevel):
+    """
+    Compresses *data* with raw deflate, see :func:`compress_file`.
+    """
+    crc = zlib.crc32(data)
+    file_size = len(data)
+    if compresslevel == 0:
+        return CompressedMember(zipfile.ZIP_STORED, crc, file_size, data)
+
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+
+    # Incompressible file, e.g. an unknown archive format
+    if len(compressed) >= file_size:
+        return CompressedMember(zipfile.ZIP_STORED, crc, file_size, data)
+
+    return CompressedMember(zipfile.ZIP_DEFLATED, crc, file_size, compressed)
+
+
+def _list_members(root_dir, base_dir):
+    """
+    Returns the paths and archive names of the directories and files in
+    *base_dir*, in sorted order.
+    """
+    members = []
+    for dirpath, dirnames, filenames in os.walk(root_dir.joinpath(base_dir)):
+        dirnames.sort()
+        dirpath = Path(dirpath)
+        arcname = dirpath.relative_to(root_dir).as_posix()
+        members.append((dirpath, arcname + "/"))
+
+        for filename in sorted(filenames):
+            members.append((dirpath.joinpath(filename), arcname + "/" + filename))
+
+    return members
+
+
+def _find_identical_files(members, min_size=DEDUP_MIN_SIZE, max_workers=None):
+    """
+    Returns the SHA-256 of the files of *members* identical to another
+    member, per path.
+    Only the files of the same size are hashed.
+    """
+    paths = collections.defaultdict(list)
+    for path, arcname in members:
+        if arcname.endswith("/"):
+            continue
+        size = os.path.getsize(path)
+        if size >= min_size:
+            paths[size].append(path)
+
+    candidates = [path for group in paths.values() if len(group) > 1 for path in group]
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        digests = dict(zip(candidates, executor.map(sha256sum, candidates)))
+
+    counts = collections.Counter(digests.values())
+    return {path: digest for path, digest in digests.items() if counts[digest] > 1}
+
+
+def write_member(zf, arcname, member, date_time):
+    """
+    Writes a file member already compressed by :func:`compress_data` or
+    :func:`compress_file` in the archive *zf*, with normalized permissions.
+
+    :arg member: :class:`CompressedMember`
+    :arg date_time: timestamp of the member, see :func:`zip_date_time`
+    """
+    zinfo = zipfile.ZipInfo(arcname, date_time)
+    zinfo.create_system = 3
+    zinfo.external_attr = (0o100000 | FILE_MODE) << 16
+    zinfo.compress_type = member.compress_type
+    zinfo.CRC = member.crc
+    zinfo.file_size = member.file_size
+    zinfo.compress_size = len(member.data)
+
+    _append_compressed(zf, zinfo, member.data)
+
+
+def _append_compressed(zf, zinfo, data):
+    """
+    Appends the compressed *data* of the member *zinfo* to *zf*.
+
+    zipfile has no public API to write already compressed data, so the member
+    is appended with the internals of :class:`zipfile.ZipFile`, as
+    ``ZipFile.write()`` does. This is the only place using them; they are
+    the same in CPython 3.9 to 3.13 and ``test_archive`` checks the archives
+    written on each Python version of the CI.
+    """
+    if zf._writing:
+        raise ValueError(
+            "Can't write to the ZIP file while there is another write handle open on it"
+        )
+
+    zip64 = (
+        zinfo.file_size > zipfile.ZIP64_LIMIT
+        or zinfo.compress_size > zipfile.ZIP64_LIMIT
+    )
+
+    with zf._lock:
+        if zf._seekable:
+            zf.fp.seek(zf.start_dir)
+        zinfo.header_offset = zf.fp.tell()
+        zf._writecheck(zinfo)
+        zf._didModify = True
+
+        zf.fp.write(zinfo.FileHeader(zip64))
+        zf.fp.write(data)
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.start_dir = zf.fp.tell()
+
+
+def create_archive(
+    filepath,
+    root_dir,
+    base_dir,
+    compresslevel=DEFAULT_COMPRESSLEVEL,
+    compresslevels=None,
+    max_workers=None,
+    dedup=False,
+):
+    """
+    Creates a zip of the directory *base_dir*, relative to *root_dir*.
+    Files are compressed concurrently and written in a single sequential
+    pass.
+    The archive is reproducible: members are sorted and their timestamps
+    (``SOURCE_DATE_EPOCH`` environment variable or 1980-01-01) and
+    permissions are normalized, so identical inputs produce byte-identical
+    archives.
+
+    :arg filepath: path of the zip
+    :arg compresslevel: default deflate level (``0`` to ``9``)
+    :arg compresslevels: :class:`dict` of levels per suffix, see
+        :func:`get_compresslevel`
+    :arg max_workers: number of threads (default: number of CPUs)
+    :arg dedup: whether to compress identical files once. The zip format
+        requires a copy of the data per member, so only the compression is
+        shared, not the size.
+    :return: path of the zip
+    """
+    filepath = Path(filepath)
+    root_dir = Path(root_dir)
+    members = _list_members(root_dir, base_dir)
+    date_time = zip_date_time()
+
+    logger.info("creating {0} ({1} members)".format(filepath.name, len(members)))
+
+    max_workers = max_workers or os.cpu_count() or 1
+
+    # Compressed data shared by identical members, kept until the last one
+    # is written
+    identical = _find_identical_files(members, max_workers=max_workers) if dedup else {}
+    remaining = collections.Counter(
+        (identical[path], get_compresslevel(arcname, compresslevel, compresslevels))
+        for path, arcname in members
+        if path in identical
+    )
+    shared = {}
+
+    tmpfilepath = filepath.with_name(filepath.name + ".tmp")
+    try:
+        with zipfile.ZipFile(
+            tmpfilepath, "w"
+        ) as zf, concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            # Bounded window of pending members to limit memory usage
+            pending = collections.deque()
+            members = iter(members)
+
+            def submit():
+                for path, arcname in members:
+                    if arcname.endswith("/"):
+                        pending.append((arcname, None, None))
+                    else:
+                        level = get_compresslevel(
+                            arcname, compresslevel, compresslevels
+                        )
+                        key = None
+                        if path in identical:
+                            key = (identical[path], level)
+
+                        future = shared.get(key)
+                        if future is None:
+                            future = executor.submit(compress_file, path, level)
+                            if key is not None:
+                                shared[key] = future
+                        pending.append((arcname, future, key))
+
+                    if len(pending) >= max_workers * 4:
+                        break
+
+            submit()
+            while pending:
+                arcname, future, key = pending.popleft()
+                if future is None:
+                    zinfo = zipfile.ZipInfo(arcname, date_time)
+                    zinfo.create_system = 3
+                    zinfo.external_attr = ((0o40000 | DIR_MODE) << 16) | 0x10
+                    zf.writestr(zinfo, b"")
+                else:
+                    write_member(zf, arcname, future.result(), date_time)
+
+                    if key is not None:
+                        remaining[key] -= 1
+                        if not remaining[key]:
+                            del shared[key]
+
+                if len(pending) < max_workers * 2:
+                    submit()
+
+        os.replace(tmpfilepath, filepath)
+    finally:
+        if tmpfilepath.exists():
+            tmpfilepath.unlink()
+
+    return filepath
@@ -0,0 +1,236 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import sys
+import time
+import uuid
+import shutil
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+CLONE_MODES = ("auto", "reflink", "hardlink", "copy")
+
+"""
+Marker written in a base tree once it is complete.
+"""
+COMPLETE_FILENAME = ".py2win-complete"
+
+DEFAULT_MAX_TREES = 4
+
+"""
+ioctl request to clone a file on Linux (btrfs, XFS, ...).
+"""
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    """
+    Clones the file *src* to *dst* with copy-on-write, sharing the data blocks
+    until either file is modified.
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("Reflinks are not supported on {0}".format(sys.platform))
+
+    import fcntl
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+
+    shutil.copystat(src, dst)
+
+
+def _clone_file(src, dst, mode):
+    if mode == "reflink":
+        _reflink(src, dst)
+    elif mode == "hardlink":
+        os.link(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def clone_tree(src, dst, mode="auto"):
+    """
+    Clones the directory *src* in *dst*, replacing existing files.
+    With ``auto``, files are cloned with reflinks if the filesystem supports
+    them, otherwise hardlinked, otherwise copied.
+
+    Hardlinked files are shared with *src*, so the files of *dst* must be
+    replaced, never modified in place.
+
+    :return: mode used (``reflink``, ``hardlink`` or ``copy``)
+    """
+    if mode not in CLONE_MODES:
+        raise ValueError("Unknown clone mode: {}".format(mode))
+
+    src = Path(src)
+    dst = Path(dst)
+    modes = ["reflink", "hardlink", "copy"] if mode == "auto" else [mode]
+
+    for dirpath, dirnames, filenames in os.walk(src):
+        reldirpath = Path(dirpath).relative_to(src)
+        dst.joinpath(reldirpath).mkdir(parents=True, exist_ok=True)
+
+        for filename in filenames:
+            if filename == COMPLETE_FILENAME:
+                continue
+
+            srcfilepath = Path(dirpath, filename)
+            dstfilepath = dst.joinpath(reldirpath, filename)
+            if dstfilepath.exists() or dstfilepath.is_symlink():
+                dstfilepath.unlink()
+
+            # Fall back to the next mode on the first file which fails
+            while True:
+                try:
+                    _clone_file(srcfilepath, dstfilepath, modes[0])
+                    break
+                except OSError:
+                    if len(modes) == 1:
+                        raise
+                    logger.debug("cannot {0} files, falling back".format(modes[0]))
+                    modes.pop(0)
+
+    return modes[0]
+
+
+class BaseTreePool:
+    """
+    Pool of pristine interpreter trees (embedded distribution with the
+    standard library and pip), ready to be cloned in new distributions.
+    The trees are identified by a key, the digest of their inputs.
+    """
+
+    def __init__(self, root, max_trees=DEFAULT_MAX_TREES):
+        """
+        :arg root: directory of the pool
+        :arg max_trees: maximum number of trees kept, the least recently used
+            trees are removed first
+        """
+        self.root = Path(root)
+        self.max_trees = max_trees
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _touch(self, marker):
+        # Precise clock, so the order of use is kept
+        now = time.time_ns()
+        os.utime(marker, ns=(now, now))
+
+    def _tree_dir(self, key):
+        return self.root.joinpath(key)
+
+    def get(self, key):
+        """
+        Returns the directory of the complete tree *key*, or ``None``.
+        """
+        dirpath = self._tree_dir(key)
+        marker = dirpath.joinpath(COMPLETE_FILENAME)
+        if not marker.exists():
+            return None
+
+        self._touch(marker)
+        return dirpath
+
+    def create(self, key, builder):
+        """
+        Returns the directory of the tree *key*, creating it with
+        ``builder(dirpath)`` if it is not in the pool.
+        The tree is built in a temporary directory and moved in the pool once
+        complete, so an interrupted build never leaves a partial tree.
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            dirpath = self.get(key)
+            if dirpath is not None:
+                return dirpath
+
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmpdir = self.root.joinpath(".tmp-{0}".format(uuid.uuid4().hex))
+            tmpdir.mkdir()
+            try:
+                builder(tmpdir)
+                marker = tmpdir.joinpath(COMPLETE_FILENAME)
+                marker.touch()
+                self._touch(marker)
+
+                dirpath = self._tree_dir(key)
+                if self.get(key) is None:
+                    if dirpath.exists():
+                        shutil.rmtree(dirpath)  # Incomplete tree
+                    try:
+                        os.replace(tmpdir, dirpath)
+                    except OSError:
+                        # Created concurrently by another process
+                        if self.get(key) is None:
+                            raise
+                else:
+                    # Completed by another process while building, keep it
+                    # since it may be cloned
+                    logger.debug("base tree {0} created concurrently".format(key))
+            finally:
+                if tmpdir.exists():
+                    shutil.rmtree(tmpdir)
+
+        self.evict(keep=key)
+        return self.get(key)
+
+    def clone(self, key, dst, mode="auto"):
+        """
+        Clones the tree *key* in *dst*.
+
+        :return: mode used, see :func:`clone_tree`
+        """
+        dirpath = self.get(key)
+        if dirpath is None:
+            raise ValueError("No base tree {0}".format(key))
+
+        start = time.perf_counter()
+        mode = clone_tree(dirpath, dst, mode)
+        logger.info(
+            "cloned base tree in {0:.3f} s ({1})".format(
+                time.perf_counter() - start, mode
+            )
+        )
+        return mode
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used trees above the maximum number.
+        """
+        if not self.root.exists():
+            return
+
+        trees = []
+        for dirpath in self.root.iterdir():
+            marker = dirpath.joinpath(COMPLETE_FILENAME)
+            if dirpath.name != keep and marker.exists():
+                trees.append((marker.stat().st_mtime_ns, dirpath))
+
+        trees.sort()
+        excess = len(trees) + (1 if keep else 0) - self.max_trees
+        for _mtime, dirpath in trees[: max(excess, 0)]:
+            logger.debug("removing base tree {0}".format(dirpath.name))
+            shutil.rmtree(dirpath, ignore_errors=True)
+
+    def clear(self):
+        """
+        Removes all trees.
+        """
+        if self.root.exists():
+            shutil.rmtree(self.root)
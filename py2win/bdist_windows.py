@@ -1,6 +1,9 @@
 """"""
 
 # Standard library modules.
+from pathlib import Path
+import os
+import json
 from distutils.cmd import Command
 from distutils import log
 from distutils.command.build import show_compilers
@@ -8,7 +11,11 @@ from distutils.command.build import show_compilers
 # Third party modules.
 
 # Local modules.
-from py2win.embed import EmbedPython
+from py2win.embed import EmbedPython, _to_url
+from py2win.daemon import BuildClient, default_state_filepath
+from py2win.archive import DEFAULT_COMPRESSLEVEL
+from py2win.delta import create_delta
+from py2win.scheduler import DEFAULT_MAX_WORKERS
 
 # Globals and constants variables.
 
@@ -24,11 +31,87 @@ class bdist_windows(Command):
             "directory to put final built distributions in " "[default: dist]",
         ),
         ("extra-wheel-dir=", None, "directory containing wheels already downloaded"),
+        ("cache-dir=", None, "directory of the cache of downloaded artifacts"),
+        ("python-version=", None, "Python version of the distribution"),
+        ("arch=", None, "architecture of the distribution (amd64, win32 or arm64)"),
+        (
+            "targets=",
+            None,
+            "comma-separated targets to build (e.g. 3.10.11-amd64,3.11.4-win32)",
+        ),
+        ("python-mirror=", None, "URL or directory mirroring python.org/ftp/python"),
+        ("get-pip-url=", None, "URL or path of get-pip.py"),
+        ("manifest-url=", None, "URL or path of the manifest of the executables"),
+        ("index-url=", None, "URL of the package index"),
+        (
+            "wheel-cache-dir=",
+            None,
+            "shared directory of the wheels built from source distributions",
+        ),
+        ("offline", None, "only use local artifacts and the cache, never download"),
+        ("base-tree", None, "clone a cached interpreter tree instead of installing it"),
+        (
+            "clone-mode=",
+            None,
+            "how base trees are cloned (auto, reflink, hardlink or copy)",
+        ),
+        ("cross-build", None, "install packages without running the embedded Python"),
+        ("installer=", None, "installer of the wheels (pip or builtin) [default: pip]"),
+        ("lock-file=", None, "lock file of the exact wheels to install"),
+        ("update-lock", None, "update the lock file with a new resolution"),
+        ("compile-bytecode", None, "compile all Python sources to bytecode"),
+        ("optimize=", "O", "optimization level of the bytecode [default: 0]"),
+        (
+            "invalidation-mode=",
+            None,
+            "bytecode invalidation mode (timestamp, checked-hash or unchecked-hash)",
+        ),
+        ("drop-sources", None, "remove the compiled sources"),
+        ("zip-stdlib", None, "keep the standard library in a zip"),
+        ("zip-site-packages", None, "move zip-safe packages in a zip"),
+        ("tree-shaking", None, "remove the modules not imported by the scripts"),
+        ("dedup", None, "remove the DLLs duplicated in the application directory"),
+        ("hidden-imports=", None, "comma-separated modules imported dynamically"),
         ("zip", None, "create zip of the program at the end"),
+        ("compresslevel=", None, "deflate level of the zip (0 to 9) [default: 6]"),
+        (
+            "compresslevels=",
+            None,
+            "comma-separated deflate levels per suffix (e.g. .pyc:9,.txt:9)",
+        ),
+        (
+            "launcher=",
+            None,
+            "variant of the executables (py_main or pyconfig) [default: py_main]",
+        ),
+        ("launcher-no-site", None, "do not import site in pyconfig executables"),
+        (
+            "concurrent-stages=",
+            None,
+            "maximum number of stages run concurrently [default: 4]",
+        ),
+        ("daemon", None, "submit the build to the running py2win daemon"),
         ("no-clean", None, "do not remove the existing distribution"),
+        ("delta-from=", None, "previous distribution (directory or zip) to diff"),
+        ("report=", None, "write a JSON report of the duration of each stage"),
     ]
 
-    boolean_options = ["zip", "no-clean"]
+    boolean_options = [
+        "offline",
+        "base-tree",
+        "cross-build",
+        "update-lock",
+        "compile-bytecode",
+        "drop-sources",
+        "zip-stdlib",
+        "zip-site-packages",
+        "tree-shaking",
+        "dedup",
+        "zip",
+        "launcher-no-site",
+        "daemon",
+        "no-clean",
+    ]
 
     help_options = [
         ("help-compiler", None, "list available compilers", show_compilers),
@@ -38,12 +121,88 @@ class bdist_windows(Command):
         self.dist_dir = None
         self.compiler = None
         self.extra_wheel_dir = None
+        self.cache_dir = None
+        self.python_version = None
+        self.arch = None
+        self.targets = None
+        self.python_mirror = None
+        self.get_pip_url = None
+        self.manifest_url = None
+        self.index_url = None
+        self.wheel_cache_dir = None
+        self.offline = False
+        self.base_tree = False
+        self.clone_mode = None
+        self.cross_build = False
+        self.installer = None
+        self.lock_file = None
+        self.update_lock = False
+        self.compile_bytecode = False
+        self.optimize = None
+        self.invalidation_mode = None
+        self.drop_sources = False
+        self.zip_stdlib = False
+        self.zip_site_packages = False
+        self.tree_shaking = False
+        self.dedup = False
+        self.hidden_imports = None
         self.zip = False
+        self.compresslevel = None
+        self.compresslevels = None
+        self.launcher = None
+        self.launcher_no_site = False
+        self.concurrent_stages = None
+        self.daemon = False
         self.no_clean = False
+        self.report = None
+        self.delta_from = None
 
     def finalize_options(self):
         if self.dist_dir is None:
             self.dist_dir = "dist"
+        if self.clone_mode is None:
+            self.clone_mode = "auto"
+        if self.installer is None:
+            self.installer = "pip"
+        if self.launcher is None:
+            self.launcher = "py_main"
+        if self.optimize is None:
+            self.optimize = 0
+        self.optimize = int(self.optimize)
+        if self.concurrent_stages is None:
+            self.concurrent_stages = DEFAULT_MAX_WORKERS
+        self.concurrent_stages = int(self.concurrent_stages)
+        if self.invalidation_mode is None:
+            self.invalidation_mode = "unchecked-hash"
+        if isinstance(self.targets, str):
+            targets = []
+            for item in self.targets.split(","):
+                if not item.strip():
+                    continue
+                python_version, arch = item.strip().split("-")
+                targets.append((python_version, arch))
+            self.targets = targets
+        if self.compresslevel is None:
+            self.compresslevel = DEFAULT_COMPRESSLEVEL
+        self.compresslevel = int(self.compresslevel)
+        if self.compresslevels is None:
+            self.compresslevels = {}
+        elif isinstance(self.compresslevels, str):
+            compresslevels = {}
+            for item in self.compresslevels.split(","):
+                if not item.strip():
+                    continue
+                suffix, level = item.split(":")
+                compresslevels[suffix.strip()] = int(level)
+            self.compresslevels = compresslevels
+        if self.hidden_imports is None:
+            self.hidden_imports = []
+        elif isinstance(self.hidden_imports, str):
+            self.hidden_imports = [
+                module.strip()
+                for module in self.hidden_imports.split(",")
+                if module.strip()
+            ]
 
     def _parse_entry_point(self, entry_point):
         executable_name, value = entry_point.split("=")
@@ -55,29 +214,159 @@ class bdist_windows(Command):
 
         return module, method, executable_name
 
+    def _embed_options(self):
+        """
+        Returns the arguments of :class:`EmbedPython`.
+        """
+        return dict(
+            extra_wheel_dir=self.extra_wheel_dir,
+            python_version=self.python_version,
+            arch=self.arch,
+            targets=self.targets,
+            python_mirror=self.python_mirror,
+            get_pip_url=self.get_pip_url,
+            manifest_url=self.manifest_url,
+            index_url=self.index_url,
+            wheel_cache_dir=self.wheel_cache_dir,
+            offline=self.offline,
+            base_tree=self.base_tree,
+            clone_mode=self.clone_mode,
+            cross_build=self.cross_build,
+            installer=self.installer,
+            compile_bytecode=self.compile_bytecode,
+            optimize=self.optimize,
+            invalidation_mode=self.invalidation_mode,
+            drop_sources=self.drop_sources,
+            zip_stdlib=self.zip_stdlib,
+            zip_site_packages=self.zip_site_packages,
+            tree_shaking=self.tree_shaking,
+            dedup=self.dedup,
+            compresslevel=self.compresslevel,
+            compresslevels=self.compresslevels,
+            launcher=self.launcher,
+            launcher_site=not self.launcher_no_site,
+            concurrent_stages=self.concurrent_stages,
+        )
+
+    def _entry_points(self):
+        """
+        Returns the scripts of the distribution as
+        ``(module, method, executable_name, console)``.
+        """
+        scripts = []
+        for key, console in [("console_scripts", True), ("gui_scripts", False)]:
+            for entry_point in self.distribution.entry_points.get(key, []):
+                module, method, executable_name = self._parse_entry_point(entry_point)
+                scripts.append((module, method, executable_name, console))
+        return scripts
+
     def run(self):
         project_name = self.distribution.get_name()
         project_version = self.distribution.get_version()
-        embed = EmbedPython(project_name, project_version, self.extra_wheel_dir)
+
+        if self.delta_from is not None and self.targets and len(self.targets) > 1:
+            raise ValueError("A delta can only be created for a single target")
 
         # Build wheel
         log.info("preparing a wheel file of application")
         self.run_command("bdist_wheel")
 
+        wheel_filepaths = [
+            filepath
+            for command, _version, filepath in self.distribution.dist_files
+            if command == "bdist_wheel"
+        ]
+
+        if self.daemon:
+            workdir = self._run_daemon(project_name, project_version, wheel_filepaths)
+        else:
+            workdir = self._run_local(project_name, project_version, wheel_filepaths)
+
+        # Delta from the previous distribution
+        if self.delta_from is not None:
+            filepath = workdir.with_name(workdir.name + ".delta.zip")
+            log.info("writing delta {}".format(filepath))
+            create_delta(
+                self.delta_from,
+                workdir,
+                filepath,
+                self.compresslevel,
+                self.compresslevels,
+            )
+
+    def _run_local(self, project_name, project_version, wheel_filepaths):
+        embed = EmbedPython(
+            project_name,
+            project_version,
+            cache_dir=self.cache_dir,
+            **self._embed_options()
+        )
+
         # Add wheel
-        for command, _version, filepath in self.distribution.dist_files:
-            if command != "bdist_wheel":
-                continue
+        for filepath in wheel_filepaths:
             embed.add_wheel(filepath)
 
         # Add entry points
-        for entry_point in self.distribution.entry_points.get("console_scripts", []):
-            module, method, executable_name = self._parse_entry_point(entry_point)
-            embed.add_script(module, method, executable_name, console=True)
+        for module, method, executable_name, console in self._entry_points():
+            embed.add_script(module, method, executable_name, console)
 
-        for entry_point in self.distribution.entry_points.get("gui_scripts", []):
-            module, method, executable_name = self._parse_entry_point(entry_point)
-            embed.add_script(module, method, executable_name, console=False)
+        for module in self.hidden_imports:
+            embed.add_hidden_import(module)
+
+        # Lock file
+        if self.lock_file is not None:
+            if self.update_lock or not os.path.exists(self.lock_file):
+                log.info("writing lock file {}".format(self.lock_file))
+                embed.write_lock(self.lock_file)
+            embed.use_lock(self.lock_file)
 
         # Run
-        embed.run(self.dist_dir, not self.no_clean, self.zip)
+        try:
+            return embed.run(self.dist_dir, not self.no_clean, self.zip)
+        finally:
+            if self.report is not None:
+                log.info("writing report {}".format(self.report))
+                embed.report.write(self.report)
+
+    def _run_daemon(self, project_name, project_version, wheel_filepaths):
+        """
+        Submits the build to the daemon using the cache directory, see
+        :mod:`py2win.daemon`.
+        """
+        options = self._embed_options()
+
+        # Paths are relative to the working directory of the daemon
+        if options["extra_wheel_dir"] is not None:
+            options["extra_wheel_dir"] = os.path.abspath(options["extra_wheel_dir"])
+        for key in ["python_mirror", "get_pip_url", "manifest_url"]:
+            if options[key] is not None:
+                options[key] = _to_url(options[key])
+
+        spec = {
+            "project_name": project_name,
+            "project_version": project_version,
+            "dist_dir": os.path.abspath(self.dist_dir),
+            "options": options,
+            "wheels": [os.path.abspath(filepath) for filepath in wheel_filepaths],
+            "scripts": self._entry_points(),
+            "hidden_imports": self.hidden_imports,
+            "lock_file": (
+                os.path.abspath(self.lock_file) if self.lock_file is not None else None
+            ),
+            "update_lock": self.update_lock,
+            "clean": not self.no_clean,
+            "zip_dist": self.zip,
+        }
+
+        client = BuildClient(default_state_filepath(self.cache_dir))
+        log.info("submitting build to py2win daemon")
+        paths, report = client.build(spec, lambda level, message: log.info(message))
+
+        if self.report is not None:
+            log.info("writing report {}".format(self.report))
+            with open(self.report, "w") as fp:
+                json.dump(report, fp, indent=2)
+                fp.write("\n")
+
+        workdirs = [Path(path) for path in paths]
+        return workdirs[0] if len(workdirs) == 1 else workdirs
@@ -0,0 +1,83 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import fnmatch
+import compileall
+import py_compile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+INVALIDATION_MODES = {
+    "timestamp": py_compile.PycInvalidationMode.TIMESTAMP,
+    "checked-hash": py_compile.PycInvalidationMode.CHECKED_HASH,
+    "unchecked-hash": py_compile.PycInvalidationMode.UNCHECKED_HASH,
+}
+
+"""
+Sources which must be kept, even when they are compiled, because they are
+discovered by listing ``.py`` files (e.g. lib2to3 fixers).
+"""
+KEEP_SOURCES_PATTERNS = ["*/lib2to3/fixes/*.py"]
+
+
+def compile_tree(
+    dirpath,
+    optimize=0,
+    invalidation_mode="unchecked-hash",
+    drop_sources=False,
+    max_workers=None,
+):
+    """
+    Compiles all Python sources in *dirpath* to bytecode with a pool of
+    processes.
+    The bytecode is only valid for the major and minor version of the running
+    interpreter.
+
+    :arg dirpath: directory to compile recursively
+    :arg optimize: optimization level (``0``, ``1`` or ``2``). Optimized
+        bytecode requires *drop_sources*: next to their sources, the
+        ``.opt-N.pyc`` files are only loaded by an interpreter running with
+        ``-O``, which the launchers do not use.
+    :arg invalidation_mode: how the interpreter checks whether the bytecode is
+        up-to-date: ``timestamp``, ``checked-hash`` or ``unchecked-hash``
+    :arg drop_sources: whether to remove the sources once compiled.
+        The bytecode files are then written next to the sources instead of
+        in ``__pycache__``.
+    :arg max_workers: number of processes (default: number of CPUs)
+    """
+    dirpath = Path(dirpath)
+    if invalidation_mode not in INVALIDATION_MODES:
+        raise ValueError("Unknown invalidation mode: {}".format(invalidation_mode))
+    if optimize and not drop_sources:
+        raise ValueError("Optimized bytecode requires drop_sources")
+
+    logger.info("compiling {0} to bytecode".format(dirpath))
+    success = compileall.compile_dir(
+        str(dirpath),
+        quiet=1,
+        legacy=drop_sources,
+        optimize=optimize,
+        workers=max_workers or 0,
+        invalidation_mode=INVALIDATION_MODES[invalidation_mode],
+    )
+    if not success:
+        raise IOError("Failed to compile {0}".format(dirpath))
+
+    if not drop_sources:
+        return
+
+    logger.info("removing compiled sources")
+    for filepath in dirpath.rglob("*.py"):
+        path = filepath.as_posix()
+        if any(fnmatch.fnmatch(path, pattern) for pattern in KEEP_SOURCES_PATTERNS):
+            continue
+
+        if filepath.with_suffix(".pyc").exists():
+            filepath.unlink()
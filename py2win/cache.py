@@ -0,0 +1,384 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import contextlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB
+
+"""
+Resolution in seconds of the last access time of the entries: the index is
+only rewritten on a hit if the entry was not accessed for this long.
+"""
+ATIME_RESOLUTION = 60
+
+
+def default_cache_dir():
+    """
+    Returns the default location of the artifact cache.
+    The environment variable ``PY2WIN_CACHE_DIR`` takes precedence over the
+    platform's user cache directory.
+    """
+    if "PY2WIN_CACHE_DIR" in os.environ:
+        return Path(os.environ["PY2WIN_CACHE_DIR"])
+
+    if sys.platform == "win32":
+        basedir = os.environ.get(
+            "LOCALAPPDATA", Path.home().joinpath("AppData", "Local")
+        )
+        return Path(basedir).joinpath("py2win", "Cache")
+
+    basedir = os.environ.get("XDG_CACHE_HOME", Path.home().joinpath(".cache"))
+    return Path(basedir).joinpath("py2win")
+
+
+@contextlib.contextmanager
+def file_lock(filepath):
+    """
+    Holds an exclusive lock on *filepath*, created if it does not exist,
+    shared between processes.
+    The lock is not reentrant: it blocks if the same process already holds
+    it through another call.
+    """
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+
+    with open(filepath, "a+b") as fp:
+        if sys.platform == "win32":
+            import msvcrt
+
+            fp.seek(0)
+            while True:
+                try:
+                    # Retries for 10 s, then raises
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def _copy_or_link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def sha256sum(filepath, chunk_size=1024 * 1024):
+    """
+    Returns the hexadecimal SHA-256 digest of the file at *filepath*.
+    """
+    h = hashlib.sha256()
+    with open(filepath, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed on-disk store for downloaded artifacts.
+
+    Files are stored once under ``objects/`` by their SHA-256 digest.
+    An index maps keys (usually URLs) to a digest, size and last access time
+    (updated at most every :data:`ATIME_RESOLUTION` seconds).
+    Checksums are verified the first time an artifact is read by the
+    instance, and again if its size or modification time changed, and the least
+    recently used entries are evicted when the cache exceeds *max_size*.
+
+    The index is updated under a lock file, so several processes can share
+    the cache. Only the artifacts are counted in *max_size* and removed by
+    :meth:`clear`; other files of the cache directory (e.g. base trees) are
+    managed by their owners.
+    """
+
+    INDEX_FILENAME = "index.json"
+    LOCK_FILENAME = "index.lock"
+
+    def __init__(self, root=None, max_size=DEFAULT_MAX_SIZE):
+        """
+        :arg root: directory of the cache (default: :func:`default_cache_dir`)
+        :arg max_size: maximum size of the cache in bytes, ``None`` for no limit
+        """
+        if root is None:
+            root = default_cache_dir()
+        self.root = Path(root)
+        self.max_size = max_size
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._verified = {}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Holds the lock of the index, between the threads of the process and
+        between processes. The lock is reentrant within a thread.
+        """
+        with self._lock:
+            self._depth += 1
+            try:
+                if self._depth == 1:
+                    with file_lock(self.root.joinpath(self.LOCK_FILENAME)):
+                        yield
+                else:
+                    yield
+            finally:
+                self._depth -= 1
+
+    def _object_path(self, sha256):
+        return self.root.joinpath("objects", sha256[:2], sha256)
+
+    def _verify(self, sha256):
+        """
+        Returns whether the object *sha256* exists and matches its digest.
+        The digest is only computed again if the size or modification time of
+        the object changed since it was last verified by this instance.
+        """
+        filepath = self._object_path(sha256)
+        try:
+            stat = filepath.stat()
+        except FileNotFoundError:
+            return False
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._verified.get(sha256) == signature:
+            return True
+
+        if sha256sum(filepath) != sha256:
+            self._verified.pop(sha256, None)
+            return False
+
+        self._verified[sha256] = signature
+        return True
+
+    def _read_index(self):
+        filepath = self.root.joinpath(self.INDEX_FILENAME)
+        if not filepath.exists():
+            return {}
+
+        try:
+            with open(filepath, "r") as fp:
+                return json.load(fp)
+        except ValueError:
+            logger.warning("corrupted cache index {0}, starting over".format(filepath))
+            return {}
+
+    def _write_index(self, index):
+        self.root.mkdir(parents=True, exist_ok=True)
+        filepath = self.root.joinpath(self.INDEX_FILENAME)
+
+        fd, tmpfilepath = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(index, fp, indent=1, sort_keys=True)
+        os.replace(tmpfilepath, filepath)
+
+    def _remove_entry(self, index, key):
+        entry = index.pop(key)
+
+        if any(other["sha256"] == entry["sha256"] for other in index.values()):
+            return
+
+        self._verified.pop(entry["sha256"], None)
+        filepath = self._object_path(entry["sha256"])
+        if filepath.exists():
+            filepath.unlink()
+
+    def get(self, key, sha256=None):
+        """
+        Returns the path of the cached artifact for *key*, or ``None`` if the
+        artifact is not cached, does not match the expected *sha256* digest or
+        is corrupted.
+        The returned file must not be modified. Since it may be evicted by
+        another process at any time, use :meth:`copy` or :meth:`read_bytes`
+        to use its content.
+        """
+        with self._locked():
+            return self._get(key, sha256)
+
+    def copy(self, key, dst, sha256=None):
+        """
+        Hardlinks, or copies, the cached artifact for *key* at *dst* while
+        the cache is locked.
+        Hardlinked files are shared with the cache, so *dst* must be
+        replaced, never modified in place.
+
+        :return: *dst*, or ``None`` if the artifact is not cached, see
+            :meth:`get`
+        """
+        with self._locked():
+            filepath = self._get(key, sha256)
+            if filepath is None:
+                return None
+            _copy_or_link(filepath, dst)
+            return dst
+
+    def read_bytes(self, key, sha256=None):
+        """
+        Returns the content of the cached artifact for *key*, read while the
+        cache is locked, or ``None`` if the artifact is not cached, see
+        :meth:`get`.
+        """
+        with self._locked():
+            filepath = self._get(key, sha256)
+            if filepath is None:
+                return None
+            return filepath.read_bytes()
+
+    def _get(self, key, sha256=None):
+        index = self._read_index()
+        entry = index.get(key)
+        if entry is None:
+            return None
+
+        if sha256 is not None and entry["sha256"] != sha256.lower():
+            logger.debug("cache entry {0} has a different digest".format(key))
+            return None
+
+        if not self._verify(entry["sha256"]):
+            logger.warning("cache entry {0} is corrupted, removing it".format(key))
+            self._remove_entry(index, key)
+            self._write_index(index)
+            return None
+
+        now = time.time()
+        if now - entry["atime"] >= ATIME_RESOLUTION:
+            entry["atime"] = now
+            self._write_index(index)
+
+        filepath = self._object_path(entry["sha256"])
+
+        logger.debug("cache hit {0}".format(key))
+        return filepath
+
+    def put(self, key, filepath, sha256=None):
+        """
+        Stores the file at *filepath* in the cache under *key* and returns the
+        path of the cached artifact.
+        The returned file may be evicted by another process, see :meth:`get`.
+
+        :arg sha256: expected digest of the file; :exc:`IOError` is raised if
+            the file does not match
+        """
+        digest = sha256sum(filepath)
+        if sha256 is not None and digest != sha256.lower():
+            raise IOError(
+                "Checksum mismatch for {0}: expected {1}, got {2}".format(
+                    key, sha256, digest
+                )
+            )
+
+        with self._locked():
+            objectpath = self._object_path(digest)
+            if not objectpath.exists():
+                objectpath.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmpfilepath = tempfile.mkstemp(dir=objectpath.parent, suffix=".tmp")
+                os.close(fd)
+                shutil.copyfile(filepath, tmpfilepath)
+                os.replace(tmpfilepath, objectpath)
+
+                stat = objectpath.stat()
+                self._verified[digest] = (stat.st_size, stat.st_mtime_ns)
+
+            index = self._read_index()
+            index[key] = {
+                "sha256": digest,
+                "size": objectpath.stat().st_size,
+                "atime": time.time(),
+            }
+            self._write_index(index)
+
+            self.evict(keep=key)
+
+            return objectpath
+
+    def evict(self, max_size=None, keep=None):
+        """
+        Removes the least recently used entries until the total size of the
+        cache is below *max_size* (default: :attr:`max_size`).
+
+        :arg keep: key of an entry which must not be evicted
+        """
+        if max_size is None:
+            max_size = self.max_size
+
+        with self._locked():
+            index = self._read_index()
+            self._sweep(index)
+            if max_size is None:
+                return
+
+            sizes = {entry["sha256"]: entry["size"] for entry in index.values()}
+            total_size = sum(sizes.values())
+
+            for key in sorted(index, key=lambda key: index[key]["atime"]):
+                if total_size <= max_size:
+                    break
+                if key == keep:
+                    continue
+
+                sha256 = index[key]["sha256"]
+                logger.debug("evicting {0} from cache".format(key))
+                self._remove_entry(index, key)
+
+                if sha256 not in (entry["sha256"] for entry in index.values()):
+                    total_size -= sizes[sha256]
+
+            self._write_index(index)
+
+    def _sweep(self, index):
+        """
+        Removes the objects missing from the index, for instance left by an
+        interrupted process, so they do not take space forever.
+        """
+        objects_dir = self.root.joinpath("objects")
+        if not objects_dir.exists():
+            return
+
+        digests = {entry["sha256"] for entry in index.values()}
+        for filepath in objects_dir.glob("*/*"):
+            if filepath.name not in digests:
+                logger.debug("removing unindexed object {0}".format(filepath.name))
+                self._verified.pop(filepath.name, None)
+                filepath.unlink()
+
+    def clear(self):
+        """
+        Removes all artifacts from the cache.
+        The other files of the cache directory are kept.
+        """
+        with self._locked():
+            objects_dir = self.root.joinpath("objects")
+            if objects_dir.exists():
+                shutil.rmtree(objects_dir)
+            self._verified.clear()
+            index_filepath = self.root.joinpath(self.INDEX_FILENAME)
+            if index_filepath.exists():
+                index_filepath.unlink()
@@ -0,0 +1,491 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import json
+import queue
+import socket
+import secrets
+import inspect
+import argparse
+import threading
+import contextvars
+import socketserver
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+from py2win.cache import default_cache_dir, DEFAULT_MAX_SIZE
+from py2win.embed import EmbedPython
+
+# Globals and constants variables.
+DAEMON_VERSION = 1
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_MAX_WORKERS = 2
+
+"""
+File in the cache directory with the address and token of the running
+daemon, readable only by the user who started it.
+"""
+STATE_FILENAME = "daemon.json"
+
+"""
+Options of :class:`EmbedPython` which can be specified in a build spec.
+The cache directory is the one of the daemon.
+"""
+EMBED_OPTIONS = set(inspect.signature(EmbedPython).parameters) - {
+    "project_name",
+    "project_version",
+    "cache_dir",
+    "cache_max_size",
+}
+
+"""
+Status of the jobs.
+"""
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+_current_job = contextvars.ContextVar("py2win_daemon_job", default=None)
+
+
+def default_state_filepath(cache_dir=None):
+    """
+    Returns the path of the file with the address of the daemon using
+    *cache_dir* (default: default cache directory).
+    """
+    return Path(cache_dir or default_cache_dir()).joinpath(STATE_FILENAME)
+
+
+def _write_message(fp, message):
+    fp.write(json.dumps(message).encode("utf-8") + b"\n")
+    fp.flush()
+
+
+def _read_message(fp):
+    line = fp.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+class BuildJob:
+    """
+    Build submitted to the daemon.
+    The log records, then the result or the error of the build are put in
+    :attr:`events`, terminated by ``None``.
+    """
+
+    def __init__(self, spec):
+        self.id = secrets.token_hex(8)
+        self.spec = spec
+        self.status = JOB_QUEUED
+        self.events = queue.Queue()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "project": "{0}-{1}".format(
+                self.spec.get("project_name"), self.spec.get("project_version")
+            ),
+            "status": self.status,
+        }
+
+
+class _JobLogHandler(logging.Handler):
+    """
+    Forwards the log records of the build to the events of its job.
+    Records emitted by the stages of the build are forwarded too, since the
+    stages run with the context variables of the build.
+    """
+
+    def emit(self, record):
+        job = _current_job.get()
+        if job is None:
+            return
+
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        job.events.put({"event": "log", "level": record.levelname, "message": message})
+
+
+class BuildService:
+    """
+    Runs the builds of several specs in a pool of workers, keeping the
+    in-memory state of the previous builds warm: connections of the
+    downloader, compiled launchers and compiler.
+    Base trees are enabled by default, so interpreter trees are prepared once
+    and cloned for each build.
+
+    A build spec is a :class:`dict` with:
+
+    * ``project_name`` and ``project_version``
+    * ``dist_dir``: absolute path of the destination directory
+    * ``options``: arguments of :class:`EmbedPython` (e.g. ``python_version``,
+      ``arch``, ``cross_build``), see :data:`EMBED_OPTIONS`
+    * ``wheels``, ``requirements``, ``hidden_imports``: lists added with the
+      methods of :class:`EmbedPython`
+    * ``scripts``: list of ``[module, method, executable_name, console]``
+    * ``lock_file`` and ``update_lock``: lock file to use, written if it does
+      not exist or *update_lock* is true
+    * ``clean`` and ``zip_dist``: arguments of :meth:`EmbedPython.run`
+    """
+
+    def __init__(
+        self,
+        cache_dir=None,
+        cache_max_size=DEFAULT_MAX_SIZE,
+        max_workers=DEFAULT_MAX_WORKERS,
+        default_options=None,
+    ):
+        """
+        :arg cache_dir: directory of the artifact cache shared by all builds
+        :arg cache_max_size: maximum size of the artifact cache in bytes
+        :arg max_workers: maximum number of builds running concurrently
+        :arg default_options: arguments of :class:`EmbedPython` used unless
+            specified in the spec (default: ``base_tree=True``)
+        """
+        self.cache_dir = cache_dir
+        self.cache_max_size = cache_max_size
+        if default_options is None:
+            default_options = {"base_tree": True}
+        self.default_options = dict(default_options)
+
+        # Holds the state shared by the builds, including the pool of base
+        # trees, so concurrent builds of a target prepare its tree once
+        self._warm = self._new_embed("py2win-daemon", "0", {"base_tree": True})
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix="py2win-build"
+        )
+        self.jobs = []
+        self._lock = threading.Lock()
+
+        self._log_handler = _JobLogHandler()
+        self._log_handler.setFormatter(logging.Formatter("%(name)s: %(message)s"))
+        logging.getLogger("py2win").addHandler(self._log_handler)
+
+    def _new_embed(self, project_name, project_version, options):
+        return EmbedPython(
+            project_name,
+            project_version,
+            cache_dir=self.cache_dir,
+            cache_max_size=self.cache_max_size,
+            **options
+        )
+
+    def create_embed(self, spec):
+        """
+        Returns the :class:`EmbedPython` of *spec*, sharing the state of the
+        previous builds.
+        """
+        options = dict(self.default_options)
+        options.update(spec.get("options") or {})
+        unknown = sorted(set(options) - EMBED_OPTIONS)
+        if unknown:
+            raise ValueError("Unknown options: {}".format(", ".join(unknown)))
+
+        embed = self._new_embed(spec["project_name"], spec["project_version"], options)
+        embed.share_state(self._warm)
+
+        for filepath in spec.get("wheels", []):
+            embed.add_wheel(filepath)
+        for requirement in spec.get("requirements", []):
+            embed.add_requirement(requirement)
+        for module, method, executable_name, console in spec.get("scripts", []):
+            embed.add_script(module, method, executable_name, console)
+        for module in spec.get("hidden_imports", []):
+            embed.add_hidden_import(module)
+
+        lock_file = spec.get("lock_file")
+        if lock_file is not None:
+            if spec.get("update_lock") or not os.path.exists(lock_file):
+                logger.info("writing lock file {0}".format(lock_file))
+                embed.write_lock(lock_file)
+            embed.use_lock(lock_file)
+
+        return embed
+
+    def submit(self, spec):
+        """
+        Queues the build of *spec* and returns its :class:`BuildJob`.
+        """
+        if not Path(spec.get("dist_dir", "")).is_absolute():
+            raise ValueError("dist_dir must be an absolute path")
+
+        job = BuildJob(spec)
+        with self._lock:
+            self.jobs.append(job)
+
+        logger.info("queued job {0} ({1})".format(job.id, job.to_dict()["project"]))
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        token = _current_job.set(job)
+        job.status = JOB_RUNNING
+        try:
+            embed = self.create_embed(job.spec)
+            try:
+                workdirs = embed.run(
+                    job.spec["dist_dir"],
+                    job.spec.get("clean", True),
+                    job.spec.get("zip_dist", False),
+                )
+            finally:
+                report = embed.report.to_dict()
+
+            if not isinstance(workdirs, list):
+                workdirs = [workdirs]
+            job.status = JOB_DONE
+            job.events.put(
+                {
+                    "event": "result",
+                    "paths": [str(workdir) for workdir in workdirs],
+                    "report": report,
+                }
+            )
+        except Exception as ex:
+            logger.exception("job {0} failed".format(job.id))
+            job.status = JOB_FAILED
+            job.events.put({"event": "error", "message": str(ex)})
+        finally:
+            _current_job.reset(token)
+            with self._lock:
+                self.jobs.remove(job)
+            job.events.put(None)
+
+    def status(self):
+        """
+        Returns the queued and running jobs.
+        """
+        with self._lock:
+            return [job.to_dict() for job in self.jobs]
+
+    def close(self):
+        """
+        Waits for the queued builds and releases the resources.
+        """
+        self._executor.shutdown(wait=True)
+        logging.getLogger("py2win").removeHandler(self._log_handler)
+        self._warm.downloader.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = _read_message(self.rfile)
+        except ValueError:
+            return
+        if request is None:
+            return
+
+        if not secrets.compare_digest(str(request.get("token", "")), self.server.token):
+            _write_message(self.wfile, {"event": "error", "message": "Invalid token"})
+            return
+
+        action = request.get("action")
+        try:
+            if action == "build":
+                self._build(request.get("spec") or {})
+            elif action == "status":
+                jobs = self.server.service.status()
+                _write_message(self.wfile, {"event": "status", "jobs": jobs})
+            elif action == "shutdown":
+                _write_message(self.wfile, {"event": "shutdown"})
+                threading.Thread(target=self.server.shutdown).start()
+            else:
+                message = "Unknown action: {}".format(action)
+                _write_message(self.wfile, {"event": "error", "message": message})
+        except OSError:
+            logger.debug("client disconnected")
+
+    def _build(self, spec):
+        try:
+            job = self.server.service.submit(spec)
+        except (KeyError, ValueError) as ex:
+            _write_message(self.wfile, {"event": "error", "message": str(ex)})
+            return
+
+        _write_message(self.wfile, {"event": "queued", "job": job.id})
+
+        # The build goes on if the client disconnects
+        while True:
+            event = job.events.get()
+            if event is None:
+                break
+            _write_message(self.wfile, event)
+
+
+class BuildServer(socketserver.ThreadingTCPServer):
+    """
+    Local socket server of a :class:`BuildService`.
+    Requests and responses are JSON messages, one per line.
+    Each request contains the token written in the state file, so only the
+    user who started the daemon can submit builds.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, service, host=DEFAULT_HOST, port=0, state_filepath=None):
+        """
+        :arg service: :class:`BuildService` running the builds
+        :arg host: address to listen on, local by default
+        :arg port: port to listen on, any free port if ``0``
+        :arg state_filepath: file where the address and token are written
+            (default: ``daemon.json`` in the cache directory)
+        """
+        super().__init__((host, port), _RequestHandler)
+        self.service = service
+        self.token = secrets.token_hex(16)
+        if state_filepath is None:
+            state_filepath = default_state_filepath(service.cache_dir)
+        self.state_filepath = Path(state_filepath)
+        self._write_state()
+
+    def _write_state(self):
+        host, port = self.server_address[:2]
+        data = {
+            "version": DAEMON_VERSION,
+            "host": host,
+            "port": port,
+            "token": self.token,
+            "pid": os.getpid(),
+        }
+
+        self.state_filepath.parent.mkdir(parents=True, exist_ok=True)
+        tmpfilepath = self.state_filepath.with_name(self.state_filepath.name + ".tmp")
+        fd = os.open(tmpfilepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp)
+        os.replace(tmpfilepath, self.state_filepath)
+
+    def server_close(self):
+        super().server_close()
+        if self.state_filepath.exists():
+            self.state_filepath.unlink()
+
+
+class BuildClient:
+    """
+    Client of a running daemon, found with its state file.
+    """
+
+    def __init__(self, state_filepath=None, timeout=None):
+        """
+        :arg state_filepath: state file written by the daemon (default:
+            ``daemon.json`` in the default cache directory)
+        :arg timeout: timeout of the socket operations in seconds, ``None``
+            to wait for the builds
+        """
+        if state_filepath is None:
+            state_filepath = default_state_filepath()
+        self.state_filepath = Path(state_filepath)
+        self.timeout = timeout
+
+    def _request(self, request):
+        try:
+            with open(self.state_filepath, "r") as fp:
+                state = json.load(fp)
+        except (OSError, ValueError):
+            raise IOError(
+                "No py2win daemon running ({0} not found)".format(self.state_filepath)
+            )
+
+        if state.get("version") != DAEMON_VERSION:
+            raise IOError("Incompatible py2win daemon")
+
+        request = dict(request, token=state["token"])
+        sock = socket.create_connection((state["host"], state["port"]), self.timeout)
+        with sock, sock.makefile("rwb") as fp:
+            _write_message(fp, request)
+            while True:
+                message = _read_message(fp)
+                if message is None:
+                    return
+                yield message
+
+    def build(self, spec, log=None):
+        """
+        Submits the build of *spec* (see :class:`BuildService`) and waits for
+        it.
+
+        :arg log: callable ``log(level, message)`` called with the log records
+            of the build
+        :return: ``(paths, report)``, the directories of the distributions and
+            the build report
+        """
+        for message in self._request({"action": "build", "spec": spec}):
+            event = message.get("event")
+            if event == "log":
+                if log is not None:
+                    log(message["level"], message["message"])
+            elif event == "result":
+                return message["paths"], message["report"]
+            elif event == "error":
+                raise IOError("Build failed: {0}".format(message["message"]))
+
+        raise IOError("Connection to the py2win daemon lost")
+
+    def status(self):
+        """
+        Returns the queued and running jobs.
+        """
+        for message in self._request({"action": "status"}):
+            if message.get("event") == "error":
+                raise IOError(message["message"])
+            return message["jobs"]
+        raise IOError("Connection to the py2win daemon lost")
+
+    def shutdown(self):
+        """
+        Stops the daemon once the queued builds are done.
+        """
+        for _message in self._request({"action": "shutdown"}):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="py2win build daemon")
+    parser.add_argument("--cache-dir", help="directory of the artifact cache")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="maximum number of concurrent builds",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    service = BuildService(args.cache_dir, max_workers=args.max_workers)
+    server = BuildServer(service, args.host, args.port)
+    logger.info(
+        "listening on {0[0]}:{0[1]} ({1})".format(
+            server.server_address, server.state_filepath
+        )
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import csv
+import posixpath
+import fnmatch
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+from py2win.delta import hash_tree
+from py2win.installer import normalize_name
+
+# Globals and constants variables.
+SITE_PACKAGES = "Lib/site-packages/"
+
+"""
+DLLs of the Visual C++ and Universal C runtimes, redistributed with Python
+and with many packages. Only these DLLs are collapsed: other DLLs may be
+loaded from a computed path (e.g. ``os.add_dll_directory``).
+"""
+RUNTIME_DLL_PATTERNS = [
+    "vcruntime140*.dll",
+    "msvcp140*.dll",
+    "concrt140.dll",
+    "vccorlib140.dll",
+    "vcomp140.dll",
+    "ucrtbase.dll",
+    "api-ms-win-*.dll",
+]
+
+"""
+Names of the size breakdown for the files not installed by a distribution.
+"""
+PYTHON_PACKAGE = "<python>"
+STDLIB_PACKAGE = "<stdlib>"
+
+
+def find_duplicates(hashes, sizes):
+    """
+    Returns the groups of identical files, sorted by decreasing duplicate
+    bytes.
+
+    :arg hashes: :class:`dict` of the SHA-256 of the files per relative path,
+        see :func:`py2win.delta.hash_tree`
+    :arg sizes: :class:`dict` of the size of the files per relative path
+    :return: :class:`list` of :class:`dict` with the ``sha256`` and ``size``
+        of the content, the ``paths`` of the copies and the
+        ``duplicate_bytes`` of all copies but one
+    """
+    paths = collections.defaultdict(list)
+    for relpath, sha256 in hashes.items():
+        paths[sha256].append(relpath)
+
+    duplicates = []
+    for sha256, relpaths in paths.items():
+        size = sizes[relpaths[0]]
+        if len(relpaths) < 2 or size == 0:
+            continue
+
+        duplicates.append(
+            {
+                "sha256": sha256,
+                "size": size,
+                "paths": sorted(relpaths),
+                "duplicate_bytes": size * (len(relpaths) - 1),
+            }
+        )
+
+    duplicates.sort(key=lambda group: (-group["duplicate_bytes"], group["paths"]))
+    return duplicates
+
+
+def _top_level(relpath):
+    """
+    Returns the top-level package of a path in site-packages, without the
+    ``.libs`` suffix of the folders of vendored DLLs (e.g. ``numpy.libs``).
+    """
+    top = relpath[len(SITE_PACKAGES) :].split("/", 1)[0]
+    if top.endswith(".libs"):
+        top = top[: -len(".libs")]
+    return top
+
+
+def _is_referenced(dirpath, top, filename):
+    """
+    Returns whether a Python source of the top-level package *top* contains
+    *filename*, for instance to load the DLL from its path with
+    :mod:`ctypes`.
+    """
+    needle = filename.lower().encode("utf-8")
+    package_dir = Path(dirpath, SITE_PACKAGES, top)
+    filepaths = [Path(dirpath, SITE_PACKAGES, top + ".py")]
+    if package_dir.is_dir():
+        filepaths += package_dir.rglob("*.py")
+
+    for filepath in filepaths:
+        if filepath.is_file() and needle in filepath.read_bytes().lower():
+            return True
+    return False
+
+
+def is_runtime_dll(filename):
+    """
+    Returns whether *filename* is a DLL of the C runtimes, see
+    :data:`RUNTIME_DLL_PATTERNS`.
+    """
+    filename = filename.lower()
+    return any(fnmatch.fnmatch(filename, pattern) for pattern in RUNTIME_DLL_PATTERNS)
+
+
+def collapse_dlls(dirpath, duplicates):
+    """
+    Removes the copies of C runtime DLLs in site-packages identical to a DLL
+    of the same name in the application directory (next to ``python.exe``).
+    Windows looks up the dependencies of extension modules in the folder of
+    the module, then in the application directory, so the removed copies
+    resolve to the one of the application directory.
+    DLLs whose name appears in the Python sources of their package are kept,
+    since they may be loaded from their path.
+
+    :arg duplicates: groups of identical files returned by
+        :func:`find_duplicates`
+    :return: :class:`dict` of the removed paths and the path of the copy
+        kept in the application directory
+    """
+    collapsed = {}
+
+    for group in duplicates:
+        app_dlls = {
+            relpath.lower(): relpath
+            for relpath in group["paths"]
+            if "/" not in relpath and relpath.lower().endswith(".dll")
+        }
+
+        for relpath in group["paths"]:
+            if not relpath.startswith(SITE_PACKAGES):
+                continue
+
+            filename = posixpath.basename(relpath)
+            app_dll = app_dlls.get(filename.lower())
+            if app_dll is None or not is_runtime_dll(filename):
+                continue
+
+            if _is_referenced(dirpath, _top_level(relpath), filename):
+                logger.debug("keeping {0}, referenced by its package".format(relpath))
+                continue
+
+            logger.debug("removing {0}, same as {1}".format(relpath, app_dll))
+            Path(dirpath, relpath).unlink()
+            collapsed[relpath] = app_dll
+
+    return collapsed
+
+
+def _read_records(dirpath):
+    """
+    Returns the name of the distribution owning each file of site-packages,
+    from the ``RECORD`` of the installed distributions.
+    """
+    owners = {}
+    site_packages = Path(dirpath, SITE_PACKAGES)
+    if not site_packages.exists():
+        return owners
+
+    for record_filepath in site_packages.glob("*.dist-info/RECORD"):
+        name = record_filepath.parent.name[: -len(".dist-info")].rsplit("-", 1)[0]
+        name = normalize_name(name)
+
+        with open(record_filepath, "r", newline="", encoding="utf-8") as fp:
+            for row in csv.reader(fp):
+                if not row:
+                    continue
+                relpath = posixpath.normpath(SITE_PACKAGES + row[0])
+                owners[relpath] = name
+
+    return owners
+
+
+def package_sizes(dirpath, sizes):
+    """
+    Returns the size of the files of each distribution installed in
+    site-packages, found from their ``RECORD``.
+    Other files of site-packages are counted by top-level folder, the files of
+    ``Lib`` as :data:`STDLIB_PACKAGE` and the other files as
+    :data:`PYTHON_PACKAGE`.
+
+    :arg sizes: :class:`dict` of the size of the files per relative path
+    """
+    owners = _read_records(dirpath)
+
+    packages = collections.Counter()
+    for relpath, size in sizes.items():
+        name = owners.get(relpath)
+        if name is None:
+            if relpath.startswith(SITE_PACKAGES):
+                name = relpath[len(SITE_PACKAGES) :].split("/", 1)[0]
+            elif relpath.startswith("Lib/"):
+                name = STDLIB_PACKAGE
+            else:
+                name = PYTHON_PACKAGE
+        packages[name] += size
+
+    return dict(packages.most_common())
+
+
+def deduplicate_tree(dirpath, collapse=True, max_workers=None):
+    """
+    Hashes all files of the distribution *dirpath* concurrently, finds the
+    identical files and, if *collapse* is true, removes the copies of DLLs
+    which can be loaded from the application directory instead (see
+    :func:`collapse_dlls`).
+
+    :return: :class:`dict` with the groups of identical files
+        (``duplicates``), the ``duplicate_bytes`` before collapsing, the
+        ``collapsed`` files, the ``collapsed_bytes`` and the size of each
+        package (``packages``) after collapsing
+    """
+    dirpath = Path(dirpath)
+
+    logger.info("hashing files of {0}".format(dirpath))
+    hashes = hash_tree(dirpath, max_workers)
+    sizes = {relpath: os.path.getsize(dirpath.joinpath(relpath)) for relpath in hashes}
+
+    duplicates = find_duplicates(hashes, sizes)
+    duplicate_bytes = sum(group["duplicate_bytes"] for group in duplicates)
+    logger.info(
+        "{0} duplicate bytes in {1} groups of identical files".format(
+            duplicate_bytes, len(duplicates)
+        )
+    )
+
+    collapsed = collapse_dlls(dirpath, duplicates) if collapse else {}
+    collapsed_bytes = sum(sizes.pop(relpath) for relpath in collapsed)
+    if collapsed:
+        logger.info(
+            "removed {0} DLLs ({1} bytes)".format(len(collapsed), collapsed_bytes)
+        )
+
+    return {
+        "duplicates": duplicates,
+        "duplicate_bytes": duplicate_bytes,
+        "collapsed": collapsed,
+        "collapsed_bytes": collapsed_bytes,
+        "packages": package_sizes(dirpath, sizes),
+    }
@@ -0,0 +1,216 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import json
+import zipfile
+import hashlib
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+from py2win.cache import sha256sum
+from py2win.archive import (
+    DEFAULT_COMPRESSLEVEL,
+    compress_data,
+    get_compresslevel,
+    zip_date_time,
+    write_member,
+)
+from py2win.applydelta import DELTA_VERSION, MANIFEST_ARCNAME, FILES_ARCNAME
+
+# Globals and constants variables.
+
+
+def _zip_prefix(names):
+    """
+    Returns the folder containing all members of a zip of a distribution
+    (e.g. ``sample-1.2.0/``), or an empty string.
+    """
+    prefixes = {name.split("/", 1)[0] for name in names}
+    if len(prefixes) == 1 and all("/" in name for name in names):
+        return prefixes.pop() + "/"
+    return ""
+
+
+class _DirectoryTree:
+    def __init__(self, dirpath):
+        self.dirpath = Path(dirpath)
+
+    def relpaths(self):
+        relpaths = []
+        for dirpath, _dirnames, filenames in os.walk(self.dirpath):
+            reldirpath = Path(dirpath).relative_to(self.dirpath)
+            relpaths.extend(
+                (reldirpath / filename).as_posix() for filename in filenames
+            )
+        return relpaths
+
+    def sha256(self, relpath):
+        return sha256sum(self.dirpath.joinpath(relpath))
+
+    def open(self, relpath):
+        return open(self.dirpath.joinpath(relpath), "rb")
+
+    def close(self):
+        pass
+
+
+class _ZipTree:
+    def __init__(self, filepath):
+        self.zf = zipfile.ZipFile(filepath, "r")
+        names = [info.filename for info in self.zf.infolist() if not info.is_dir()]
+        self.prefix = _zip_prefix(names)
+        self.names = {name[len(self.prefix) :]: name for name in names}
+
+    def relpaths(self):
+        return list(self.names)
+
+    def sha256(self, relpath):
+        sha256 = hashlib.sha256()
+        # ZipFile supports reading members concurrently from several threads
+        with self.zf.open(self.names[relpath], "r") as fp:
+            for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def open(self, relpath):
+        return self.zf.open(self.names[relpath], "r")
+
+    def close(self):
+        self.zf.close()
+
+
+def _open_tree(path):
+    path = Path(path)
+    if path.is_dir():
+        return _DirectoryTree(path)
+    if zipfile.is_zipfile(path):
+        return _ZipTree(path)
+    raise IOError("Not a distribution directory or zip: {0}".format(path))
+
+
+def _hash_tree(tree, max_workers=None):
+    relpaths = sorted(tree.relpaths())
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return dict(zip(relpaths, executor.map(tree.sha256, relpaths)))
+
+
+def hash_tree(path, max_workers=None):
+    """
+    Returns the SHA-256 of each file of the distribution *path*, either a
+    directory or a zip created with the distribution, per relative path
+    (e.g. ``Lib/site-packages/sample/__init__.py``).
+    """
+    tree = _open_tree(path)
+    try:
+        return _hash_tree(tree, max_workers)
+    finally:
+        tree.close()
+
+
+def compare_trees(old_hashes, new_hashes):
+    """
+    Returns the manifest of the delta between two distributions, from the
+    hashes returned by :func:`hash_tree`: the added files with their new
+    hash, the changed files with their old and new hashes, and the removed
+    files with their old hash.
+    """
+    manifest = {
+        "version": DELTA_VERSION,
+        "added": {},
+        "changed": {},
+        "removed": {},
+        "unchanged": 0,
+    }
+
+    for relpath, new_sha256 in sorted(new_hashes.items()):
+        old_sha256 = old_hashes.get(relpath)
+        if old_sha256 is None:
+            manifest["added"][relpath] = new_sha256
+        elif old_sha256 != new_sha256:
+            manifest["changed"][relpath] = [old_sha256, new_sha256]
+        else:
+            manifest["unchanged"] += 1
+
+    for relpath, old_sha256 in sorted(old_hashes.items()):
+        if relpath not in new_hashes:
+            manifest["removed"][relpath] = old_sha256
+
+    return manifest
+
+
+def create_delta(
+    old_path,
+    new_path,
+    filepath,
+    compresslevel=DEFAULT_COMPRESSLEVEL,
+    compresslevels=None,
+    max_workers=None,
+):
+    """
+    Creates a delta package to update the distribution *old_path* into
+    *new_path*.
+    Both distributions can be directories or zips created with the
+    distribution.
+    The files are compared by content: the delta package only contains the
+    added and changed files, and a manifest of the added, changed and
+    removed files with their hashes.
+
+    The delta package is an executable zip, applied with
+    ``python <filepath> <distribution directory>`` or :func:`apply_delta`.
+
+    :arg filepath: path of the delta package
+    :arg compresslevel: default deflate level, see
+        :func:`py2win.archive.create_archive`
+    :arg compresslevels: :class:`dict` of deflate levels per file suffix
+    :return: manifest of the delta
+    """
+    filepath = Path(filepath)
+    old_tree = _open_tree(old_path)
+    new_tree = _open_tree(new_path)
+    try:
+        logger.info("comparing {0} and {1}".format(old_path, new_path))
+        old_hashes = _hash_tree(old_tree, max_workers)
+        new_hashes = _hash_tree(new_tree, max_workers)
+        manifest = compare_trees(old_hashes, new_hashes)
+
+        date_time = zip_date_time()
+        relpaths = sorted(list(manifest["added"]) + list(manifest["changed"]))
+
+        tmpfilepath = filepath.with_name(filepath.name + ".tmp")
+        with zipfile.ZipFile(tmpfilepath, "w") as zf:
+            data = json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8")
+            member = compress_data(data, compresslevel)
+            write_member(zf, MANIFEST_ARCNAME, member, date_time)
+
+            data = Path(__file__).with_name("applydelta.py").read_bytes()
+            member = compress_data(data, compresslevel)
+            write_member(zf, "__main__.py", member, date_time)
+
+            for relpath in relpaths:
+                with new_tree.open(relpath) as fp:
+                    data = fp.read()
+                level = get_compresslevel(relpath, compresslevel, compresslevels)
+                member = compress_data(data, level)
+                write_member(zf, FILES_ARCNAME + relpath, member, date_time)
+
+        os.replace(tmpfilepath, filepath)
+    finally:
+        old_tree.close()
+        new_tree.close()
+
+    logger.info(
+        "delta: {0} added, {1} changed, {2} removed, {3} unchanged".format(
+            len(manifest["added"]),
+            len(manifest["changed"]),
+            len(manifest["removed"]),
+            manifest["unchanged"],
+        )
+    )
+    return manifest
@@ -0,0 +1,324 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import time
+import threading
+import contextlib
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+import requests
+import requests.adapters
+
+# Local modules.
+from py2win.cache import sha256sum
+
+# Globals and constants variables.
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+DEFAULT_TIMEOUT = 60.0
+
+"""
+Size of the chunks read from the response. The chunk being read when the
+connection breaks is lost, so it is kept small.
+"""
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_POOL_SIZE = 10
+
+"""
+HTTP status codes of transient errors, retried with backoff.
+"""
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+"""
+Suffix of the partial file written during a download.
+"""
+PART_SUFFIX = ".part"
+
+
+class DownloadStats(
+    collections.namedtuple(
+        "DownloadStats", ["url", "size", "bytes", "duration", "attempts", "resumed"]
+    )
+):
+    """
+    Statistics of a download.
+
+    :arg url: URL of the file
+    :arg size: size of the downloaded file
+    :arg bytes: bytes transferred, including the failed attempts
+    :arg duration: duration of the download in seconds
+    :arg attempts: number of requests
+    :arg resumed: number of times the download was resumed with a range
+        request
+    """
+
+    @property
+    def throughput(self):
+        """
+        Transfer rate in bytes per second.
+        """
+        if self.duration <= 0:
+            return 0.0
+        return self.bytes / self.duration
+
+
+class RetryableError(IOError):
+    """
+    Transient error, the request may succeed if it is sent again.
+    """
+
+
+class _CountingReader:
+    """
+    Wraps a file-like object and counts the bytes read.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.fp.read(size)
+        self.count += len(data)
+        return data
+
+
+class Downloader:
+    """
+    Downloads files over HTTP with a shared session, so connections are reused
+    between downloads.
+    Failed requests are retried with exponential backoff, and interrupted
+    downloads are resumed with range requests.
+    Files are written in a partial file and renamed once complete.
+
+    The statistics of the downloads are kept in :attr:`stats` and hooks added
+    with :meth:`add_hook` are called with the :class:`DownloadStats` of each
+    download.
+    """
+
+    def __init__(
+        self,
+        retries=DEFAULT_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+        timeout=DEFAULT_TIMEOUT,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        pool_size=DEFAULT_POOL_SIZE,
+    ):
+        """
+        :arg retries: maximum number of retries of a download
+        :arg backoff: delay before the first retry in seconds, doubled at each
+            retry
+        :arg timeout: timeout to connect and between bytes, in seconds
+        :arg chunk_size: size of the chunks written to the file
+        :arg pool_size: maximum number of connections kept per host
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.stats = []
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def add_hook(self, hook):
+        """
+        Adds a callable ``hook(stats)`` called after each download.
+        """
+        self.hooks.append(hook)
+
+    def _record(self, stats):
+        with self._lock:
+            self.stats.append(stats)
+
+        logger.debug(
+            "downloaded {0} ({1} bytes in {2:.3f} s, {3:.0f} B/s)".format(
+                stats.url, stats.bytes, stats.duration, stats.throughput
+            )
+        )
+
+        for hook in self.hooks:
+            try:
+                hook(stats)
+            except Exception:
+                logger.exception("download hook failed")
+
+    def _sleep(self, attempt):
+        time.sleep(min(self.backoff * 2**attempt, MAX_BACKOFF))
+
+    def _get(self, url, headers=None):
+        r = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        if r.status_code in RETRY_STATUS_CODES:
+            r.close()
+            raise RetryableError("HTTP {0} for {1}".format(r.status_code, url))
+        return r
+
+    def _fetch(self, url, part_filepath, progress):
+        """
+        Sends one request and writes the content in *part_filepath*, resuming
+        after the bytes already written if the file did not change since the
+        first response.
+
+        :arg progress: :class:`dict` with the ``validator`` of the file
+            (``ETag`` or ``Last-Modified`` of the first response), the bytes
+            ``transferred`` and the number of times the download was
+            ``resumed``, updated as the content is received
+        """
+        offset = part_filepath.stat().st_size if part_filepath.exists() else 0
+
+        # Content is not encoded, so ranges are offsets in the file
+        headers = {"Accept-Encoding": "identity"}
+        if offset and progress["validator"]:
+            # The whole file is sent again if it changed
+            headers["Range"] = "bytes={0}-".format(offset)
+            headers["If-Range"] = progress["validator"]
+
+        with self._get(url, headers) as r:
+            if r.status_code == 206:
+                if _content_range_start(r.headers.get("Content-Range")) != offset:
+                    part_filepath.unlink()
+                    raise RetryableError("Unexpected range for {0}".format(url))
+                logger.info("resuming {0} at {1} bytes".format(url, offset))
+                progress["resumed"] += 1
+                mode = "ab"
+            elif r.status_code == 200:
+                progress["validator"] = r.headers.get("ETag") or r.headers.get(
+                    "Last-Modified"
+                )
+                mode = "wb"
+            else:
+                raise IOError(
+                    "Cannot download {0} (HTTP {1})".format(url, r.status_code)
+                )
+
+            received = 0
+            with open(part_filepath, mode) as fp:
+                for chunk in r.iter_content(self.chunk_size):
+                    fp.write(chunk)
+                    received += len(chunk)
+                    progress["transferred"] += len(chunk)
+
+            expected = r.headers.get("Content-Length")
+            if expected is not None and received != int(expected):
+                raise RetryableError("Incomplete download of {0}".format(url))
+
+    def download(self, url, filepath, sha256=None):
+        """
+        Downloads the file at *url* and saves it at *filepath*.
+        The file is written in *filepath* with a ``.part`` suffix, resumed
+        from where it stopped if a request fails, and renamed once complete.
+        If *sha256* is specified, the digest of the file must match.
+
+        :return: :class:`DownloadStats`
+        """
+        filepath = Path(filepath)
+        part_filepath = filepath.with_name(filepath.name + PART_SUFFIX)
+        if part_filepath.exists():
+            part_filepath.unlink()
+
+        progress = {"validator": None, "transferred": 0, "resumed": 0}
+        start = time.perf_counter()
+
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    self._fetch(url, part_filepath, progress)
+                    break
+                except (
+                    RetryableError,
+                    requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError,
+                ) as ex:
+                    if attempt > self.retries:
+                        raise IOError("Cannot download {0}: {1}".format(url, ex))
+
+                    logger.warning(
+                        "download of {0} failed ({1}), retrying".format(url, ex)
+                    )
+                    self._sleep(attempt - 1)
+
+            if sha256 is not None and sha256sum(part_filepath) != sha256:
+                raise IOError("Checksum mismatch for {}".format(url))
+
+            os.replace(part_filepath, filepath)
+        finally:
+            if part_filepath.exists():
+                part_filepath.unlink()
+
+        stats = DownloadStats(
+            url,
+            filepath.stat().st_size,
+            progress["transferred"],
+            time.perf_counter() - start,
+            attempt,
+            progress["resumed"],
+        )
+        self._record(stats)
+        return stats
+
+    @contextlib.contextmanager
+    def open(self, url):
+        """
+        Opens the file at *url* for reading as a stream, with the content
+        decoded.
+        Only the request is retried, not the reading of the stream.
+        """
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            attempt += 1
+            try:
+                r = self._get(url)
+                break
+            except (RetryableError, requests.ConnectionError, requests.Timeout) as ex:
+                if attempt > self.retries:
+                    raise IOError("Cannot download {0}: {1}".format(url, ex))
+                logger.warning("request of {0} failed ({1}), retrying".format(url, ex))
+                self._sleep(attempt - 1)
+
+        if r.status_code != 200:
+            r.close()
+            raise IOError("Cannot download {0} (HTTP {1})".format(url, r.status_code))
+
+        r.raw.decode_content = True
+        reader = _CountingReader(r.raw)
+        try:
+            yield reader
+        finally:
+            r.close()
+            duration = time.perf_counter() - start
+            self._record(
+                DownloadStats(url, reader.count, reader.count, duration, attempt, 0)
+            )
+
+
+def _content_range_start(value):
+    """
+    Returns the first byte of a ``Content-Range`` header (e.g.
+    ``bytes 100-199/200``), or ``None``.
+    """
+    try:
+        unit, spec = value.split(" ", 1)
+        return int(spec.split("-", 1)[0]) if unit == "bytes" else None
+    except (AttributeError, ValueError):
+        return None
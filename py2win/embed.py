@@ -7,25 +7,85 @@ import sys
 import shutil
 import zipfile
 import tarfile
-import fnmatch
 import subprocess
-import sysconfig
-from setuptools._distutils.ccompiler import new_compiler
+import tempfile
+import json
+import copy
+import hashlib
+import threading
+import contextlib
+import contextvars
+import functools
+import urllib.parse
+import urllib.request
+import concurrent.futures
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Third party modules.
-import requests
-import requests_cache
-
-requests_cache.install_cache()
+from packaging.utils import parse_wheel_filename
 
 # Local modules.
+from py2win.cache import ArtifactCache, DEFAULT_MAX_SIZE, sha256sum
+from py2win.target import Target
+from py2win.installer import WheelInstaller
+from py2win.lock import LockFile
+from py2win.wheelhouse import WheelIndex, read_wheel_requires, pinned_versions
+from py2win.state import BuildState, digest_inputs
+from py2win.bytecode import compile_tree
+from py2win.ziplib import (
+    repack_stdlib,
+    zip_site_packages,
+    write_pth,
+    SITE_PACKAGES_ZIP_FILENAME,
+)
+from py2win.launcher import (
+    get_launcher_key,
+    compile_launchers,
+    stamp_launcher,
+    LAUNCHER_VARIANTS,
+)
+from py2win.shake import shake_tree
+from py2win.dedup import deduplicate_tree
+from py2win.archive import create_archive, DEFAULT_COMPRESSLEVEL
+from py2win.report import BuildReport
+from py2win.basetree import BaseTreePool, clone_tree
+from py2win.download import Downloader, DEFAULT_POOL_SIZE
+from py2win.scheduler import Scheduler, DEFAULT_MAX_WORKERS
+from py2win.wheelcache import WheelBuildCache, is_sdist, target_tag
 
 # Globals and constants variables.
 
 
+def _to_url(location):
+    """
+    Returns *location* as a URL, converting local paths to ``file://`` URLs.
+    """
+    location = str(location)
+    if "://" in location:
+        return location
+    return Path(location).resolve().as_uri()
+
+
+def _url_to_path(url):
+    """
+    Returns the local path of a ``file://`` URL, otherwise ``None``.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme != "file":
+        return None
+    return Path(urllib.request.url2pathname(parsed.path))
+
+
+def _target_dist_tag(target):
+    """
+    Returns the suffix of the distribution of *target* built with others
+    (e.g. ``cp310-win_amd64``).
+    """
+    return "{0.python_tag}-{0.platform_tag}".format(target)
+
+
 class EmbedPython:
 
     PYTHON_SOURCE_BASEURL = (
@@ -35,92 +95,348 @@ class EmbedPython:
         "https://www.python.org/ftp/python/{version}/python-{version}-embed-{arch}.zip"
     )
     GET_PIP_URL = "https://bootstrap.pypa.io/get-pip.py"
+    LIB2TO3_DIRS = (
+        ("Lib", "lib2to3", "fixes"),
+        ("Lib", "lib2to3", "pgen2"),
+    )
     PYTHON_MANIFEST_URL = (
-        "https://raw.githubusercontent.com/python/cpython/master/PC/python.manifest"
+        "https://raw.githubusercontent.com/python/cpython/v{version}/PC/python.manifest"
     )
 
-    PYTHON_GUI_MAIN_CODE = """
-#include <windows.h>
-#include <stdio.h>
-#include "Python.h"
-
-int WINAPI wWinMain(HINSTANCE hInstance, HINSTANCE hPrevInstance,
-                   LPWSTR lpstrCmd, int nShow)
-{{
-    wchar_t *args[] = {{ L"-I", L"-c", L"import {module}; {module}.{method}()" }};
-    return Py_Main(3, args);
-}}
-    """
-
-    """
-    According to the Python sys.argv documentation, "If the command was executed using the -c command line option to the interpreter, argv[0] is set to the string '-c'".
-    This causes problem with argument parsers which expects the program name to be the first argument.
-    The ``sys.argv`` are therefore modified to set first argument as the executable.
-    """
-    PYTHON_CONSOLE_MAIN_CODE = """
-#include <stdio.h>
-#include <Python.h>
-
-int main(int argc, char *argv[])
-{{
-    wchar_t** _argv = PyMem_Malloc(sizeof(wchar_t*)*(argc + 2));
-    _argv[0] = L"-I";
-    _argv[1] = L"-c";
-    _argv[2] = L"import sys; sys.argv[0] = sys.executable; import {module}; {module}.{method}()";
-    for (int i=1; i<argc; i++) {{
-      wchar_t* arg = Py_DecodeLocale(argv[i], NULL);
-      _argv[i + 2] = arg;
-    }}
-
-    int returncode = Py_Main(argc + 2, _argv);
-
-    PyMem_Free(_argv);
-
-    return returncode;
-}}
-    """
-
-    def __init__(self, project_name, project_version, extra_wheel_dir=None):
+    def __init__(
+        self,
+        project_name,
+        project_version,
+        extra_wheel_dir=None,
+        cache_dir=None,
+        cache_max_size=DEFAULT_MAX_SIZE,
+        fix_lib2to3=True,
+        python_version=None,
+        arch=None,
+        targets=None,
+        cross_build=False,
+        installer="pip",
+        max_workers=None,
+        compile_bytecode=False,
+        optimize=0,
+        invalidation_mode="unchecked-hash",
+        drop_sources=False,
+        zip_stdlib=False,
+        zip_site_packages=False,
+        tree_shaking=False,
+        dedup=False,
+        compresslevel=DEFAULT_COMPRESSLEVEL,
+        compresslevels=None,
+        python_mirror=None,
+        get_pip_url=None,
+        manifest_url=None,
+        index_url=None,
+        wheel_cache_dir=None,
+        offline=False,
+        base_tree=False,
+        clone_mode="auto",
+        launcher="py_main",
+        launcher_site=True,
+        concurrent_stages=DEFAULT_MAX_WORKERS,
+    ):
         """
         Creates the class to create an embedded distribution.
 
         Use :meth:`add_wheel` to add wheel(s) associated to the project.
         Use :meth:`add_script` to specify which script to convert to an executable.
         Then call :meth:`run`.
+        The duration and counters of each stage are recorded in
+        :attr:`report`, a :class:`BuildReport`.
 
         :arg project_name: project name
         :arg project_version: project version (e.g. ``0.1.2``)
         :arg extra_wheel_dir: directory containing wheels to use instead of
-            downloading them from PyPI
+            downloading them from PyPI. The directory is indexed and only the
+            wheels needed by the project are passed to pip.
+        :arg cache_dir: directory of the artifact cache where downloaded files
+            are kept between builds (default: ``PY2WIN_CACHE_DIR`` environment
+            variable or user cache directory)
+        :arg cache_max_size: maximum size of the artifact cache in bytes,
+            ``None`` for no limit. Base trees are not counted, they are
+            limited in number.
+        :arg fix_lib2to3: whether to add the lib2to3 fixers missing from the
+            embedded distribution. Set to ``False`` if no package requires
+            lib2to3. The step is always skipped for Python versions without
+            lib2to3.
+        :arg python_version: Python version of the distribution
+            (default: version of the running interpreter)
+        :arg arch: architecture of the distribution, ``amd64``, ``win32`` or
+            ``arm64`` (default: architecture of the running interpreter)
+        :arg targets: list of ``(python_version, arch)`` to build all at once,
+            instead of *python_version* and *arch*. The targets are built
+            concurrently and share the downloads and the launchers. Each
+            target has its own directory and zip, named after the project
+            and the Python and platform tags (e.g.
+            ``sample-1.2.0-cp310-win_amd64``), so two targets cannot have
+            the same tags.
+        :arg cross_build: whether to install the packages with the running
+            interpreter, using only binary wheels compatible with the target
+            Python version and architecture. The embedded interpreter is never
+            executed, so the distribution can be built on any platform.
+        :arg installer: how the wheels added with :meth:`add_wheel` are
+            installed, either ``pip`` or ``builtin``. The ``builtin`` installer
+            unpacks the wheels concurrently without resolving their
+            dependencies. If no requirement is added, pip is then not
+            installed in the distribution.
+        :arg max_workers: maximum number of concurrent workers
+        :arg compile_bytecode: whether to compile all Python sources of the
+            distribution to bytecode, so nothing is compiled on the user's
+            machine. The running interpreter must have the same major and
+            minor version as the distribution.
+        :arg optimize: optimization level of the bytecode (``0``, ``1`` or
+            ``2``). Levels above ``0`` require *drop_sources*, since the
+            ``.opt-N.pyc`` files next to the sources are never loaded by the
+            executables.
+        :arg invalidation_mode: how the bytecode is checked against its source,
+            ``timestamp``, ``checked-hash`` or ``unchecked-hash``
+        :arg drop_sources: whether to remove the compiled sources
+        :arg zip_stdlib: whether to keep the standard library in an
+            uncompressed zip of bytecode, instead of extracting it in ``Lib``.
+            The module search path is then defined in a ``._pth`` file.
+        :arg zip_site_packages: whether to move the zip-safe pure Python
+            packages of site-packages in an uncompressed zip. Packages with
+            native extensions, data files or referring to ``__file__`` are
+            kept on disk.
+        :arg tree_shaking: whether to remove the modules and packages of the
+            standard library and site-packages which are not imported, directly
+            or indirectly, by the scripts. Modules imported dynamically must be
+            added with :meth:`add_hidden_import`. The running interpreter must
+            have the same major and minor version as the distribution.
+        :arg dedup: whether to find the identical files of the distribution
+            once the packages are installed, and remove the copies of DLLs in
+            site-packages identical to a DLL of the application directory.
+            The duplicates and the size of each package are written in
+            ``<name>.py2win-dedup.json`` and identical files are compressed
+            once in the zip of the distribution.
+        :arg compresslevel: deflate level of the zip of the distribution
+            (``0`` to ``9``)
+        :arg compresslevels: :class:`dict` of deflate levels per file suffix
+            (e.g. ``{".pyc": 9}``), ``0`` to store the files without
+            compression. Already compressed files (e.g. ``.pyd``, ``.dll``,
+            ``.zip``) are stored by default.
+        :arg python_mirror: URL or local directory with the same layout as
+            https://www.python.org/ftp/python, where the embedded
+            distributions and source tarballs are downloaded from
+        :arg get_pip_url: URL or local path of ``get-pip.py``
+        :arg manifest_url: URL or local path of the manifest of the launchers.
+            It may contain ``{version}``, replaced by the Python version
+            (default: manifest of the release tag in the CPython repository)
+        :arg index_url: URL of the package index used by pip
+        :arg wheel_cache_dir: directory of the wheels built from source
+            distributions, which can be shared between build agents. The
+            packages to install are first downloaded with pip, which resolves
+            all dependencies, and the source distributions are built
+            concurrently, once per Python version and architecture, then
+            installed as wheels. The download is skipped by the next builds
+            with the same wheels and requirements, as long as the wheels are
+            in the cache, so a new release of a package is only built when
+            the requirements change. Not used when cross building or with a
+            lock file, since only binary wheels are then installed.
+        :arg offline: whether to only use local artifacts (``file://`` URLs,
+            local paths and the artifact cache). The build fails before
+            starting if an artifact would need to be downloaded, and pip only
+            uses *extra_wheel_dir*.
+        :arg base_tree: whether to keep a pristine interpreter tree per Python
+            version and architecture in the cache directory (embedded
+            distribution, standard library, lib2to3 fixers and pip), and to
+            create new distributions by cloning it
+        :arg clone_mode: how base trees are cloned: ``reflink``,
+            ``hardlink``, ``copy`` or ``auto`` to use the first one supported
+            by the filesystem
+        :arg launcher: variant of the executables of the scripts: ``py_main``
+            runs the entry point with ``python -I -c``, ``pyconfig``
+            initializes Python with a precomputed module search path and calls
+            the entry point directly, which starts faster
+        :arg launcher_site: whether the ``pyconfig`` executables import the
+            :mod:`site` module. Without it, ``.pth`` files are not processed
+            and startup is faster.
+        :arg concurrent_stages: maximum number of stages run concurrently.
+            Independent stages overlap, for instance ``get-pip.py`` is
+            downloaded and the launchers are compiled while the interpreter
+            is installed. ``1`` runs the stages in sequence.
         """
         self.project_name = project_name
         self.project_version = project_version
-        self.extra_wheel_dir = extra_wheel_dir
+        self.extra_wheel_dir = (
+            Path(extra_wheel_dir) if extra_wheel_dir is not None else None
+        )
+        self.cache = ArtifactCache(cache_dir, cache_max_size)
+        self.fix_lib2to3 = fix_lib2to3
+
+        host = Target.host()
+        if targets:
+            if python_version is not None or arch is not None:
+                raise ValueError("Specify either targets or python_version and arch")
+            self.targets = [Target(*target) for target in targets]
+            if len(set(self.targets)) != len(self.targets):
+                raise ValueError("Duplicate targets")
+
+            tags = {}
+            for target in self.targets:
+                tag = _target_dist_tag(target)
+                if tag in tags:
+                    raise ValueError(
+                        "Targets {0} and {1} have the same tags {2}".format(
+                            tags[tag].python_version, target.python_version, tag
+                        )
+                    )
+                tags[tag] = target
+        else:
+            self.targets = [
+                Target(python_version or host.python_version, arch or host.arch)
+            ]
+        self.target = self.targets[0]
+        self.cross_build = cross_build
+
+        if installer not in ("pip", "builtin"):
+            raise ValueError("Unknown installer: {}".format(installer))
+        self.installer = installer
+        self.max_workers = max_workers
+        if compile_bytecode and optimize and not drop_sources:
+            raise ValueError("Optimized bytecode requires drop_sources")
+        self.compile_bytecode = compile_bytecode
+        self.optimize = optimize
+        self.invalidation_mode = invalidation_mode
+        self.drop_sources = drop_sources
+        self.zip_stdlib = zip_stdlib
+        self.zip_site_packages = zip_site_packages
+        self.tree_shaking = tree_shaking
+        self.dedup = dedup
+        self.compresslevel = compresslevel
+        self.compresslevels = dict(compresslevels or {})
+
+        if python_mirror is not None:
+            python_mirror = _to_url(python_mirror).rstrip("/")
+            self.PYTHON_SOURCE_BASEURL = (
+                python_mirror + "/{version}/Python-{version}.tgz"
+            )
+            self.PYTHON_EMBED_BASEURL = (
+                python_mirror + "/{version}/python-{version}-embed-{arch}.zip"
+            )
+        if get_pip_url is not None:
+            self.GET_PIP_URL = _to_url(get_pip_url)
+        if manifest_url is not None:
+            self.PYTHON_MANIFEST_URL = _to_url(manifest_url)
+        self.index_url = index_url
+        self.wheel_cache = (
+            WheelBuildCache(wheel_cache_dir) if wheel_cache_dir is not None else None
+        )
+        self.offline = offline
+        self.base_tree_pool = (
+            BaseTreePool(self.cache.root.joinpath("base-trees")) if base_tree else None
+        )
+        self.clone_mode = clone_mode
+        if launcher not in LAUNCHER_VARIANTS:
+            raise ValueError("Unknown launcher variant: {}".format(launcher))
+        self.launcher = launcher
+        self.launcher_site = launcher_site
+        self.concurrent_stages = concurrent_stages
+        self.lock = None
+        self.report = BuildReport()
+        self.downloader = Downloader(pool_size=max(max_workers or 0, DEFAULT_POOL_SIZE))
+        self.downloader.add_hook(
+            lambda stats: self.report.add_download(
+                dict(stats._asdict(), throughput=stats.throughput)
+            )
+        )
+        self._launchers = {}
+        self._launchers_lock = threading.Lock()
+        self._download_locks = {}
+        self._download_locks_lock = threading.Lock()
+        self._wheel_indexes = {}
+        self._wheel_indexes_lock = threading.Lock()
         self.requirements = []
         self.wheel_filepaths = []
         self.scripts = []
+        self.hidden_imports = []
 
-    def _download_file(self, url, filepath):
+    def _download_file(self, url, filepath, sha256=None):
         """
         Downloads file at *url* and saves it at *filepath*.
-        https://stackoverflow.com/questions/16694907/how-to-download-large-file-in-python-with-requests-py
+        The file is first looked up in the artifact cache.
+        If *sha256* is specified, the digest of the file must match.
+        Concurrent downloads of the same URL are serialized, so the file is
+        only downloaded once.
+        Remote files are downloaded with :attr:`downloader`, which reuses
+        connections, retries and resumes interrupted downloads.
+        """
+        with self._artifact_lock(url):
+            self._download_file_unlocked(url, filepath, sha256)
+
+    def _artifact_lock(self, key):
+        """
+        Returns the lock serializing the downloads of the artifact *key*.
+        """
+        with self._download_locks_lock:
+            return self._download_locks.setdefault(key, threading.Lock())
+
+    def _prefetch_file(self, url):
+        """
+        Downloads the file at *url* in the artifact cache, unless it is local
+        or already cached, so it can be fetched ahead of the stage using it.
         """
-        r = requests.get(url, stream=True)
-        if r.status_code != 200:
-            raise IOError("Cannot download {}".format(url))
+        if _url_to_path(url) is not None:
+            return
+
+        with self._artifact_lock(url):
+            if self.cache.get(url) is not None:
+                return
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                logger.info("downloading {0}".format(url))
+                self._download_file_unlocked(url, Path(tmpdir, "artifact"))
+
+    def _download_file_unlocked(self, url, filepath, sha256=None):
+        local_filepath = _url_to_path(url)
+        if local_filepath is not None:
+            logger.debug("copying {0}".format(local_filepath))
+            shutil.copyfile(local_filepath, filepath)
+            if sha256 is not None and sha256sum(filepath) != sha256:
+                raise IOError("Checksum mismatch for {}".format(url))
+            return
+
+        if self.cache.copy(url, filepath, sha256) is not None:
+            logger.debug("using cached {0}".format(url))
+            self.report.increment("cache_hits")
+            return
+
+        self.report.increment("cache_misses")
+
+        if self.offline:
+            raise IOError("Cannot download {} in offline mode".format(url))
 
-        with open(filepath, "wb") as f:
-            shutil.copyfileobj(r.raw, f)
-        r.close()
+        self.downloader.download(url, filepath, sha256)
+        self.cache.put(url, filepath, sha256)
+
+    @contextlib.contextmanager
+    def _open_url(self, url):
+        """
+        Opens the file at *url*, a ``file://`` or remote URL, for reading.
+        """
+        local_filepath = _url_to_path(url)
+        if local_filepath is not None:
+            with open(local_filepath, "rb") as fp:
+                yield fp
+            return
+
+        if self.offline:
+            raise IOError("Cannot download {} in offline mode".format(url))
+
+        with self.downloader.open(url) as fp:
+            yield fp
 
     def _download_python_embedded(self, workdir):
         filepath = workdir.joinpath("python_embed.zip")
 
         try:
-            version = "{0.major}.{0.minor}.{0.micro}".format(sys.version_info)
-            is_64bits = sys.maxsize > 2 ** 32
-            arch = "amd64" if is_64bits else "win32"
-            url = self.PYTHON_EMBED_BASEURL.format(version=version, arch=arch)
+            url = self.PYTHON_EMBED_BASEURL.format(
+                version=self.target.python_version, arch=self.target.arch
+            )
 
             logger.info("downloading {0}".format(url))
             self._download_file(url, filepath)
@@ -133,6 +449,16 @@ int main(int argc, char *argv[])
                 filepath.unlink()
 
     def _prepare_python(self, workdir):
+        for filepath in workdir.glob("*._pth"):
+            filepath.unlink()
+
+        if self.zip_stdlib:
+            exclude_packages = ["lib2to3"] if self.fix_lib2to3 else []
+            for filepath in workdir.glob("python*.zip"):
+                repack_stdlib(filepath, workdir.joinpath("Lib"), exclude_packages)
+                write_pth(workdir, self.target, [filepath.name, ".", "Lib"])
+            return
+
         logger.info("extracting python3X.zip")
 
         for filepath in workdir.glob("python*.zip"):
@@ -141,43 +467,232 @@ int main(int argc, char *argv[])
 
             filepath.unlink()
 
-        for filepath in workdir.glob("*._pth"):
-            filepath.unlink()
+    def _zip_site_packages(self, workdir):
+        site_packages = workdir.joinpath("Lib", "site-packages")
+        if not site_packages.exists():
+            return
+
+        compile_bytecode = self.target.short_version == Target.host().short_version
+        if not compile_bytecode:
+            logger.warning(
+                "cannot compile bytecode for Python {0}, zipping sources".format(
+                    self.target.short_version
+                )
+            )
+
+        zip_site_packages(
+            site_packages,
+            workdir.joinpath("Lib", SITE_PACKAGES_ZIP_FILENAME),
+            compile_bytecode,
+            self.optimize,
+        )
+
+        # Path configuration file processed by the site module
+        with open(site_packages.joinpath("py2win-zip.pth"), "w") as fp:
+            fp.write("../{0}\n".format(SITE_PACKAGES_ZIP_FILENAME))
+
+    def _shake_tree(self, workdir, report_filepath):
+        entry_modules = [module for module, _method, _name, _console in self.scripts]
+        removed = shake_tree(workdir, entry_modules, self.hidden_imports)
+
+        with open(report_filepath, "w") as fp:
+            json.dump({"removed": removed, "size": sum(removed.values())}, fp, indent=2)
+
+    def _dedup_tree(self, workdir, report_filepath):
+        result = deduplicate_tree(workdir, max_workers=self.max_workers)
+        self.report.increment("duplicate_bytes", result["duplicate_bytes"])
+        self.report.increment("collapsed_bytes", result["collapsed_bytes"])
+
+        with open(report_filepath, "w") as fp:
+            json.dump(result, fp, indent=2)
+
+    def _has_lib2to3(self, workdir):
+        """
+        Returns whether the standard library zip of the embedded distribution
+        extracted in *workdir* contains lib2to3.
+        """
+        for filepath in workdir.glob("python*.zip"):
+            with zipfile.ZipFile(filepath, "r") as zf:
+                if any(name.startswith("lib2to3/") for name in zf.namelist()):
+                    return True
+        return False
+
+    def _fix_lib2to3(self, workdir, payload_filepath=None):
+        """
+        Adds the lib2to3 fixers in *workdir*.
+
+        :arg payload_filepath: zip of the fixers written by
+            :meth:`_fetch_lib2to3`, fetched if ``None``
+        """
+        if not self.fix_lib2to3:
+            return
+
+        libdir = workdir.joinpath("Lib", "lib2to3")
+        if not libdir.exists():
+            logger.debug("lib2to3 not part of this Python version, skipping")
+            return
 
-    def _fix_lib2to3(self, workdir):
         logger.info("fixing lib2to3")
 
-        tarfilepath = workdir.joinpath("python_source.tgz")
+        if payload_filepath is None:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                payload_filepath = self._fetch_lib2to3(Path(tmpdir, "lib2to3.zip"))
+                self._extract_lib2to3(payload_filepath, workdir)
+        else:
+            self._extract_lib2to3(payload_filepath, workdir)
+
+    def _fetch_lib2to3(self, payload_filepath):
+        """
+        Writes the zip of the lib2to3 fixers of the target Python version at
+        *payload_filepath*, from the artifact cache or streamed from the
+        source tarball if it is not cached, and returns *payload_filepath*.
+        """
+        version = self.target.python_version
+        key = "lib2to3-{0}".format(version)
 
-        try:
-            version = "{0.major}.{0.minor}.{0.micro}".format(sys.version_info)
+        with self._artifact_lock(key):
+            if self.cache.copy(key, payload_filepath) is not None:
+                self.report.increment("cache_hits")
+                return payload_filepath
+
+            self.report.increment("cache_misses")
             url = self.PYTHON_SOURCE_BASEURL.format(version=version)
+            self._stream_lib2to3(url, payload_filepath)
+            self.cache.put(key, payload_filepath)
+            return payload_filepath
 
-            logger.info("downloading {0}".format(url))
-            self._download_file(url, tarfilepath)
-
-            logger.info("extracting files in {0}".format(workdir))
-            with tarfile.open(tarfilepath) as tar:
-                for member in tar.getmembers():
-                    if not fnmatch.fnmatch(
-                        member.name, "Python-*/Lib/lib2to3/fixes/*.py"
-                    ) and not fnmatch.fnmatch(
-                        member.name, "Python-*/Lib/lib2to3/pgen2/*.py"
-                    ):
+    def _is_lib2to3_member(self, name):
+        """
+        Returns whether the member *name* of the source tarball is a module
+        directly in one of :attr:`LIB2TO3_DIRS`.
+        """
+        parts = name.split("/")
+        return (
+            len(parts) == 5
+            and parts[0].startswith("Python-")
+            and tuple(parts[1:4]) in self.LIB2TO3_DIRS
+            and parts[4].endswith(".py")
+        )
+
+    def _stream_lib2to3(self, url, payload_filepath):
+        """
+        Reads the Python source tarball at *url* in a single pass and writes
+        the lib2to3 files in :attr:`LIB2TO3_DIRS` in a zip at
+        *payload_filepath*.
+        The whole tarball is read, since the order of its members is not
+        guaranteed.
+        """
+        logger.info("streaming {0}".format(url))
+
+        with self._open_url(url) as fp:
+            with tarfile.open(fileobj=fp, mode="r|gz") as tar, zipfile.ZipFile(
+                payload_filepath, "w", zipfile.ZIP_DEFLATED
+            ) as zf:
+                for member in tar:
+                    if not member.isfile() or not self._is_lib2to3_member(member.name):
                         continue
 
                     logger.debug("extracting {0}".format(member.name))
                     buf = tar.extractfile(member)
 
                     _, path = member.name.split("/", 1)
-                    filepath = workdir.joinpath(path)
-                    with open(filepath, "wb") as fp:
-                        fp.write(buf.read())
+                    zf.writestr(path, buf.read())
 
                     buf.close()
-        finally:
-            if tarfilepath.exists():
-                tarfilepath.unlink()
+
+    def _extract_lib2to3(self, payload_filepath, workdir):
+        logger.info("extracting lib2to3 files in {0}".format(workdir))
+        with zipfile.ZipFile(payload_filepath, "r") as zf:
+            zf.extractall(workdir)
+
+    @property
+    def wheel_index(self):
+        """
+        Index of the wheels of *extra_wheel_dir*, saved in the cache directory
+        and updated incrementally, or ``None``.
+        """
+        if self.extra_wheel_dir is None:
+            return None
+
+        dirpath = str(self.extra_wheel_dir.resolve())
+        with self._wheel_indexes_lock:
+            if dirpath not in self._wheel_indexes:
+                key = hashlib.sha256(dirpath.encode("utf-8")).hexdigest()[:16]
+                self._wheel_indexes[dirpath] = WheelIndex(
+                    self.extra_wheel_dir,
+                    self.cache.root.joinpath("wheel-indexes", key + ".json"),
+                    self.max_workers,
+                )
+            return self._wheel_indexes[dirpath]
+
+    def _project_requirements(self):
+        """
+        Returns the requirements of the wheels of the project and the
+        additional requirements.
+        """
+        requirements = []
+        for filepath in self.wheel_filepaths:
+            requirements.extend(read_wheel_requires(filepath))
+        requirements.extend(self.requirements)
+        return requirements
+
+    def _select_extra_wheels(self, requirements):
+        """
+        Returns the wheels of *extra_wheel_dir* compatible with the target
+        and needed by *requirements*.
+        """
+        if self.wheel_index is None:
+            return []
+
+        self.wheel_index.update()
+        wheels = self.wheel_index.select(self.target, requirements)
+        logger.debug(
+            "selected {0} of {1} extra wheels".format(
+                len(wheels), len(self.wheel_index.wheels)
+            )
+        )
+        return wheels
+
+    @contextlib.contextmanager
+    def _find_links(self, requirements, wheel_filepaths=()):
+        """
+        Yields a temporary directory containing only the wheels of
+        *extra_wheel_dir* needed by *requirements* and the *wheel_filepaths*,
+        to be passed to pip with ``--find-links``, or ``None`` if there is
+        neither *extra_wheel_dir* nor *wheel_filepaths*.
+        """
+        if self.extra_wheel_dir is None and not wheel_filepaths:
+            yield None
+            return
+
+        srcs = [
+            self.extra_wheel_dir.joinpath(wheel.filename)
+            for wheel in self._select_extra_wheels(requirements)
+        ]
+        srcs.extend(wheel_filepaths)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for src in srcs:
+                dst = Path(tmpdir, src.name)
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copyfile(src, dst)
+            yield Path(tmpdir)
+
+    def _pip_index_args(self, find_links=None):
+        """
+        Returns the arguments of pip defining where packages are found.
+
+        :arg find_links: directory containing wheels, see :meth:`_find_links`
+        """
+        args = []
+        if self.offline:
+            args.append("--no-index")
+        elif self.index_url is not None:
+            args += ["--index-url", self.index_url]
+        if find_links is not None:
+            args += ["--find-links", str(find_links)]
+        return args
 
     def _install_pip(self, python_executable):
         filepath = python_executable.with_name("get-pip.py")
@@ -186,119 +701,509 @@ int main(int argc, char *argv[])
             logger.info("downloading {0}".format(self.GET_PIP_URL))
             self._download_file(self.GET_PIP_URL, filepath)
 
-            args = [str(python_executable), str(filepath)]
-            logger.debug("running {0}".format(" ".join(args)))
-            subprocess.run(args, check=True)
+            with self._find_links(["pip", "setuptools", "wheel"]) as find_links:
+                args = [str(python_executable), str(filepath)]
+                args += self._pip_index_args(find_links)
+                logger.debug("running {0}".format(" ".join(args)))
+                subprocess.run(args, check=True)
         finally:
             if filepath.exists():
                 filepath.unlink()
 
-    def _install_wheels(self, python_executable):
-        if not self.wheel_filepaths:
-            return
-
+    def _build_wheel(self, python_executable, sdist_filepath, wheel_dir):
         args = [
             str(python_executable),
             "-m",
             "pip",
-            "install",
-            "-U",
-            "--no-warn-script-location",
-        ]
-        if self.extra_wheel_dir:
-            args += ["--find-links", str(self.extra_wheel_dir)]
-
-        for wheel_filepath in self.wheel_filepaths:
-            args.append(str(wheel_filepath))
-
-        if self.extra_wheel_dir is not None:
-            for filepath in self.extra_wheel_dir.glob("*.whl"):
-                args.append(str(filepath))
+            "wheel",
+            "--no-deps",
+            "--wheel-dir",
+            str(wheel_dir),
+        ] + self._pip_index_args(self.extra_wheel_dir)
+        args.append(str(sdist_filepath))
 
         logger.debug("running {0}".format(" ".join(args)))
         subprocess.run(args, check=True)
 
-    def _install_requirements(self, python_executable):
+    def _build_sdists(self, python_executable):
+        """
+        Downloads the packages to install and returns the wheels built from
+        the source distributions among them, from the wheel build cache.
+        The source distributions are recorded, so the next builds with the
+        same wheels and requirements reuse the cached wheels without
+        downloading the packages, provided the requirements pin these
+        packages with ``==``: otherwise a newer release may be available.
+        """
+        wheel_filepaths = self.wheel_filepaths if self.installer == "pip" else []
+        if self.wheel_cache is None or not (wheel_filepaths or self.requirements):
+            return []
+
+        key = digest_inputs(
+            {
+                "wheels": [sha256sum(filepath) for filepath in wheel_filepaths],
+                "requirements": self.requirements,
+                "extra_wheel_dir": (
+                    str(self.extra_wheel_dir.resolve())
+                    if self.extra_wheel_dir is not None
+                    else None
+                ),
+                "index_url": self.index_url,
+                "tag": target_tag(self.target),
+            }
+        )
+        built_filepaths = self.wheel_cache.get_resolved(key, self.target)
+        if built_filepaths is not None and self._is_pinned(built_filepaths):
+            logger.info("using {0} cached wheels".format(len(built_filepaths)))
+            self.report.increment("wheel_cache_hits", len(built_filepaths))
+            return built_filepaths
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with self._find_links(self._project_requirements()) as find_links:
+                args = [
+                    str(python_executable),
+                    "-m",
+                    "pip",
+                    "download",
+                    "--dest",
+                    tmpdir,
+                ] + self._pip_index_args(find_links)
+                args.extend(str(filepath) for filepath in wheel_filepaths)
+                args.extend(self.requirements)
+
+                logger.debug("running {0}".format(" ".join(args)))
+                subprocess.run(args, check=True)
+
+            sdist_filepaths = sorted(
+                filepath for filepath in Path(tmpdir).iterdir() if is_sdist(filepath)
+            )
+            built_filepaths, built = self.wheel_cache.get_or_build(
+                sdist_filepaths,
+                self.target,
+                functools.partial(self._build_wheel, python_executable),
+                self.max_workers,
+            )
+            self.wheel_cache.put_resolved(key, sdist_filepaths)
+
+        self.report.increment("wheels_built", built)
+        self.report.increment("wheel_cache_hits", len(built_filepaths) - built)
+        return built_filepaths
+
+    def _is_pinned(self, wheel_filepaths):
+        """
+        Returns whether the requirements pin the version of all the
+        *wheel_filepaths*.
+        """
+        versions = pinned_versions(self.requirements)
+        for filepath in wheel_filepaths:
+            name, version, _build, _tags = parse_wheel_filename(filepath.name)
+            if versions.get(name) != version:
+                return False
+        return True
+
+    @contextlib.contextmanager
+    def _pin_wheels(self, wheel_filepaths):
+        """
+        Yields the arguments of pip constraining the projects of
+        *wheel_filepaths* to the version of these wheels, so pip installs them
+        rather than a newer source distribution of the index.
+        """
+        if not wheel_filepaths:
+            yield []
+            return
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = Path(tmpdir, "constraints.txt")
+            with open(filepath, "w") as fp:
+                for wheel_filepath in wheel_filepaths:
+                    name, version, _build, _tags = parse_wheel_filename(
+                        Path(wheel_filepath).name
+                    )
+                    fp.write("{0}=={1}\n".format(name, version))
+            yield ["--constraint", str(filepath)]
+
+    def _install_wheels(self, python_executable, built_filepaths=()):
+        if not self.wheel_filepaths or self.installer != "pip":
+            return
+
+        with self._find_links(
+            self._project_requirements(), built_filepaths
+        ) as find_links, self._pin_wheels(built_filepaths) as pin_args:
+            args = [
+                str(python_executable),
+                "-m",
+                "pip",
+                "install",
+                "-U",
+                "--no-warn-script-location",
+            ] + self._pip_index_args(find_links)
+            args += pin_args
+
+            for wheel_filepath in self.wheel_filepaths:
+                args.append(str(wheel_filepath))
+
+            logger.debug("running {0}".format(" ".join(args)))
+            subprocess.run(args, check=True)
+
+    def _install_requirements(self, python_executable, built_filepaths=()):
         if not self.requirements:
             return
 
+        with self._find_links(
+            self.requirements, built_filepaths
+        ) as find_links, self._pin_wheels(built_filepaths) as pin_args:
+            args = [
+                str(python_executable),
+                "-m",
+                "pip",
+                "install",
+                "-U",
+                "--no-warn-script-location",
+            ] + self._pip_index_args(find_links)
+            args += pin_args
+
+            args.extend(self.requirements)
+
+            logger.debug("running {0}".format(" ".join(args)))
+            subprocess.run(args, check=True)
+
+    def _install_builtin(self, workdir):
+        if not self.wheel_filepaths or self.installer != "builtin":
+            return
+
+        logger.info("installing wheels")
+        installer = WheelInstaller(workdir, self.max_workers)
+        installer.install(self.wheel_filepaths)
+
+    def _fetch_locked_wheel(self, wheel, tmpdir):
+        filepath = None
+        if self.extra_wheel_dir is not None:
+            filepath = self.extra_wheel_dir.joinpath(wheel.filename)
+        if filepath is None or not filepath.exists():
+            filepath = wheel.local_filepath
+        if filepath is None or not filepath.exists():
+            filepath = Path(tmpdir, wheel.filename)
+            logger.info("downloading {0}".format(wheel.url))
+            self._download_file(wheel.url, filepath, wheel.sha256)
+
+        if sha256sum(filepath) != wheel.sha256:
+            raise IOError("Checksum mismatch for {}".format(filepath))
+
+        return filepath
+
+    def _install_locked(self, workdir):
+        """
+        Installs exactly the wheels of the lock file, without resolution or
+        index queries, and the wheels of the project.
+        """
+        if sorted(self.requirements) != self.lock.requirements:
+            raise ValueError("Lock file does not match the requirements")
+
+        wheels = self.lock.get_wheels(self.target)
+
+        logger.info("installing {0} locked wheels".format(len(wheels)))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+                filepaths = list(
+                    executor.map(
+                        lambda wheel: self._fetch_locked_wheel(wheel, tmpdir), wheels
+                    )
+                )
+
+            installer = WheelInstaller(workdir, self.max_workers)
+            installer.install(filepaths + self.wheel_filepaths)
+
+    def _install_cross(self, workdir):
+        """
+        Installs the wheels and requirements in the site-packages of the
+        distribution using pip of the running interpreter, restricted to
+        binary wheels compatible with the target.
+        """
+        wheel_filepaths = self.wheel_filepaths if self.installer == "pip" else []
+        if not wheel_filepaths and not self.requirements:
+            return
+
+        logger.info("installing packages for {0}".format(self.target.platform_tag))
+
+        site_packages = workdir.joinpath("Lib", "site-packages")
+
         args = [
-            str(python_executable),
+            sys.executable,
             "-m",
             "pip",
             "install",
-            "-U",
+            "--upgrade",
             "--no-warn-script-location",
-        ]
-        if self.extra_wheel_dir:
-            args += ["--find-links", str(self.extra_wheel_dir)]
-
-        args.extend(self.requirements)
-
-        logger.debug("running {0}".format(" ".join(args)))
-        subprocess.run(args, check=True)
+            "--no-compile",
+            "--target",
+            str(site_packages),
+        ] + self.target.pip_args
 
-    def _create_main(self, workdir, module, method, executable_name, console=True):
-        # Create code
-        logger.info("writing main executable code")
+        for wheel_filepath in wheel_filepaths:
+            args.append(str(wheel_filepath))
 
-        c_filepath = workdir.joinpath(executable_name + ".c")
+        args.extend(self.requirements)
 
-        if console:
-            content = self.PYTHON_CONSOLE_MAIN_CODE.format(module=module, method=method)
-        else:
-            content = self.PYTHON_GUI_MAIN_CODE.format(module=module, method=method)
+        with self._find_links(self._project_requirements()) as find_links:
+            args += self._pip_index_args(find_links)
+            logger.debug("running {0}".format(" ".join(args)))
+            subprocess.run(args, check=True)
 
-        with open(c_filepath, "w") as fp:
-            fp.write(content)
+        # Scripts generated by the running interpreter cannot run on Windows
+        bindir = site_packages.joinpath("bin")
+        if bindir.exists():
+            shutil.rmtree(bindir)
 
-        # Create manifest
-        logger.info("downloading Python manifest")
+    def _install_packages(self, workdir, python_executable):
+        if self.lock is not None:
+            self._install_locked(workdir)
+            return
 
-        manifest_filepath = workdir.joinpath(executable_name + ".exe.manifest")
+        # Install wheels without pip
+        self._install_builtin(workdir)
 
-        self._download_file(self.PYTHON_MANIFEST_URL, manifest_filepath)
+        if self.cross_build:
+            self._install_cross(workdir)
+            return
 
-        # Compile
-        logger.info("compiling main executable code")
+        # Install pip, unless it is part of the base tree
+        if self._requires_pip() and not self._base_tree_has_pip():
+            self._install_pip(python_executable)
 
-        objects = []
-        try:
-            cwd = Path.cwd()
-            os.chdir(workdir)
+        # Build the source distributions once, in the wheel build cache
+        built_filepaths = self._build_sdists(python_executable)
 
-            compiler = new_compiler(verbose=True)
-            compiler.initialize()
+        # Install wheels, pypi and requirements
+        self._install_wheels(python_executable, built_filepaths)
+        self._install_requirements(python_executable, built_filepaths)
 
-            py_include = sysconfig.get_path("include")
-            compiler.include_dirs.append(py_include)
+    def _requires_pip(self):
+        return self.installer == "pip" or bool(self.requirements)
 
-            plat_py_include = sysconfig.get_path("platinclude")
-            if plat_py_include != py_include:
-                compiler.include_dirs.append(plat_py_include)
+    def _prefetches_pip(self):
+        """
+        Returns whether ``get-pip.py`` may be needed, to download it ahead of
+        the installation of the packages.
+        """
+        if self.lock is not None or self.cross_build or not self._requires_pip():
+            return False
+        if not self._base_tree_has_pip():
+            return True
+        return self.base_tree_pool.get(self._base_tree_key()) is None
+
+    def _base_tree_has_pip(self):
+        return (
+            self.base_tree_pool is not None
+            and self.lock is None
+            and not self.cross_build
+            and self._requires_pip()
+        )
+
+    def _install_python(self, workdir):
+        """
+        Installs the embedded distribution in *workdir*.
+        The lib2to3 fixers are streamed from the source tarball while the
+        standard library is prepared.
+        """
+        scheduler = self._new_scheduler()
+        results = scheduler.results
 
-            library_dir = Path(sys.base_exec_prefix).joinpath("libs")
-            compiler.library_dirs.append(str(library_dir))
+        def download():
+            self._download_python_embedded(workdir)
+            return self.fix_lib2to3 and self._has_lib2to3(workdir)
+
+        def fetch_lib2to3():
+            if results["python:embed"]:
+                return self._fetch_lib2to3(Path(tmpdir, "lib2to3.zip"))
+
+        def fix_lib2to3():
+            if results["python:fetch_lib2to3"] is not None:
+                self._fix_lib2to3(workdir, results["python:fetch_lib2to3"])
+
+        bind = self.report.bind
+        scheduler.add("python:embed", bind(download))
+        scheduler.add(
+            "python:stdlib",
+            bind(lambda: self._prepare_python(workdir)),
+            ["python:embed"],
+        )
+        scheduler.add("python:fetch_lib2to3", bind(fetch_lib2to3), ["python:embed"])
+        scheduler.add(
+            "python:lib2to3",
+            bind(fix_lib2to3),
+            ["python:stdlib", "python:fetch_lib2to3"],
+        )
+
+        # Directory of the lib2to3 payload fetched from the cache
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._run_scheduler(scheduler)
+
+    def _build_base_tree(self, dirpath):
+        logger.info("creating base tree for {0}".format(self.target))
+        self._install_python(dirpath)
+        if self._base_tree_has_pip():
+            self._install_pip(dirpath.joinpath("python.exe"))
+
+    def _base_tree_key(self):
+        inputs = {"python": self._python_inputs(), "pip": None}
+        if self._base_tree_has_pip():
+            inputs["pip"] = self.GET_PIP_URL
+        return "{0}-{1}-{2}".format(
+            self.target.python_version, self.target.arch, digest_inputs(inputs)[:16]
+        )
+
+    def _clone_base_tree(self, workdir):
+        """
+        Creates the interpreter tree by cloning the base tree of the target,
+        which is created on first use.
+        """
+        key = self._base_tree_key()
+        self.base_tree_pool.create(key, self._build_base_tree)
+        self.base_tree_pool.clone(key, workdir, self.clone_mode)
 
-            objects = compiler.compile([c_filepath.name])
-            compiler.link_executable(objects, executable_name)
+    def _reset_site_packages(self, workdir):
+        """
+        Removes the site-packages and their zip, since zipped packages cannot
+        be upgraded. The packages of the base tree (pip) are cloned again.
+        """
+        shutil.rmtree(workdir.joinpath("Lib", "site-packages"))
+        workdir.joinpath("Lib", SITE_PACKAGES_ZIP_FILENAME).unlink()
+
+        if self._base_tree_has_pip():
+            dirpath = self.base_tree_pool.create(
+                self._base_tree_key(), self._build_base_tree
+            )
+            clone_tree(
+                dirpath.joinpath("Lib", "site-packages"),
+                workdir.joinpath("Lib", "site-packages"),
+                self.clone_mode,
+            )
+
+    def _new_scheduler(self):
+        return Scheduler(self.concurrent_stages)
+
+    def _run_scheduler(self, scheduler):
+        """
+        Runs the tasks of *scheduler* and records their schedule in the
+        report.
+        """
+        try:
+            return scheduler.run()
         finally:
-            os.chdir(cwd)
-
-            if c_filepath.exists():
-                c_filepath.unlink()
-
-            if manifest_filepath.exists():
-                manifest_filepath.unlink()
+            self.report.add_schedule(scheduler.trace, self.target)
+
+    def _compile_bytecode(self, workdir):
+        compile_tree(
+            workdir.joinpath("Lib"),
+            self.optimize,
+            self.invalidation_mode,
+            self.drop_sources,
+            self.max_workers,
+        )
+
+    def _get_launchers(self, consoles):
+        """
+        Returns the content of the generic console and/or GUI launchers for
+        the target, per value of *consoles*.
+        The launchers are compiled once per Python version and architecture,
+        all in one compiler session, and kept in the artifact cache and in
+        memory.
+        """
+        with self._launchers_lock:
+            launchers = {}
+            missing = []
+            for console in consoles:
+                key = get_launcher_key(self.target, console, self.launcher)
+                if key in self._launchers:
+                    launchers[console] = self._launchers[key]
+                    continue
+
+                data = self.cache.read_bytes(key)
+                self.report.increment("cache_misses" if data is None else "cache_hits")
+                if data is None:
+                    missing.append(console)
+                else:
+                    launchers[console] = self._launchers[key] = data
+
+            if missing:
+                launchers.update(self._compile_launchers(missing))
+
+            return launchers
+
+    def _compile_launchers(self, consoles):
+        if not self.target.is_host:
+            raise OSError(
+                "No launcher in cache for {0}. It must first be compiled on "
+                "Windows with the same Python version and architecture, "
+                "using the same cache directory.".format(self.target)
+            )
+
+        with tempfile.TemporaryDirectory() as build_dir, self.report.stage(
+            "launcher", self.target
+        ):
+            build_dir = Path(build_dir)
+            names = {
+                console: "launcher-console" if console else "launcher-gui"
+                for console in consoles
+            }
+
+            # Create manifest
+            logger.info("downloading Python manifest")
+            manifest_filepath = build_dir.joinpath("python.manifest")
+            url = self.PYTHON_MANIFEST_URL.format(version=self.target.python_version)
+            self._download_file(url, manifest_filepath)
+
+            launcher_filepaths = compile_launchers(
+                build_dir,
+                [(names[console], console) for console in consoles],
+                manifest_filepath,
+                self.max_workers,
+                self.launcher,
+            )
+
+            launchers = {}
+            for console in consoles:
+                key = get_launcher_key(self.target, console, self.launcher)
+                filepath = launcher_filepaths[names[console]]
+                self.cache.put(key, filepath)
+                launchers[console] = self._launchers[key] = filepath.read_bytes()
+
+        return launchers
+
+    def _get_launcher(self, console=True):
+        """
+        Returns the content of the generic console or GUI launcher for the
+        target.
+        """
+        return self._get_launchers([console])[console]
 
-            for filename in objects:
-                filepath = workdir.joinpath(filename)
-                if filepath.exists():
-                    filepath.unlink()
+    def _create_main(self, workdir, module, method, executable_name, console=True):
+        logger.info("creating {0}.exe".format(executable_name))
+
+        filepath = workdir.joinpath(executable_name + ".exe")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            launcher_filepath = Path(tmpdir, "launcher.exe")
+            launcher_filepath.write_bytes(self._get_launcher(console))
+            stamp_launcher(
+                launcher_filepath,
+                filepath,
+                module,
+                method,
+                console,
+                self._launcher_search_paths(),
+                self.launcher_site,
+            )
 
     def _create_zip(self, workdir, dist_dir, fullname):
         logger.info("creating zip")
-        shutil.make_archive(dist_dir.joinpath(fullname), "zip", dist_dir, fullname)
+        create_archive(
+            dist_dir.joinpath(fullname + ".zip"),
+            dist_dir,
+            fullname,
+            self.compresslevel,
+            self.compresslevels,
+            self.max_workers,
+            self.dedup,
+        )
 
     def add_wheel(self, filepath):
         """
@@ -327,49 +1232,529 @@ int main(int argc, char *argv[])
         """
         self.scripts.append([module, method, executable_name, console])
 
+    def add_hidden_import(self, module):
+        """
+        Adds a module imported dynamically by the scripts, which must be kept
+        when tree shaking (e.g. a plugin loaded with
+        :func:`importlib.import_module`).
+        """
+        self.hidden_imports.append(module)
+
+    def _python_inputs(self):
+        return {
+            "target": list(self.target),
+            "embed_url": self.PYTHON_EMBED_BASEURL,
+            "source_url": self.PYTHON_SOURCE_BASEURL,
+            "fix_lib2to3": self.fix_lib2to3,
+            "zip_stdlib": self.zip_stdlib,
+        }
+
+    def _packages_inputs(self, python_digest):
+        inputs = {
+            "python": python_digest,
+            "installer": self.installer,
+            "cross_build": self.cross_build,
+            "wheels": sorted(
+                [filepath.name, sha256sum(filepath)]
+                for filepath in self.wheel_filepaths
+            ),
+            "requirements": sorted(self.requirements),
+            "extra_wheels": None,
+            "lock": None,
+        }
+
+        if self.extra_wheel_dir is not None and self.lock is None:
+            inputs["extra_wheels"] = [
+                [wheel.filename, wheel.sha256]
+                for wheel in self._select_extra_wheels(self._project_requirements())
+            ]
+
+        if self.lock is not None:
+            inputs["lock"] = [
+                wheel._asdict() for wheel in self.lock.get_wheels(self.target)
+            ]
+
+        if self._requires_pip():
+            inputs["get_pip_url"] = self.GET_PIP_URL
+
+        return inputs
+
+    def _shake_inputs(self, packages_digest):
+        return {
+            "packages": packages_digest,
+            "entry_modules": sorted(module for module, *_ in self.scripts),
+            "hidden_imports": sorted(self.hidden_imports),
+        }
+
+    def _dedup_inputs(self, packages_digest, shake_digest):
+        return {"packages": packages_digest, "shake": shake_digest}
+
+    def _script_inputs(self, python_digest, module, method, executable_name, console):
+        return {
+            "python": python_digest,
+            "module": module,
+            "method": method,
+            "console": console,
+            "launcher": hashlib.sha256(self._get_launcher(console)).hexdigest(),
+            "search_paths": self._launcher_search_paths(),
+            "import_site": self.launcher_site,
+        }
+
+    def _launcher_search_paths(self):
+        """
+        Returns the module search path stamped in the executables of the
+        ``pyconfig`` variant, relative to the distribution, or ``None``.
+        """
+        if self.launcher != "pyconfig":
+            return None
+
+        paths = []
+        if self.zip_stdlib:
+            paths.append("python{0}{1}.zip".format(*self.target.version_info[:2]))
+        paths += [".", "Lib"]
+
+        # Added by the site module otherwise
+        if not self.launcher_site:
+            paths.append("Lib\\site-packages")
+            if self.zip_site_packages:
+                paths.append("Lib\\" + SITE_PACKAGES_ZIP_FILENAME)
+
+        return paths
+
+    def write_lock(self, filepath):
+        """
+        Resolves the dependencies of the wheels and requirements once and
+        writes the exact wheels to install in a lock file.
+        Only binary wheels can be locked.
+        The wheels added with :meth:`add_wheel` are not locked.
+
+        :arg filepath: path of the lock file
+        :return: :class:`LockFile`
+        """
+        lock = LockFile(self.requirements)
+        for target in self.targets:
+            logger.info("resolving dependencies for {0}".format(target))
+            lock.update(
+                LockFile.resolve(
+                    target,
+                    self.wheel_filepaths,
+                    self.requirements,
+                    find_links=self.extra_wheel_dir,
+                    pip_args=self._pip_index_args(),
+                )
+            )
+        lock.write(filepath)
+        return lock
+
+    def use_lock(self, filepath):
+        """
+        Uses a lock file written by :meth:`write_lock`.
+        :meth:`run` then installs exactly the locked wheels and the wheels
+        added with :meth:`add_wheel`, without pip.
+
+        :arg filepath: path of the lock file
+        """
+        self.lock = LockFile.read(filepath)
+
+    def _for_target(self, target):
+        """
+        Returns a copy of this instance building *target*.
+        The artifact cache, the launchers and the download locks are shared.
+        """
+        embed = copy.copy(self)
+        embed.target = target
+        embed.targets = [target]
+        return embed
+
+    def share_state(self, other):
+        """
+        Shares the in-memory state of *other*, another instance using the same
+        cache directory: the connections of the downloader, the compiled
+        launchers, the download locks, the wheel indexes and, if both use
+        base trees, the pool of base trees and its locks.
+        Builds run one after the other, or concurrently, in a long-running
+        process then reuse this state (see :mod:`py2win.daemon`).
+        """
+        if self.cache.root != other.cache.root:
+            raise ValueError("Instances must use the same cache directory")
+
+        self.cache = other.cache
+        self.downloader.session = other.downloader.session
+        self._launchers = other._launchers
+        self._launchers_lock = other._launchers_lock
+        self._download_locks = other._download_locks
+        self._download_locks_lock = other._download_locks_lock
+        self._wheel_indexes = other._wheel_indexes
+        self._wheel_indexes_lock = other._wheel_indexes_lock
+        if self.base_tree_pool is not None and other.base_tree_pool is not None:
+            self.base_tree_pool = other.base_tree_pool
+
+    def _check_target(self):
+        if not self.cross_build:
+            if sys.platform != "win32":
+                raise OSError("Only windows platform supported, use cross_build")
+            if not self.target.is_host:
+                raise OSError(
+                    "Target {0} does not match the running interpreter, "
+                    "use cross_build".format(self.target)
+                )
+        if self.target.version_info[0] != 3:
+            raise OSError("Only Python 3 supported")
+        if (
+            self.compile_bytecode
+            and self.target.short_version != Target.host().short_version
+        ):
+            raise OSError(
+                "Bytecode can only be compiled for Python {0}".format(
+                    Target.host().short_version
+                )
+            )
+        if (
+            self.tree_shaking
+            and self.target.short_version != Target.host().short_version
+        ):
+            raise OSError(
+                "Imports can only be analyzed for Python {0}".format(
+                    Target.host().short_version
+                )
+            )
+        if self.offline:
+            urls = self._missing_offline_artifacts()
+            if urls:
+                raise IOError(
+                    "Offline build of {0} requires downloading: {1}".format(
+                        self.target, ", ".join(urls)
+                    )
+                )
+
+    def _missing_offline_artifacts(self):
+        """
+        Returns the URLs of the artifacts which would need to be downloaded,
+        because they are neither local nor in the artifact cache.
+        """
+        missing = []
+
+        def check(url, key=None):
+            if _url_to_path(url) is None and self.cache.get(key or url) is None:
+                missing.append(url)
+
+        version = self.target.python_version
+        has_base_tree = (
+            self.base_tree_pool is not None
+            and self.base_tree_pool.get(self._base_tree_key()) is not None
+        )
+
+        if not has_base_tree:
+            check(
+                self.PYTHON_EMBED_BASEURL.format(version=version, arch=self.target.arch)
+            )
+
+        if (
+            not has_base_tree
+            and self.fix_lib2to3
+            and self.target.version_info < (3, 13)
+        ):
+            check(
+                self.PYTHON_SOURCE_BASEURL.format(version=version),
+                "lib2to3-{0}".format(version),
+            )
+
+        if self.lock is not None:
+            for wheel in self.lock.get_wheels(self.target):
+                if self.extra_wheel_dir is not None and (
+                    self.extra_wheel_dir.joinpath(wheel.filename).exists()
+                ):
+                    continue
+                check(wheel.url)
+        elif not self.cross_build and self._requires_pip():
+            if not (has_base_tree and self._base_tree_has_pip()):
+                check(self.GET_PIP_URL)
+
+        for console in sorted({console for *_, console in self.scripts}):
+            key = get_launcher_key(self.target, console, self.launcher)
+            if self.cache.get(key) is None:
+                check(self.PYTHON_MANIFEST_URL.format(version=version))
+
+        return missing
+
     def run(self, dist_dir, clean=True, zip_dist=False):
         """
         Creates an embedded distribution with the specified wheel(s) and script(s).
 
         :arg dist_dir: destination directory
-        :arg clean: whether to remove all existing files in the destination directory
+        :arg clean: whether to remove all existing files in the destination directory.
+            If ``False``, only the stages whose inputs changed since the
+            previous build are run again (Python version, wheels,
+            requirements, scripts and compiler).
         :arg zip_dist: whether to create a zip of the distribution
+        :return: directory of the distribution, or list of directories when
+            several targets are built
         """
-        if sys.platform != "win32":
-            raise OSError("Only windows platform supported")
-        if sys.version_info.major != 3:
-            raise OSError("Only Python 3 supported")
-
         dist_dir = Path(dist_dir).resolve()
         fullname = f"{self.project_name}-{self.project_version}"
 
+        self.report.reset()
+        try:
+            return self._run_targets(dist_dir, fullname, clean, zip_dist)
+        finally:
+            self.report.finish()
+
+    def _run_targets(self, dist_dir, fullname, clean, zip_dist):
+        if len(self.targets) == 1:
+            self._check_target()
+            return self._run(dist_dir, fullname, clean, zip_dist)
+
+        embeds = [self._for_target(target) for target in self.targets]
+        for embed in embeds:
+            embed._check_target()
+
+        logger.info("building {0} targets".format(len(embeds)))
+        with concurrent.futures.ThreadPoolExecutor(len(embeds)) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    embed._run,
+                    dist_dir,
+                    "{0}-{1}".format(fullname, _target_dist_tag(embed.target)),
+                    clean,
+                    zip_dist,
+                )
+                for embed in embeds
+            ]
+            return [future.result() for future in futures]
+
+    def _run(self, dist_dir, fullname, clean, zip_dist):
+        """
+        Creates the distribution of the target in *dist_dir*/*fullname*.
+        """
         # Create working directory
         workdir = dist_dir.joinpath(fullname)
-        if workdir.exists() and clean:
-            shutil.rmtree(workdir)
+        state = BuildState(dist_dir.joinpath(fullname + ".py2win-state.json"), dist_dir)
+        if clean:
+            if workdir.exists():
+                shutil.rmtree(workdir)
+            state.clear()
+
+        # Removed files cannot be restored, start over if a shaken or
+        # deduplicated tree needs to change
+        if state.digest("shake") is not None or state.digest("dedup") is not None:
+            python_inputs = self._python_inputs()
+            packages_inputs = self._packages_inputs(digest_inputs(python_inputs))
+            shake_inputs = self._shake_inputs(digest_inputs(packages_inputs))
+            dedup_inputs = self._dedup_inputs(
+                digest_inputs(packages_inputs),
+                digest_inputs(shake_inputs) if self.tree_shaking else None,
+            )
+            current = state.is_current("python", python_inputs) and (
+                state.is_current("packages", packages_inputs)
+            )
+            if state.digest("shake") is not None:
+                current = current and self.tree_shaking
+                current = current and state.is_current("shake", shake_inputs)
+            if state.digest("dedup") is not None:
+                current = current and self.dedup
+                current = current and state.is_current("dedup", dedup_inputs)
+            if not current:
+                logger.info("files were removed from the tree, starting over")
+                if workdir.exists():
+                    shutil.rmtree(workdir)
+                state.clear()
 
         workdir.mkdir(parents=True, exist_ok=True)
 
-        # Install python
-        python_executable = workdir.joinpath("python.exe")
-        if not python_executable.exists():
-            self._download_python_embedded(workdir)
-            self._prepare_python(workdir)
-            self._fix_lib2to3(workdir)
-
-        # Install pip
-        self._install_pip(python_executable)
+        # Independent stages run concurrently, the stages modifying the
+        # site-packages run in sequence
+        scheduler = self._new_scheduler()
 
-        # Install wheels, pypi and requirements
-        self._install_wheels(python_executable)
-        self._install_requirements(python_executable)
+        # Install python
+        python_inputs = self._python_inputs()
+        python_current = state.is_current("python", python_inputs)
+
+        def install_python():
+            if python_current:
+                self.report.skip("python", self.target)
+                return
+
+            with self.report.stage("python", self.target, workdir):
+                if self.base_tree_pool is not None:
+                    self._clone_base_tree(workdir)
+                else:
+                    self._install_python(workdir)
+            state.update("python", python_inputs, [Path(fullname, "python.exe")])
+            state.remove("packages")
+
+        scheduler.add("python", install_python)
+
+        # Download get-pip.py while python is installed
+        packages_current = python_current and state.is_current(
+            "packages", self._packages_inputs(state.digest("python"))
+        )
+        if not packages_current and self._prefetches_pip():
+            scheduler.add("get-pip", lambda: self._prefetch_file(self.GET_PIP_URL))
+
+        # Compile the missing launchers together, while the packages are
+        # installed
+        consoles = sorted({console for *_, console in self.scripts})
+        if consoles:
+            scheduler.add("launchers", lambda: self._get_launchers(consoles))
+
+        # Install packages
+        def install_packages():
+            inputs = self._packages_inputs(state.digest("python"))
+            zip_filepath = workdir.joinpath("Lib", SITE_PACKAGES_ZIP_FILENAME)
+            if not state.is_current("packages", inputs) and zip_filepath.exists():
+                self._reset_site_packages(workdir)
+
+            if state.is_current("packages", inputs):
+                logger.info("packages are up-to-date")
+                self.report.skip("packages", self.target)
+            else:
+                with self.report.stage("packages", self.target, workdir):
+                    self._install_packages(workdir, python_executable)
+
+            state.update("packages", inputs)
 
-        # Process entry points
+        python_executable = workdir.joinpath("python.exe")
+        scheduler.add("packages", install_packages, ["python"])
+        last_stage = "packages"
+
+        # Remove unreachable modules
+        if self.tree_shaking:
+
+            def shake():
+                inputs = self._shake_inputs(state.digest("packages"))
+                report_filepath = dist_dir.joinpath(fullname + ".py2win-shake.json")
+                if state.is_current("shake", inputs):
+                    self.report.skip("shake", self.target)
+                else:
+                    with self.report.stage("shake", self.target):
+                        self._shake_tree(workdir, report_filepath)
+                    state.update("shake", inputs, [report_filepath.name])
+
+            scheduler.add("shake", shake, [last_stage])
+            last_stage = "shake"
+
+        # Remove duplicate DLLs
+        if self.dedup:
+
+            def dedup():
+                inputs = self._dedup_inputs(
+                    state.digest("packages"), state.digest("shake")
+                )
+                report_filepath = dist_dir.joinpath(fullname + ".py2win-dedup.json")
+                if state.is_current("dedup", inputs):
+                    self.report.skip("dedup", self.target)
+                else:
+                    with self.report.stage("dedup", self.target):
+                        self._dedup_tree(workdir, report_filepath)
+                    state.update("dedup", inputs, [report_filepath.name])
+
+            scheduler.add("dedup", dedup, [last_stage])
+            last_stage = "dedup"
+
+        # Compile bytecode
+        if self.compile_bytecode:
+
+            def compile_bytecode():
+                inputs = {
+                    "packages": state.digest("packages"),
+                    "shake": state.digest("shake"),
+                    "optimize": self.optimize,
+                    "invalidation_mode": self.invalidation_mode,
+                    "drop_sources": self.drop_sources,
+                }
+                if state.is_current("bytecode", inputs):
+                    self.report.skip("bytecode", self.target)
+                else:
+                    with self.report.stage("bytecode", self.target, workdir):
+                        self._compile_bytecode(workdir)
+                    state.update("bytecode", inputs)
+
+            scheduler.add("bytecode", compile_bytecode, [last_stage])
+            last_stage = "bytecode"
+
+        # Zip site-packages
+        if self.zip_site_packages:
+
+            def zip_packages():
+                inputs = {
+                    "packages": state.digest("packages"),
+                    "shake": state.digest("shake"),
+                    "bytecode": state.digest("bytecode"),
+                    "optimize": self.optimize,
+                }
+                if state.is_current("zip_site_packages", inputs):
+                    self.report.skip("zip_site_packages", self.target)
+                else:
+                    with self.report.stage("zip_site_packages", self.target, workdir):
+                        self._zip_site_packages(workdir)
+                    state.update("zip_site_packages", inputs)
+
+            scheduler.add("zip_site_packages", zip_packages, [last_stage])
+            last_stage = "zip_site_packages"
+
+        # Process entry points, once the files of the previous stages are
+        # written, so the files written by each stage are counted separately
+        stages = set()
         for module, method, executable_name, console in self.scripts:
-            self._create_main(workdir, module, method, executable_name, console)
+            stage = "script:" + executable_name
+            stages.add(stage)
+
+            def create_main(stage, module, method, executable_name, console):
+                inputs = self._script_inputs(
+                    state.digest("python"), module, method, executable_name, console
+                )
+                if state.is_current(stage, inputs):
+                    logger.info("{0} is up-to-date".format(executable_name))
+                    self.report.skip(stage, self.target)
+                    return
+
+                with self.report.stage(stage, self.target, workdir):
+                    self._create_main(workdir, module, method, executable_name, console)
+                state.update(stage, inputs, [Path(fullname, executable_name + ".exe")])
+
+            scheduler.add(
+                stage,
+                functools.partial(
+                    create_main, stage, module, method, executable_name, console
+                ),
+                [last_stage, "launchers"],
+            )
+
+        for stage in list(state.stages):
+            if not stage.startswith("script:") or stage in stages:
+                continue
+
+            for path in state.outputs(stage):
+                filepath = dist_dir.joinpath(path)
+                if filepath.exists():
+                    logger.info("removing {0}".format(filepath))
+                    filepath.unlink()
+            state.remove(stage)
+
+        self._run_scheduler(scheduler)
 
         # Create zip
         if zip_dist:
-            self._create_zip(workdir, dist_dir, fullname)
+            inputs = {
+                stage: state.digest(stage) for stage in state.stages if stage != "zip"
+            }
+            inputs["compression"] = [
+                self.compresslevel,
+                sorted(self.compresslevels.items()),
+            ]
+            if state.is_current("zip", inputs):
+                logger.info("zip is up-to-date")
+                self.report.skip("zip", self.target)
+            else:
+                with self.report.stage("zip", self.target):
+                    self._create_zip(workdir, dist_dir, fullname)
+                state.update("zip", inputs, [fullname + ".zip"])
+
+        self.report.add_target(
+            self.target,
+            workdir,
+            dist_dir.joinpath(fullname + ".zip") if zip_dist else None,
+        )
 
         return workdir
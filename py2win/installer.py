@@ -0,0 +1,213 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path, PurePosixPath
+import os
+import re
+import csv
+import base64
+import shutil
+import hashlib
+import zipfile
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+INSTALLER_NAME = "py2win"
+
+
+def normalize_name(name):
+    """
+    Returns the normalized name of a distribution (PEP 503).
+    """
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+class WheelInstaller:
+    """
+    Installs already resolved wheels in the layout of an embedded distribution,
+    without pip.
+
+    Wheels are unpacked concurrently. Dependencies are not resolved and
+    entry points are not converted to executables.
+    The ``.data`` directories of the wheels are installed as follows:
+
+    * ``purelib`` and ``platlib``: ``Lib/site-packages``
+    * ``scripts``: ``Scripts``
+    * ``headers``: ``Include/<distribution>``
+    * ``data``: root of the distribution
+    """
+
+    def __init__(self, workdir, max_workers=None):
+        """
+        :arg workdir: root of the embedded distribution
+        :arg max_workers: maximum number of wheels installed concurrently
+        """
+        self.workdir = Path(workdir)
+        self.site_packages = self.workdir.joinpath("Lib", "site-packages")
+        self.max_workers = max_workers
+
+    def _parse_filename(self, filepath):
+        parts = Path(filepath).stem.split("-")
+        if len(parts) not in (5, 6):
+            raise ValueError("Invalid wheel filename: {}".format(filepath))
+        return parts[0], parts[1]
+
+    def _scheme_path(self, key, name):
+        if key in ("purelib", "platlib"):
+            return self.site_packages
+        if key == "scripts":
+            return self.workdir.joinpath("Scripts")
+        if key == "headers":
+            return self.workdir.joinpath("Include", name)
+        if key == "data":
+            return self.workdir
+        raise ValueError("Unknown wheel data directory: {}".format(key))
+
+    def _find_distinfo_dirs(self, name):
+        if not self.site_packages.exists():
+            return []
+
+        name = normalize_name(name)
+        return [
+            dirpath
+            for dirpath in self.site_packages.glob("*.dist-info")
+            if normalize_name(dirpath.name[: -len(".dist-info")].rsplit("-", 1)[0])
+            == name
+        ]
+
+    def uninstall(self, name):
+        """
+        Removes the files of the installed distribution *name*, if any.
+        """
+        for distinfo_dir in self._find_distinfo_dirs(name):
+            logger.debug("uninstalling {0}".format(distinfo_dir.name))
+
+            record_filepath = distinfo_dir.joinpath("RECORD")
+            if record_filepath.exists():
+                with open(record_filepath, "r", newline="", encoding="utf-8") as fp:
+                    for row in csv.reader(fp):
+                        filepath = self.site_packages.joinpath(row[0])
+                        if filepath.is_file():
+                            filepath.unlink()
+
+            if distinfo_dir.exists():
+                shutil.rmtree(distinfo_dir)
+
+    def install_wheel(self, filepath):
+        """
+        Installs a single wheel and returns the path of its ``.dist-info``
+        directory.
+        """
+        filepath = Path(filepath)
+        name, version = self._parse_filename(filepath)
+        logger.debug("installing {0}".format(filepath.name))
+
+        self.uninstall(name)
+
+        distinfo_name = "{}-{}.dist-info".format(name, version)
+        data_name = "{}-{}.data".format(name, version)
+
+        records = []
+        with zipfile.ZipFile(filepath, "r") as zf:
+            # Find the actual .dist-info directory, its case may differ
+            for arcname in zf.namelist():
+                top = arcname.split("/", 1)[0]
+                if top.lower() == distinfo_name.lower():
+                    distinfo_name = top
+                elif top.lower() == data_name.lower():
+                    data_name = top
+
+            expected_hashes = {}
+            record_arcname = distinfo_name + "/RECORD"
+            if record_arcname in zf.namelist():
+                content = zf.read(record_arcname).decode("utf-8")
+                for row in csv.reader(content.splitlines()):
+                    if len(row) >= 2 and row[1]:
+                        expected_hashes[row[0]] = row[1]
+
+            for info in zf.infolist():
+                arcname = info.filename
+                if info.is_dir() or arcname == record_arcname:
+                    continue
+
+                path = PurePosixPath(arcname)
+                if ".." in path.parts or path.is_absolute():
+                    raise IOError("Invalid path {} in {}".format(arcname, filepath))
+
+                if path.parts[0] == data_name:
+                    basedir = self._scheme_path(path.parts[1], name)
+                    destpath = basedir.joinpath(*path.parts[2:])
+                else:
+                    destpath = self.site_packages.joinpath(*path.parts)
+
+                data = zf.read(info)
+                digest = _record_hash(data)
+                if arcname in expected_hashes and expected_hashes[arcname] != digest:
+                    raise IOError(
+                        "Hash mismatch for {} in {}".format(arcname, filepath)
+                    )
+
+                # Replace instead of overwriting, the file may be hardlinked
+                destpath.parent.mkdir(parents=True, exist_ok=True)
+                if destpath.exists():
+                    destpath.unlink()
+                with open(destpath, "wb") as fp:
+                    fp.write(data)
+
+                records.append(
+                    (
+                        os.path.relpath(destpath, self.site_packages).replace(
+                            os.sep, "/"
+                        ),
+                        digest,
+                        str(len(data)),
+                    )
+                )
+
+        distinfo_dir = self.site_packages.joinpath(distinfo_name)
+
+        installer_data = (INSTALLER_NAME + "\n").encode("utf-8")
+        distinfo_dir.joinpath("INSTALLER").write_bytes(installer_data)
+        records.append(
+            (
+                distinfo_name + "/INSTALLER",
+                _record_hash(installer_data),
+                str(len(installer_data)),
+            )
+        )
+        records.append((distinfo_name + "/RECORD", "", ""))
+
+        with open(
+            distinfo_dir.joinpath("RECORD"), "w", newline="", encoding="utf-8"
+        ) as fp:
+            writer = csv.writer(fp, lineterminator="\n")
+            writer.writerows(records)
+
+        return distinfo_dir
+
+    def install(self, filepaths):
+        """
+        Installs the wheels at *filepaths* concurrently.
+        Returns the paths of the ``.dist-info`` directories.
+        """
+        filepaths = list(filepaths)
+        names = [normalize_name(self._parse_filename(fp)[0]) for fp in filepaths]
+        if len(set(names)) != len(names):
+            raise ValueError("Several wheels for the same distribution")
+
+        self.site_packages.mkdir(parents=True, exist_ok=True)
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            return list(executor.map(self.install_wheel, filepaths))
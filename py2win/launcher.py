@@ -0,0 +1,764 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import sys
+import shutil
+import struct
+import hashlib
+import sysconfig
+import threading
+import concurrent.futures
+from setuptools._distutils.ccompiler import new_compiler
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+
+"""
+Compiler shared by the compilations of the process, see :func:`_get_compiler`.
+"""
+_compiler = None
+_compiler_lock = threading.Lock()
+
+"""
+Generic launchers are compiled once and stamped for each script: a trailer
+appended at the end of the executable contains the entry point.
+The trailer is a payload of NUL-terminated UTF-8 ``key=value`` strings,
+followed by the size of the payload (4 bytes, little-endian) and a magic
+number (8 bytes).
+"""
+TRAILER_MAGIC = b"PY2WINL1"
+
+LAUNCHER_COMMON_CODE = r"""
+#include <windows.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include "Python.h"
+
+#define PY2WIN_MAGIC "PY2WINL1"
+#define PY2WIN_FOOTER_SIZE 12
+
+static char *py2win_read_stamp(size_t *size)
+{
+    wchar_t path[32768];
+    unsigned char footer[PY2WIN_FOOTER_SIZE];
+    char *payload = NULL;
+    FILE *fp;
+
+    if (GetModuleFileNameW(NULL, path, 32768) == 0)
+        return NULL;
+
+    fp = _wfopen(path, L"rb");
+    if (fp == NULL)
+        return NULL;
+
+    if (fseek(fp, -PY2WIN_FOOTER_SIZE, SEEK_END) != 0 ||
+        fread(footer, 1, PY2WIN_FOOTER_SIZE, fp) != PY2WIN_FOOTER_SIZE ||
+        memcmp(footer + 4, PY2WIN_MAGIC, 8) != 0)
+        goto error;
+
+    *size = (size_t)footer[0] | ((size_t)footer[1] << 8) |
+            ((size_t)footer[2] << 16) | ((size_t)footer[3] << 24);
+
+    payload = malloc(*size + 1);
+    if (payload == NULL ||
+        fseek(fp, -(long)(PY2WIN_FOOTER_SIZE + *size), SEEK_END) != 0 ||
+        fread(payload, 1, *size, fp) != *size)
+        goto error;
+
+    payload[*size] = '\0';
+    fclose(fp);
+    return payload;
+
+error:
+    free(payload);
+    fclose(fp);
+    return NULL;
+}
+
+static wchar_t *py2win_get_value(const char *payload, size_t size, const char *key)
+{
+    size_t keylen = strlen(key);
+    const char *p = payload;
+    wchar_t *value;
+    int length;
+
+    while (p < payload + size) {
+        if (strncmp(p, key, keylen) == 0 && p[keylen] == '=') {
+            p += keylen + 1;
+            length = MultiByteToWideChar(CP_UTF8, 0, p, -1, NULL, 0);
+            value = malloc(length * sizeof(wchar_t));
+            if (value != NULL)
+                MultiByteToWideChar(CP_UTF8, 0, p, -1, value, length);
+            return value;
+        }
+        p += strlen(p) + 1;
+    }
+
+    return NULL;
+}
+
+static wchar_t *py2win_get_code(void)
+{
+    size_t size;
+    char *payload = py2win_read_stamp(&size);
+    wchar_t *code;
+
+    if (payload == NULL)
+        return NULL;
+
+    code = py2win_get_value(payload, size, "code");
+    free(payload);
+    return code;
+}
+"""
+
+LAUNCHER_GUI_CODE = LAUNCHER_COMMON_CODE + r"""
+int WINAPI wWinMain(HINSTANCE hInstance, HINSTANCE hPrevInstance,
+                   LPWSTR lpstrCmd, int nShow)
+{
+    wchar_t *args[] = { L"-I", L"-c", NULL };
+
+    args[2] = py2win_get_code();
+    if (args[2] == NULL) {
+        MessageBoxW(NULL, L"No entry point in executable", L"Error", MB_ICONERROR);
+        return 1;
+    }
+
+    return Py_Main(3, args);
+}
+"""
+
+"""
+According to the Python sys.argv documentation, "If the command was executed using the -c command line option to the interpreter, argv[0] is set to the string '-c'".
+This causes problem with argument parsers which expects the program name to be the first argument.
+The ``sys.argv`` are therefore modified to set first argument as the executable.
+"""
+LAUNCHER_CONSOLE_CODE = LAUNCHER_COMMON_CODE + r"""
+int main(int argc, char *argv[])
+{
+    wchar_t *code = py2win_get_code();
+    if (code == NULL) {
+        fprintf(stderr, "No entry point in executable\n");
+        return 1;
+    }
+
+    wchar_t** _argv = PyMem_Malloc(sizeof(wchar_t*)*(argc + 2));
+    _argv[0] = L"-I";
+    _argv[1] = L"-c";
+    _argv[2] = code;
+    for (int i=1; i<argc; i++) {
+      wchar_t* arg = Py_DecodeLocale(argv[i], NULL);
+      _argv[i + 2] = arg;
+    }
+
+    int returncode = Py_Main(argc + 2, _argv);
+
+    PyMem_Free(_argv);
+    free(code);
+
+    return returncode;
+}
+"""
+
+"""
+Launchers of the ``pyconfig`` variant initialize Python with the
+:c:type:`PyConfig` API, with the module search path stamped in the
+executable, and call the entry point directly: the command line is not
+parsed as interpreter options and no ``-c`` code is compiled.
+The trailer contains the module and method of the entry point, the module
+search path (``path``, separated by ``;``, relative to the directory of the
+executable) and whether the :mod:`site` module is imported (``site``).
+The code is portable, so it can be compiled and tested with gcc on Linux.
+"""
+LAUNCHER_PYCONFIG_COMMON_CODE = r"""
+#ifdef _WIN32
+#include <windows.h>
+#else
+#include <limits.h>
+#include <unistd.h>
+#endif
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <wchar.h>
+#include "Python.h"
+
+#define PY2WIN_MAGIC "PY2WINL1"
+#define PY2WIN_FOOTER_SIZE 12
+#define PY2WIN_MAX_PATH 32768
+
+#ifdef _WIN32
+#define PY2WIN_SEP L'\\'
+#else
+#define PY2WIN_SEP L'/'
+#endif
+
+static int py2win_get_executable(wchar_t *path, size_t size)
+{
+#ifdef _WIN32
+    DWORD length = GetModuleFileNameW(NULL, path, (DWORD)size);
+    return (length == 0 || length >= size) ? -1 : 0;
+#else
+    char buffer[PATH_MAX];
+    ssize_t length = readlink("/proc/self/exe", buffer, sizeof(buffer) - 1);
+    wchar_t *decoded;
+
+    if (length < 0)
+        return -1;
+    buffer[length] = '\0';
+
+    decoded = Py_DecodeLocale(buffer, NULL);
+    if (decoded == NULL || wcslen(decoded) >= size) {
+        PyMem_RawFree(decoded);
+        return -1;
+    }
+    wcscpy(path, decoded);
+    PyMem_RawFree(decoded);
+    return 0;
+#endif
+}
+
+static char *py2win_read_stamp(const wchar_t *path, size_t *size)
+{
+    unsigned char footer[PY2WIN_FOOTER_SIZE];
+    char *payload = NULL;
+    FILE *fp;
+
+#ifdef _WIN32
+    fp = _wfopen(path, L"rb");
+#else
+    fp = fopen("/proc/self/exe", "rb");
+#endif
+    if (fp == NULL)
+        return NULL;
+
+    if (fseek(fp, -PY2WIN_FOOTER_SIZE, SEEK_END) != 0 ||
+        fread(footer, 1, PY2WIN_FOOTER_SIZE, fp) != PY2WIN_FOOTER_SIZE ||
+        memcmp(footer + 4, PY2WIN_MAGIC, 8) != 0)
+        goto error;
+
+    *size = (size_t)footer[0] | ((size_t)footer[1] << 8) |
+            ((size_t)footer[2] << 16) | ((size_t)footer[3] << 24);
+
+    payload = malloc(*size + 1);
+    if (payload == NULL ||
+        fseek(fp, -(long)(PY2WIN_FOOTER_SIZE + *size), SEEK_END) != 0 ||
+        fread(payload, 1, *size, fp) != *size)
+        goto error;
+
+    payload[*size] = '\0';
+    fclose(fp);
+    return payload;
+
+error:
+    free(payload);
+    fclose(fp);
+    return NULL;
+}
+
+static const char *py2win_get_value(const char *payload, size_t size, const char *key)
+{
+    size_t keylen = strlen(key);
+    const char *p = payload;
+
+    while (p < payload + size) {
+        if (strncmp(p, key, keylen) == 0 && p[keylen] == '=')
+            return p + keylen + 1;
+        p += strlen(p) + 1;
+    }
+
+    return NULL;
+}
+
+/* Decodes a UTF-8 string, the result is freed with PyMem_RawFree() */
+static wchar_t *py2win_decode(const char *value)
+{
+#ifdef _WIN32
+    int length = MultiByteToWideChar(CP_UTF8, 0, value, -1, NULL, 0);
+    wchar_t *result = PyMem_RawMalloc(length * sizeof(wchar_t));
+
+    if (result != NULL)
+        MultiByteToWideChar(CP_UTF8, 0, value, -1, result, length);
+    return result;
+#else
+    return Py_DecodeLocale(value, NULL);
+#endif
+}
+
+static void py2win_error(const char *message)
+{
+#if defined(_WIN32) && defined(PY2WIN_GUI)
+    MessageBoxA(NULL, message, "Error", MB_ICONERROR);
+#else
+    fprintf(stderr, "%s\n", message);
+#endif
+}
+
+static PyStatus py2win_set_search_paths(PyConfig *config, const wchar_t *dirname,
+                                        const char *paths)
+{
+    static char item[PY2WIN_MAX_PATH];
+    static wchar_t path[PY2WIN_MAX_PATH];
+    const char *start = paths;
+    const char *end;
+    wchar_t *decoded;
+    size_t length;
+    PyStatus status;
+
+    config->module_search_paths_set = 1;
+
+    while (*start != '\0') {
+        end = strchr(start, ';');
+        length = end == NULL ? strlen(start) : (size_t)(end - start);
+        if (length >= PY2WIN_MAX_PATH)
+            return PyStatus_Error("Module search path too long");
+
+        memcpy(item, start, length);
+        item[length] = '\0';
+        start += end == NULL ? length : length + 1;
+        if (length == 0)
+            continue;
+
+        decoded = py2win_decode(item);
+        if (decoded == NULL)
+            return PyStatus_NoMemory();
+
+        /* Absolute paths are used as is */
+        if (decoded[0] == L'/' || decoded[0] == L'\\' ||
+            (decoded[0] != L'\0' && decoded[1] == L':'))
+            wcsncpy(path, decoded, PY2WIN_MAX_PATH - 1);
+        else if (wcscmp(decoded, L".") == 0)
+            wcsncpy(path, dirname, PY2WIN_MAX_PATH - 1);
+        else
+            swprintf(path, PY2WIN_MAX_PATH, L"%ls%lc%ls", dirname, PY2WIN_SEP, decoded);
+        path[PY2WIN_MAX_PATH - 1] = L'\0';
+        PyMem_RawFree(decoded);
+
+        status = PyWideStringList_Append(&config->module_search_paths, path);
+        if (PyStatus_Exception(status))
+            return status;
+    }
+
+    return PyStatus_Ok();
+}
+
+/* Imports the module and calls the method, as a console_scripts wrapper */
+static int py2win_call(const char *module_name, const char *method_name,
+                       const wchar_t *executable)
+{
+    PyObject *argv, *value, *module, *object, *attribute, *result;
+    char name[1024];
+    char *part, *next;
+
+    /* sys.argv[0] is the full path of the executable */
+    argv = PySys_GetObject("argv");
+    if (argv != NULL && PyList_Check(argv) && PyList_GET_SIZE(argv) > 0) {
+        value = PyUnicode_FromWideChar(executable, -1);
+        if (value == NULL || PyList_SetItem(argv, 0, value) < 0)
+            goto error;
+    }
+
+    module = PyImport_ImportModule(module_name);
+    if (module == NULL)
+        goto error;
+
+    /* The method may be an attribute of an object, e.g. "cli.main" */
+    if (strlen(method_name) >= sizeof(name)) {
+        Py_DECREF(module);
+        PyErr_SetString(PyExc_ValueError, "Entry point too long");
+        goto error;
+    }
+    strcpy(name, method_name);
+
+    object = module;
+    for (part = name; part != NULL; part = next) {
+        next = strchr(part, '.');
+        if (next != NULL)
+            *next++ = '\0';
+
+        attribute = PyObject_GetAttrString(object, part);
+        Py_DECREF(object);
+        if (attribute == NULL)
+            goto error;
+        object = attribute;
+    }
+
+    result = PyObject_CallObject(object, NULL);
+    Py_DECREF(object);
+    if (result == NULL)
+        goto error;
+
+    /* Return value is the exit status, as with sys.exit(main()) */
+    if (result != Py_None) {
+        PyErr_SetObject(PyExc_SystemExit, result);
+        Py_DECREF(result);
+        goto error;
+    }
+
+    Py_DECREF(result);
+    return 0;
+
+error:
+    /* Exits the process with the status of SystemExit */
+    PyErr_Print();
+    return 1;
+}
+
+static int py2win_run(int argc, wchar_t **wargv, char **argv)
+{
+    static wchar_t executable[PY2WIN_MAX_PATH];
+    static wchar_t dirname[PY2WIN_MAX_PATH];
+    wchar_t *separator;
+    char *payload;
+    const char *module, *method, *paths, *site;
+    size_t size;
+    PyStatus status;
+    PyConfig config;
+    int exitcode;
+
+    if (py2win_get_executable(executable, PY2WIN_MAX_PATH) != 0) {
+        py2win_error("Cannot find the path of the executable");
+        return 1;
+    }
+
+    wcscpy(dirname, executable);
+    separator = wcsrchr(dirname, PY2WIN_SEP);
+    if (separator != NULL)
+        *separator = L'\0';
+
+    payload = py2win_read_stamp(executable, &size);
+    module = payload == NULL ? NULL : py2win_get_value(payload, size, "module");
+    method = payload == NULL ? NULL : py2win_get_value(payload, size, "method");
+    paths = payload == NULL ? NULL : py2win_get_value(payload, size, "path");
+    site = payload == NULL ? NULL : py2win_get_value(payload, size, "site");
+    if (module == NULL || method == NULL || paths == NULL) {
+        py2win_error("No entry point in executable");
+        free(payload);
+        return 1;
+    }
+
+    /* Isolated mode, as python -I */
+    PyConfig_InitPythonConfig(&config);
+    config.isolated = 1;
+    config.parse_argv = 0;
+    config.pathconfig_warnings = 0;
+    config.site_import = site == NULL || strcmp(site, "1") == 0;
+
+    status = PyConfig_SetString(&config, &config.program_name, executable);
+    if (PyStatus_Exception(status))
+        goto fail;
+
+    /* The home disables the ._pth file, the search path is precomputed */
+    status = PyConfig_SetString(&config, &config.home, dirname);
+    if (PyStatus_Exception(status))
+        goto fail;
+
+    status = py2win_set_search_paths(&config, dirname, paths);
+    if (PyStatus_Exception(status))
+        goto fail;
+
+    if (wargv != NULL)
+        status = PyConfig_SetArgv(&config, argc, wargv);
+    else
+        status = PyConfig_SetBytesArgv(&config, argc, argv);
+    if (PyStatus_Exception(status))
+        goto fail;
+
+    status = Py_InitializeFromConfig(&config);
+    if (PyStatus_Exception(status))
+        goto fail;
+    PyConfig_Clear(&config);
+
+    exitcode = py2win_call(module, method, executable);
+    free(payload);
+
+    if (Py_FinalizeEx() < 0)
+        exitcode = 120;
+    return exitcode;
+
+fail:
+    PyConfig_Clear(&config);
+    free(payload);
+    if (PyStatus_IsExit(status))
+        return status.exitcode;
+    Py_ExitStatusException(status);
+    return 1;
+}
+"""
+
+LAUNCHER_PYCONFIG_CONSOLE_CODE = LAUNCHER_PYCONFIG_COMMON_CODE + r"""
+#ifdef _WIN32
+int wmain(int argc, wchar_t *argv[])
+{
+    return py2win_run(argc, argv, NULL);
+}
+#else
+int main(int argc, char *argv[])
+{
+    return py2win_run(argc, NULL, argv);
+}
+#endif
+"""
+
+LAUNCHER_PYCONFIG_GUI_CODE = (
+    "#define PY2WIN_GUI\n" + LAUNCHER_PYCONFIG_COMMON_CODE + r"""
+#ifdef _WIN32
+int WINAPI wWinMain(HINSTANCE hInstance, HINSTANCE hPrevInstance,
+                   LPWSTR lpstrCmd, int nShow)
+{
+    return py2win_run(__argc, __wargv, NULL);
+}
+#else
+int main(int argc, char *argv[])
+{
+    return py2win_run(argc, NULL, argv);
+}
+#endif
+"""
+)
+
+"""
+Launcher variants: ``py_main`` runs the entry point with ``Py_Main`` and
+``-I -c``, ``pyconfig`` initializes Python with :c:type:`PyConfig`.
+"""
+LAUNCHER_CODES = {
+    ("py_main", True): LAUNCHER_CONSOLE_CODE,
+    ("py_main", False): LAUNCHER_GUI_CODE,
+    ("pyconfig", True): LAUNCHER_PYCONFIG_CONSOLE_CODE,
+    ("pyconfig", False): LAUNCHER_PYCONFIG_GUI_CODE,
+}
+LAUNCHER_VARIANTS = ("py_main", "pyconfig")
+
+
+def get_launcher_code(console=True, variant="py_main"):
+    """
+    Returns the C code of the generic console or GUI launcher.
+
+    :arg variant: launcher variant, ``py_main`` or ``pyconfig``
+    """
+    if variant not in LAUNCHER_VARIANTS:
+        raise ValueError("Unknown launcher variant: {}".format(variant))
+    return LAUNCHER_CODES[variant, console]
+
+
+def get_launcher_key(target, console=True, variant="py_main"):
+    """
+    Returns the key of the generic launcher for *target* in the artifact cache.
+    The key changes with the code of the launcher.
+    """
+    code = get_launcher_code(console, variant)
+    digest = hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+    kind = "console" if console else "gui"
+    if variant != "py_main":
+        kind += "-" + variant
+    return "launcher-{0}-{1.python_version}-{1.arch}-{2}".format(kind, target, digest)
+
+
+def get_entry_point_code(module, method, console=True):
+    """
+    Returns the Python code executed by the launcher to start the entry point.
+    """
+    if console:
+        return "import sys; sys.argv[0] = sys.executable; import {0}; {0}.{1}()".format(
+            module, method
+        )
+    return "import {0}; {0}.{1}()".format(module, method)
+
+
+def stamp_launcher(
+    launcher_filepath,
+    filepath,
+    module,
+    method,
+    console=True,
+    search_paths=None,
+    import_site=True,
+):
+    """
+    Creates the executable at *filepath* from a generic launcher by appending
+    the entry point in a trailer.
+
+    :arg search_paths: module search path of the ``pyconfig`` launcher,
+        relative to the directory of the executable
+    :arg import_site: whether the ``pyconfig`` launcher imports :mod:`site`
+    """
+    values = {
+        "module": module,
+        "method": method,
+        "code": get_entry_point_code(module, method, console),
+    }
+
+    if search_paths is not None:
+        for path in search_paths:
+            if ";" in str(path):
+                raise ValueError("Invalid character in path: {!r}".format(path))
+        values["path"] = ";".join(str(path) for path in search_paths)
+        values["site"] = "1" if import_site else "0"
+
+    payload = b""
+    for key, value in values.items():
+        data = value.encode("utf-8")
+        if b"\0" in data:
+            raise ValueError("Invalid character in {}: {!r}".format(key, value))
+        payload += key.encode("ascii") + b"=" + data + b"\0"
+
+    shutil.copyfile(launcher_filepath, filepath)
+    with open(filepath, "ab") as fp:
+        fp.write(payload)
+        fp.write(struct.pack("<I", len(payload)))
+        fp.write(TRAILER_MAGIC)
+
+
+def read_stamp(filepath):
+    """
+    Returns the values stamped in the executable at *filepath*, or ``None``
+    if the executable is not stamped.
+    """
+    with open(filepath, "rb") as fp:
+        fp.seek(0, os.SEEK_END)
+        if fp.tell() < 12:
+            return None
+
+        fp.seek(-12, os.SEEK_END)
+        footer = fp.read(12)
+        if footer[4:] != TRAILER_MAGIC:
+            return None
+
+        (size,) = struct.unpack("<I", footer[:4])
+        fp.seek(-12 - size, os.SEEK_END)
+        payload = fp.read(size)
+
+    values = {}
+    for item in payload.split(b"\0")[:-1]:
+        key, value = item.decode("utf-8").split("=", 1)
+        values[key] = value
+    return values
+
+
+def _get_compiler():
+    """
+    Returns the compiler of the running interpreter, initialized with the
+    include and library directories of Python.
+    The compiler is initialized once and kept for the life of the process,
+    so a long-running process (e.g. :mod:`py2win.daemon`) only looks up the
+    compiler and its environment once.
+    """
+    global _compiler
+
+    with _compiler_lock:
+        if _compiler is None:
+            _compiler = _new_compiler()
+        return _compiler
+
+
+def _new_compiler():
+    compiler = new_compiler(verbose=True)
+    if hasattr(compiler, "initialize"):  # MSVC only
+        compiler.initialize()
+
+    py_include = sysconfig.get_path("include")
+    compiler.include_dirs.append(py_include)
+
+    plat_py_include = sysconfig.get_path("platinclude")
+    if plat_py_include != py_include:
+        compiler.include_dirs.append(plat_py_include)
+
+    library_dir = Path(sys.base_exec_prefix).joinpath("libs")
+    compiler.library_dirs.append(str(library_dir))
+
+    return compiler
+
+
+def _launcher_libraries(console):
+    """
+    Returns the libraries linked with a launcher.
+    The GUI launchers report errors with ``MessageBox``, from ``user32``,
+    which is not linked by default by MSVC.
+    """
+    if console or sys.platform != "win32":
+        return []
+    return ["user32"]
+
+
+def compile_launchers(
+    build_dir, launchers, manifest_filepath=None, max_workers=None, variant="py_main"
+):
+    """
+    Compiles several generic launchers in a single compiler session: the
+    compiler is initialized once, all sources are compiled together and the
+    executables are linked in parallel.
+    The working directory of the process is not changed, so launchers can be
+    compiled from several threads.
+
+    :arg build_dir: directory where the executables are compiled
+    :arg launchers: :class:`list` of ``(executable_name, console)``
+    :arg manifest_filepath: manifest to use when linking the executables
+    :arg max_workers: number of executables linked concurrently
+    :arg variant: launcher variant, see :func:`get_launcher_code`
+    :return: :class:`dict` of the paths of the executables per name
+    """
+    build_dir = Path(build_dir).resolve()
+
+    # Create code
+    logger.info("writing launcher code")
+
+    c_filepaths = []
+    for executable_name, console in launchers:
+        c_filepath = build_dir.joinpath(executable_name + ".c")
+        with open(c_filepath, "w") as fp:
+            fp.write(get_launcher_code(console, variant))
+        c_filepaths.append(c_filepath)
+
+        if manifest_filepath is not None:
+            shutil.copyfile(
+                manifest_filepath,
+                build_dir.joinpath(executable_name + ".exe.manifest"),
+            )
+
+    # Compile
+    logger.info("compiling {0} launchers".format(len(c_filepaths)))
+
+    compiler = _get_compiler()
+    objects = compiler.compile(
+        [str(c_filepath) for c_filepath in c_filepaths], output_dir=str(build_dir)
+    )
+
+    def link(args):
+        (executable_name, console), obj = args
+        compiler.link_executable(
+            [obj],
+            executable_name,
+            output_dir=str(build_dir),
+            libraries=_launcher_libraries(console),
+        )
+        return executable_name, Path(
+            compiler.executable_filename(executable_name, output_dir=str(build_dir))
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        return dict(executor.map(link, zip(launchers, objects)))
+
+
+def compile_launcher(build_dir, executable_name, console=True, manifest_filepath=None):
+    """
+    Compiles the generic launcher with the compiler of the running interpreter
+    and returns the path of the executable.
+
+    :arg build_dir: directory where the executable is compiled
+    :arg executable_name: name of the executable, without extension
+    :arg console: whether to compile the console or GUI launcher
+    :arg manifest_filepath: manifest to use when linking the executable
+    """
+    filepaths = compile_launchers(
+        build_dir, [(executable_name, console)], manifest_filepath
+    )
+    return filepaths[executable_name]
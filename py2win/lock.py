@@ -0,0 +1,181 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import sys
+import json
+import tempfile
+import subprocess
+import collections
+import urllib.parse
+import urllib.request
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+from py2win.installer import normalize_name
+from py2win.cache import sha256sum
+
+# Globals and constants variables.
+LOCK_VERSION = 1
+
+
+class LockedWheel(
+    collections.namedtuple(
+        "LockedWheel", ["name", "version", "filename", "url", "sha256"]
+    )
+):
+    """
+    Exact wheel of a distribution in a lock file.
+    """
+
+    @property
+    def local_filepath(self):
+        """
+        Path of the wheel if its URL is a local file, otherwise ``None``.
+        """
+        parsed = urllib.parse.urlparse(self.url)
+        if parsed.scheme != "file":
+            return None
+        return Path(urllib.request.url2pathname(parsed.path))
+
+
+class LockFile:
+    """
+    Result of a dependency resolution: the exact wheels to install for
+    each target.
+    """
+
+    def __init__(self, requirements=(), targets=None):
+        """
+        :arg requirements: requirements which were resolved
+        :arg targets: :class:`dict` of target keys (``<version>-<arch>``) and
+            lists of :class:`LockedWheel`
+        """
+        self.requirements = sorted(requirements)
+        self.targets = dict(targets or {})
+
+    @staticmethod
+    def target_key(target):
+        return "{0.python_version}-{0.arch}".format(target)
+
+    @classmethod
+    def resolve(
+        cls, target, wheel_filepaths, requirements, find_links=None, pip_args=()
+    ):
+        """
+        Resolves the dependencies of the wheels and requirements for *target*
+        with pip of the running interpreter, without installing anything.
+        The wheels themselves are not locked, only their dependencies.
+
+        :arg target: :class:`Target`
+        :arg wheel_filepaths: wheels of the project
+        :arg requirements: additional requirements
+        :arg find_links: directory containing wheels
+        :arg pip_args: additional arguments of pip (e.g. ``--no-index``)
+        """
+        project_names = set()
+        for filepath in wheel_filepaths:
+            project_names.add(normalize_name(Path(filepath).name.split("-")[0]))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report_filepath = Path(tmpdir, "report.json")
+
+            args = [
+                sys.executable,
+                "-m",
+                "pip",
+                "install",
+                "--dry-run",
+                "--ignore-installed",
+                "--quiet",
+                "--report",
+                str(report_filepath),
+                "--target",
+                str(Path(tmpdir, "target")),
+            ] + target.pip_args
+            if find_links:
+                args += ["--find-links", str(find_links)]
+            args.extend(pip_args)
+
+            args.extend(str(filepath) for filepath in wheel_filepaths)
+            args.extend(requirements)
+
+            logger.debug("running {0}".format(" ".join(args)))
+            subprocess.run(args, check=True)
+
+            with open(report_filepath, "r") as fp:
+                report = json.load(fp)
+
+        wheels = []
+        for item in report["install"]:
+            name = item["metadata"]["name"]
+            if normalize_name(name) in project_names:
+                continue
+
+            url = item["download_info"]["url"]
+            filename = urllib.parse.unquote(url.rsplit("/", 1)[-1].split("#")[0])
+            hashes = item["download_info"].get("archive_info", {}).get("hashes", {})
+            sha256 = hashes.get("sha256")
+
+            wheel = LockedWheel(
+                name, item["metadata"]["version"], filename, url, sha256
+            )
+            if wheel.sha256 is None and wheel.local_filepath is not None:
+                wheel = wheel._replace(sha256=sha256sum(wheel.local_filepath))
+            if wheel.sha256 is None:
+                raise IOError("No SHA-256 hash available for {}".format(url))
+
+            wheels.append(wheel)
+
+        wheels.sort(key=lambda wheel: normalize_name(wheel.name))
+        return cls(requirements, {cls.target_key(target): wheels})
+
+    def update(self, other):
+        """
+        Adds or replaces the targets of the lock file *other*, which must
+        have been resolved for the same requirements.
+        """
+        if other.requirements != self.requirements:
+            raise ValueError("Lock files have different requirements")
+        self.targets.update(other.targets)
+
+    def get_wheels(self, target):
+        """
+        Returns the locked wheels for *target*.
+        """
+        key = self.target_key(target)
+        if key not in self.targets:
+            raise ValueError("Lock file has no entry for target {}".format(key))
+        return self.targets[key]
+
+    @classmethod
+    def read(cls, filepath):
+        with open(filepath, "r") as fp:
+            data = json.load(fp)
+
+        if data.get("version") != LOCK_VERSION:
+            raise ValueError("Unsupported lock file version: {}".format(filepath))
+
+        targets = {}
+        for key, wheels in data["targets"].items():
+            targets[key] = [LockedWheel(**wheel) for wheel in wheels]
+
+        return cls(data["requirements"], targets)
+
+    def write(self, filepath):
+        data = {
+            "version": LOCK_VERSION,
+            "requirements": self.requirements,
+            "targets": {
+                key: [wheel._asdict() for wheel in wheels]
+                for key, wheels in sorted(self.targets.items())
+            },
+        }
+
+        with open(filepath, "w") as fp:
+            json.dump(data, fp, indent=2)
+            fp.write("\n")
@@ -0,0 +1,307 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import time
+import json
+import threading
+import contextlib
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+REPORT_VERSION = 1
+
+"""
+File timestamps come from a coarse clock, which may lag behind
+:func:`time.time_ns`, so files modified slightly before the start of a stage
+are counted as written by the stage.
+"""
+MTIME_TOLERANCE_NS = 20 * 1000 * 1000
+
+
+def _child_cpu_time():
+    """
+    Returns the CPU time of the terminated child processes (e.g. pip or the
+    compiler).
+    The operating system only reports it for the whole process.
+    """
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def scan_tree(dirpath, since_ns=None):
+    """
+    Returns the number of files in *dirpath* and their total size, counting
+    only the files modified since *since_ns* (nanoseconds since the epoch) if
+    specified.
+    """
+    count = 0
+    size = 0
+
+    stack = [str(dirpath)]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+                continue
+
+            stat = entry.stat(follow_symlinks=False)
+            if since_ns is not None and stat.st_mtime_ns < since_ns:
+                continue
+
+            count += 1
+            size += stat.st_size
+
+    return count, size
+
+
+def _target_name(target):
+    if target is None:
+        return None
+    return "{0.python_version}-{0.arch}".format(target)
+
+
+class BuildReport:
+    """
+    Instrumentation of a build: wall and CPU time of each stage, counters
+    (bytes downloaded, cache hits and misses), downloads, schedule of the
+    concurrent stages and size of the distributions.
+
+    The CPU time of a stage is the time of the threads running it, including
+    the functions wrapped with :meth:`bind`.
+    The CPU time of the child processes (``child_cpu_time``) and the files
+    written are measured for the whole process and directory, so they also
+    include the work of the stages running concurrently; they are only
+    exact when the stages run one at a time (``concurrent_stages=1``).
+
+    Hooks added with :meth:`add_hook` are called with an event name and a
+    :class:`dict`: ``stage`` when a stage ends and ``build`` with the
+    complete report when the build ends.
+    """
+
+    def __init__(self):
+        self.hooks = []
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the stages and counters of the previous build.
+        The hooks are kept.
+        """
+        with self._lock:
+            self.stages = []
+            self.counters = collections.Counter()
+            self.targets = {}
+            self.downloads = []
+            self.schedule = []
+            self._start = time.perf_counter()
+            self.wall_time = None
+
+    def add_hook(self, hook):
+        """
+        Adds a callable ``hook(event, data)``, for instance to forward the
+        numbers to a metrics system.
+        Hooks may be called from several threads.
+        """
+        self.hooks.append(hook)
+
+    def _notify(self, event, data):
+        for hook in self.hooks:
+            try:
+                hook(event, data)
+            except Exception:
+                logger.exception("report hook failed")
+
+    def _current_stages(self):
+        if not hasattr(self._local, "stages"):
+            self._local.stages = []
+        return self._local.stages
+
+    def bind(self, func):
+        """
+        Returns a function calling *func* as if it ran in the stages of the
+        current thread, so the counters and CPU time of *func* are added to
+        these stages when it is called from another thread.
+        """
+        stages = list(self._current_stages())
+
+        def wrapper(*args, **kwargs):
+            current = self._current_stages()
+            added = [entry for entry in stages if entry not in current]
+            current.extend(added)
+            start_cpu = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                cpu_time = time.thread_time() - start_cpu
+                with self._lock:
+                    for entry in added:
+                        entry["cpu_time"] += cpu_time
+                for entry in added:
+                    current.remove(entry)
+
+        return wrapper
+
+    def increment(self, counter, value=1):
+        """
+        Increments *counter* of the build and of the stages running in the
+        current thread.
+        """
+        with self._lock:
+            self.counters[counter] += value
+            for entry in self._current_stages():
+                entry["counters"][counter] = entry["counters"].get(counter, 0) + value
+
+    @contextlib.contextmanager
+    def stage(self, name, target=None, dirpath=None):
+        """
+        Measures the stage *name* of *target*.
+        If *dirpath* is specified, the files written in this directory during
+        the stage are counted.
+        """
+        entry = {
+            "name": name,
+            "target": _target_name(target),
+            "skipped": False,
+            "counters": {},
+            "cpu_time": 0.0,
+        }
+
+        start_ns = time.time_ns() - MTIME_TOLERANCE_NS
+        start = time.perf_counter()
+        start_cpu = time.thread_time()
+        start_child_cpu = _child_cpu_time()
+        self._current_stages().append(entry)
+        try:
+            yield entry
+        finally:
+            self._current_stages().remove(entry)
+            entry["wall_time"] = time.perf_counter() - start
+            with self._lock:
+                entry["cpu_time"] += time.thread_time() - start_cpu
+            entry["child_cpu_time"] = _child_cpu_time() - start_child_cpu
+
+            if dirpath is not None:
+                count, size = scan_tree(dirpath, start_ns)
+                entry["files_written"] = count
+                entry["bytes_written"] = size
+
+            logger.debug(
+                "stage {0} took {1:.3f} s (cpu {2:.3f} s)".format(
+                    name, entry["wall_time"], entry["cpu_time"]
+                )
+            )
+
+            with self._lock:
+                self.stages.append(entry)
+            self._notify("stage", entry)
+
+    def skip(self, name, target=None):
+        """
+        Records that the stage *name* of *target* was up-to-date.
+        """
+        entry = {
+            "name": name,
+            "target": _target_name(target),
+            "skipped": True,
+            "counters": {},
+            "wall_time": 0.0,
+            "cpu_time": 0.0,
+            "child_cpu_time": 0.0,
+        }
+        with self._lock:
+            self.stages.append(entry)
+        self._notify("stage", entry)
+
+    def add_download(self, entry):
+        """
+        Records a download: a :class:`dict` with the ``url``, the ``bytes``
+        transferred, the ``duration``, the ``throughput`` and the number of
+        ``attempts``.
+        The bytes are also counted in the stages running in the current
+        thread.
+        """
+        with self._lock:
+            self.downloads.append(entry)
+        self.increment("bytes_downloaded", entry["bytes"])
+        self.increment("downloads")
+        if entry.get("attempts", 1) > 1:
+            self.increment("download_retries", entry["attempts"] - 1)
+
+    def add_schedule(self, trace, target=None):
+        """
+        Records the tasks run by a :class:`py2win.scheduler.Scheduler` for
+        *target*, with their start and end relative to the start of the
+        build, so the stages which ran concurrently can be seen.
+        """
+        entries = []
+        for entry in trace:
+            entry = dict(entry, target=_target_name(target))
+            for key in ("start", "end"):
+                if key in entry:
+                    entry[key] -= self._start
+            entries.append(entry)
+
+        with self._lock:
+            self.schedule.extend(entries)
+
+    def add_target(self, target, workdir, zip_filepath=None):
+        """
+        Records the final size of the distribution of *target*.
+        """
+        count, size = scan_tree(workdir)
+        entry = {
+            "directory": str(workdir),
+            "tree_files": count,
+            "tree_size": size,
+            "zip_size": None,
+        }
+        if zip_filepath is not None and Path(zip_filepath).exists():
+            entry["zip_size"] = Path(zip_filepath).stat().st_size
+
+        with self._lock:
+            self.targets[_target_name(target)] = entry
+
+    def finish(self):
+        """
+        Ends the build and calls the hooks with the complete report.
+        """
+        self.wall_time = time.perf_counter() - self._start
+        self._notify("build", self.to_dict())
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "version": REPORT_VERSION,
+                "wall_time": self.wall_time,
+                "counters": dict(self.counters),
+                "stages": list(self.stages),
+                "targets": dict(self.targets),
+                "downloads": list(self.downloads),
+                "schedule": sorted(
+                    self.schedule, key=lambda entry: entry.get("start", float("inf"))
+                ),
+            }
+
+    def write(self, filepath):
+        """
+        Writes the report as JSON.
+        """
+        with open(filepath, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=2)
+            fp.write("\n")
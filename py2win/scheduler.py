@@ -0,0 +1,164 @@
+""""""
+
+# Standard library modules.
+import time
+import threading
+import collections
+import contextvars
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+DEFAULT_MAX_WORKERS = 4
+
+"""
+Status of the tasks in the trace.
+"""
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+
+Task = collections.namedtuple("Task", ["name", "func", "requires"])
+
+
+class Scheduler:
+    """
+    Runs a graph of tasks in a pool of threads.
+    A task starts as soon as all the tasks it requires are done, so
+    independent downloads, computations and subprocesses overlap.
+
+    Tasks run with the context variables of the thread calling :meth:`run`.
+    If a task fails, no other task is started, the running tasks are waited
+    for and the exception of the first failed task is raised.
+    The start and end of each task are kept in :attr:`trace`.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        :arg max_workers: maximum number of tasks running concurrently,
+            ``1`` to run the tasks in sequence, in the order they were added
+        """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.tasks = collections.OrderedDict()
+        self.results = {}
+        self.trace = []
+        self._lock = threading.Lock()
+
+    def add(self, name, func, requires=()):
+        """
+        Adds the task *name*, calling ``func()`` once the tasks *requires*
+        are done.
+        The result of a task is available in :attr:`results` to the tasks
+        requiring it.
+        """
+        if name in self.tasks:
+            raise ValueError("Duplicate task: {}".format(name))
+        self.tasks[name] = Task(name, func, tuple(requires))
+
+    def _check(self):
+        for task in self.tasks.values():
+            for name in task.requires:
+                if name not in self.tasks:
+                    raise ValueError(
+                        "Task {0} requires unknown task {1}".format(task.name, name)
+                    )
+
+        # Tasks are visited in depth-first order, a task on the stack being
+        # required again means a cycle
+        visited = set()
+        stack = []
+
+        def visit(name):
+            if name in stack:
+                raise ValueError("Cycle between tasks: {}".format(" -> ".join(stack)))
+            if name in visited:
+                return
+            stack.append(name)
+            for required in self.tasks[name].requires:
+                visit(required)
+            stack.pop()
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    def _call(self, task):
+        entry = {
+            "name": task.name,
+            "thread": threading.current_thread().name,
+            "start": time.perf_counter(),
+        }
+        try:
+            return task.func()
+        except BaseException:
+            entry["status"] = STATUS_FAILED
+            raise
+        finally:
+            entry["end"] = time.perf_counter()
+            entry.setdefault("status", STATUS_DONE)
+            with self._lock:
+                self.trace.append(entry)
+
+    def run(self):
+        """
+        Runs all tasks and returns their results per name.
+        """
+        self._check()
+
+        pending = collections.OrderedDict(self.tasks)
+        running = {}
+        done = set()
+        error = None
+
+        with concurrent.futures.ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="py2win-stage"
+        ) as executor:
+            while pending or running:
+                if error is None:
+                    for task in list(pending.values()):
+                        if self.max_workers is not None and (
+                            len(running) >= self.max_workers
+                        ):
+                            break
+                        if not all(name in done for name in task.requires):
+                            continue
+
+                        logger.debug("starting task {0}".format(task.name))
+                        del pending[task.name]
+                        context = contextvars.copy_context()
+                        future = executor.submit(context.run, self._call, task)
+                        running[future] = task
+
+                if not running:
+                    break
+
+                finished, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    task = running.pop(future)
+                    try:
+                        self.results[task.name] = future.result()
+                        done.add(task.name)
+                    except BaseException as ex:
+                        logger.debug("task {0} failed: {1}".format(task.name, ex))
+                        if error is None:
+                            error = ex
+
+        for task in pending.values():
+            self.trace.append(
+                {"name": task.name, "thread": None, "status": STATUS_CANCELLED}
+            )
+
+        if error is not None:
+            raise error
+
+        return self.results
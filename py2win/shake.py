@@ -0,0 +1,363 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import csv
+import types
+import shutil
+import marshal
+import zipfile
+import collections
+import modulefinder
+import importlib.util
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+
+"""
+Modules imported when the interpreter starts, before any entry point.
+"""
+STARTUP_MODULES = [
+    "site",
+    "sitecustomize",
+    "usercustomize",
+    "_sitebuiltins",
+    "encodings",
+    "codecs",
+    "io",
+    "abc",
+    "os",
+    "ntpath",
+    "stat",
+    "genericpath",
+    "_collections_abc",
+    "warnings",
+]
+
+"""
+Packages whose modules are imported dynamically and must be kept entirely.
+"""
+DYNAMIC_PACKAGES = ["encodings"]
+
+
+def _split_module_filename(filename):
+    """
+    Returns the module name and kind of a file, or ``None`` if the file is
+    not a module.
+    """
+    if filename.endswith(".py"):
+        return filename[:-3], "source"
+    if filename.endswith(".pyc"):
+        return filename[:-4], "bytecode"
+    if filename.endswith(".pyd") or filename.endswith(".so"):
+        return filename.split(".", 1)[0], "extension"
+    return None
+
+
+ModuleInfo = collections.namedtuple(
+    "ModuleInfo", ["name", "kind", "is_package", "location", "arcname"]
+)
+
+
+class ModuleIndex:
+    """
+    Index of the modules available in directories and zips of a distribution.
+    """
+
+    def __init__(self):
+        self.modules = {}
+
+    def _add(self, name, kind, is_package, location, arcname=None):
+        if name not in self.modules:
+            self.modules[name] = ModuleInfo(name, kind, is_package, location, arcname)
+
+    def add_directory(self, dirpath, prefix=""):
+        """
+        Indexes the modules and packages in *dirpath*, recursively.
+        """
+        dirpath = Path(dirpath)
+        for path in sorted(dirpath.iterdir()):
+            if path.is_dir():
+                if not path.name.isidentifier() or path.name == "__pycache__":
+                    continue
+
+                name = prefix + path.name
+                for init in ("__init__.py", "__init__.pyc"):
+                    if path.joinpath(init).exists():
+                        kind = "source" if init.endswith(".py") else "bytecode"
+                        self._add(name, kind, True, path.joinpath(init))
+                        break
+                else:
+                    self._add(name, "namespace", True, path)
+
+                self.add_directory(path, name + ".")
+                continue
+
+            result = _split_module_filename(path.name)
+            if result is None or result[0] == "__init__":
+                continue
+
+            self._add(prefix + result[0], result[1], False, path)
+
+    def add_zip(self, filepath):
+        """
+        Indexes the modules and packages in the zip at *filepath*.
+        """
+        with zipfile.ZipFile(filepath, "r") as zf:
+            arcnames = sorted(zf.namelist())
+
+        for arcname in arcnames:
+            parts = arcname.split("/")
+            if "__pycache__" in parts or arcname.endswith("/"):
+                continue
+
+            result = _split_module_filename(parts[-1])
+            if result is None:
+                continue
+
+            modname, kind = result
+            if modname == "__init__":
+                if len(parts) > 1:
+                    self._add(".".join(parts[:-1]), kind, True, filepath, arcname)
+            else:
+                self._add(
+                    ".".join(parts[:-1] + [modname]), kind, False, filepath, arcname
+                )
+
+    def get_code(self, name):
+        """
+        Returns the code object of module *name*, or ``None`` if it cannot be
+        analyzed (extension, namespace package).
+        """
+        info = self.modules[name]
+        if info.kind not in ("source", "bytecode"):
+            return None
+
+        if info.arcname is None:
+            data = Path(info.location).read_bytes()
+            filename = str(info.location)
+        else:
+            with zipfile.ZipFile(info.location, "r") as zf:
+                data = zf.read(info.arcname)
+            filename = info.arcname
+
+        if info.kind == "source":
+            try:
+                return compile(data, filename, "exec", dont_inherit=True)
+            except (SyntaxError, ValueError) as ex:
+                logger.warning("cannot parse {0}: {1}".format(filename, ex))
+                return None
+
+        if data[:4] != importlib.util.MAGIC_NUMBER:
+            raise OSError(
+                "Cannot analyze {0}, bytecode of another Python version".format(
+                    filename
+                )
+            )
+        return marshal.loads(data[16:])
+
+    def children(self, name):
+        prefix = name + "."
+        return [
+            other
+            for other in self.modules
+            if other.startswith(prefix) and "." not in other[len(prefix) :]
+        ]
+
+
+def _scan_imports(code):
+    finder = modulefinder.ModuleFinder()
+    codes = [code]
+    while codes:
+        code = codes.pop()
+        for what, args in finder.scan_opcodes(code):
+            if what == "absolute_import":
+                fromlist, name = args
+                yield 0, fromlist, name
+            elif what == "relative_import":
+                yield args
+
+        codes.extend(c for c in code.co_consts if isinstance(c, types.CodeType))
+
+
+def find_reachable_modules(index, entry_modules, hidden_imports=()):
+    """
+    Returns the names of the modules of *index* reachable from
+    *entry_modules*, the startup modules and *hidden_imports*, following the
+    static imports.
+    """
+    reachable = set()
+    queue = collections.deque()
+
+    def add(name):
+        parts = name.split(".")
+        for i in range(1, len(parts) + 1):
+            parent = ".".join(parts[:i])
+            if parent in index.modules and parent not in reachable:
+                reachable.add(parent)
+                queue.append(parent)
+
+    for name in list(STARTUP_MODULES) + list(entry_modules) + list(hidden_imports):
+        add(name)
+
+    for name in DYNAMIC_PACKAGES:
+        for other in index.modules:
+            if other == name or other.startswith(name + "."):
+                add(other)
+
+    while queue:
+        name = queue.popleft()
+        code = index.get_code(name)
+        if code is None:
+            continue
+
+        info = index.modules[name]
+        package = name if info.is_package else name.rpartition(".")[0]
+
+        for level, fromlist, target in _scan_imports(code):
+            if level > 0:
+                base = package.split(".")
+                base = base[: len(base) - (level - 1)]
+                target = ".".join(base + ([target] if target else []))
+            if not target:
+                continue
+
+            add(target)
+
+            for item in fromlist or ():
+                if item == "*":
+                    for child in index.children(target):
+                        add(child)
+                else:
+                    add(target + "." + item)
+
+    return reachable
+
+
+def _path_size(path):
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _remove_unreachable_from_dir(dirpath, keep):
+    removed = {}
+    for path in sorted(dirpath.iterdir()):
+        if path.is_dir():
+            if not path.name.isidentifier() or path.name == "__pycache__":
+                continue
+            name = path.name
+        else:
+            result = _split_module_filename(path.name)
+            if result is None:
+                continue
+            name = result[0]
+
+        if name in keep:
+            continue
+
+        removed[path.name] = _path_size(path)
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+    return removed
+
+
+def _remove_unreachable_from_zip(filepath, keep):
+    removed = collections.Counter()
+
+    tmpfilepath = filepath.with_suffix(".tmp")
+    with zipfile.ZipFile(filepath, "r") as zf_in, zipfile.ZipFile(
+        tmpfilepath, "w", zipfile.ZIP_STORED
+    ) as zf_out:
+        for info in zf_in.infolist():
+            top = info.filename.split("/", 1)[0]
+            if "/" not in info.filename:
+                result = _split_module_filename(top)
+                top = result[0] if result else None
+
+            if top is None or top in keep:
+                zf_out.writestr(info, zf_in.read(info))
+            else:
+                removed[info.filename.split("/", 1)[0]] += info.file_size
+
+    os.replace(tmpfilepath, filepath)
+    return dict(removed)
+
+
+def _remove_orphan_metadata(site_packages, removed):
+    """
+    Removes the ``.dist-info`` directories whose files were all removed.
+    """
+    for distinfo_dir in sorted(site_packages.glob("*.dist-info")):
+        record_filepath = distinfo_dir.joinpath("RECORD")
+        if not record_filepath.exists():
+            continue
+
+        with open(record_filepath, "r", newline="", encoding="utf-8") as fp:
+            tops = {
+                row[0].split("/", 1)[0]
+                for row in csv.reader(fp)
+                if row and not row[0].startswith(distinfo_dir.name)
+            }
+        tops.discard("..")
+
+        if tops and tops <= set(removed):
+            removed[distinfo_dir.name] = _path_size(distinfo_dir)
+            shutil.rmtree(distinfo_dir)
+
+
+def shake_tree(workdir, entry_modules, hidden_imports=()):
+    """
+    Removes the top-level modules and packages of the standard library and
+    site-packages which are not reachable from the entry modules.
+    Modules imported dynamically (e.g. with :func:`importlib.import_module`)
+    must be specified in *hidden_imports*.
+
+    :return: :class:`dict` of the removed modules and packages and their size
+        in bytes
+    """
+    workdir = Path(workdir)
+    libdir = workdir.joinpath("Lib")
+    site_packages = libdir.joinpath("site-packages")
+    stdlib_zips = sorted(workdir.glob("python*.zip"))
+
+    index = ModuleIndex()
+    for filepath in stdlib_zips:
+        index.add_zip(filepath)
+    if libdir.exists():
+        index.add_directory(libdir)
+    if site_packages.exists():
+        index.add_directory(site_packages)
+
+    logger.info("analyzing imports of {0} modules".format(len(index.modules)))
+    reachable = find_reachable_modules(index, entry_modules, hidden_imports)
+    keep = {name.split(".", 1)[0] for name in reachable}
+
+    removed = {}
+    for filepath in stdlib_zips:
+        removed.update(_remove_unreachable_from_zip(filepath, keep))
+    if libdir.exists():
+        removed.update(_remove_unreachable_from_dir(libdir, keep))
+    if site_packages.exists():
+        removed.update(_remove_unreachable_from_dir(site_packages, keep))
+        _remove_orphan_metadata(site_packages, removed)
+
+    for name, size in sorted(removed.items()):
+        logger.debug("removed {0} ({1} bytes)".format(name, size))
+    logger.info(
+        "removed {0} unreachable modules and packages ({1} bytes)".format(
+            len(removed), sum(removed.values())
+        )
+    )
+
+    return removed
@@ -0,0 +1,121 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+STATE_VERSION = 1
+
+
+def digest_inputs(inputs):
+    """
+    Returns a stable digest of *inputs*, a JSON serializable object.
+    """
+    data = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class BuildState:
+    """
+    Manifest of the inputs and outputs of each stage of a previous build.
+    A stage only needs to run again if its inputs changed or one of its
+    outputs is missing.
+    Stages running concurrently can update the manifest.
+    """
+
+    def __init__(self, filepath, basedir):
+        """
+        :arg filepath: path of the manifest
+        :arg basedir: directory to which the outputs are relative
+        """
+        self.filepath = Path(filepath)
+        self.basedir = Path(basedir)
+        self.stages = {}
+        self._lock = threading.RLock()
+
+        if self.filepath.exists():
+            try:
+                with open(self.filepath, "r") as fp:
+                    data = json.load(fp)
+                if data.get("version") == STATE_VERSION:
+                    self.stages = data["stages"]
+            except ValueError:
+                logger.warning("corrupted build state {0}".format(self.filepath))
+
+    def digest(self, stage):
+        """
+        Returns the digest of the inputs of *stage* in the previous build, or
+        ``None`` if the stage did not run.
+        """
+        entry = self.stages.get(stage)
+        return entry["digest"] if entry else None
+
+    def outputs(self, stage):
+        """
+        Returns the outputs of *stage* in the previous build.
+        """
+        entry = self.stages.get(stage)
+        return entry["outputs"] if entry else []
+
+    def is_current(self, stage, inputs):
+        """
+        Returns whether *stage* ran with the same *inputs* in the previous
+        build and all its outputs still exist.
+        """
+        entry = self.stages.get(stage)
+        if entry is None or entry["digest"] != digest_inputs(inputs):
+            return False
+
+        return all(self.basedir.joinpath(path).exists() for path in entry["outputs"])
+
+    def update(self, stage, inputs, outputs=()):
+        """
+        Records that *stage* ran with *inputs* and produced *outputs* (paths
+        relative to the base directory), and saves the manifest.
+        """
+        with self._lock:
+            self.stages[stage] = {
+                "digest": digest_inputs(inputs),
+                "inputs": inputs,
+                "outputs": [str(path).replace(os.sep, "/") for path in outputs],
+            }
+            self.save()
+
+    def remove(self, stage):
+        """
+        Forgets *stage* and saves the manifest.
+        """
+        with self._lock:
+            self.stages.pop(stage, None)
+            self.save()
+
+    def clear(self):
+        """
+        Forgets all stages and removes the manifest.
+        """
+        self.stages.clear()
+        if self.filepath.exists():
+            self.filepath.unlink()
+
+    def save(self):
+        with self._lock:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+
+            fd, tmpfilepath = tempfile.mkstemp(dir=self.filepath.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as fp:
+                json.dump(
+                    {"version": STATE_VERSION, "stages": self.stages}, fp, indent=2
+                )
+            os.replace(tmpfilepath, self.filepath)
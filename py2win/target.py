@@ -0,0 +1,138 @@
+""""""
+
+# Standard library modules.
+import sys
+import collections
+
+# Third party modules.
+from packaging import tags
+
+# Local modules.
+
+# Globals and constants variables.
+PLATFORM_TAGS = {"amd64": "win_amd64", "win32": "win32", "arm64": "win_arm64"}
+
+"""
+Value of :func:`platform.machine` on Windows for each architecture.
+"""
+PLATFORM_MACHINES = {"amd64": "AMD64", "win32": "x86", "arm64": "ARM64"}
+
+
+class Target(collections.namedtuple("Target", ["python_version", "arch"])):
+    """
+    Python version and architecture of an embedded distribution.
+
+    :arg python_version: full Python version (e.g. ``3.10.11``)
+    :arg arch: architecture of the embedded distribution, either ``amd64``,
+        ``win32`` or ``arm64``
+    """
+
+    def __new__(cls, python_version, arch):
+        python_version = str(python_version)
+        if len(python_version.split(".")) != 3:
+            raise ValueError(
+                "Python version must be major.minor.micro: {}".format(python_version)
+            )
+        if arch not in PLATFORM_TAGS:
+            raise ValueError(
+                "Unknown architecture {}, expected one of {}".format(
+                    arch, ", ".join(PLATFORM_TAGS)
+                )
+            )
+        return super().__new__(cls, python_version, arch)
+
+    @classmethod
+    def host(cls):
+        """
+        Returns the target matching the running interpreter.
+        """
+        version = "{0.major}.{0.minor}.{0.micro}".format(sys.version_info)
+        is_64bits = sys.maxsize > 2 ** 32
+        arch = "amd64" if is_64bits else "win32"
+        return cls(version, arch)
+
+    @property
+    def version_info(self):
+        """
+        Tuple of (major, minor, micro) version numbers.
+        """
+        return tuple(int(part) for part in self.python_version.split("."))
+
+    @property
+    def short_version(self):
+        """
+        Major and minor version (e.g. ``3.10``).
+        """
+        return "{0}.{1}".format(*self.version_info)
+
+    @property
+    def python_tag(self):
+        """
+        Python and ABI tag of binary wheels (e.g. ``cp310``).
+        """
+        return "cp{0}{1}".format(*self.version_info)
+
+    @property
+    def platform_tag(self):
+        """
+        Platform tag of binary wheels (e.g. ``win_amd64``).
+        """
+        return PLATFORM_TAGS[self.arch]
+
+    @property
+    def pip_args(self):
+        """
+        Arguments restricting pip to binary wheels compatible with the target.
+        """
+        return [
+            "--platform",
+            self.platform_tag,
+            "--python-version",
+            self.short_version,
+            "--implementation",
+            "cp",
+            "--abi",
+            self.python_tag,
+            "--only-binary=:all:",
+        ]
+
+    @property
+    def supported_tags(self):
+        """
+        Wheel tags supported by the target, from the most to the least
+        specific.
+        """
+        python_version = self.version_info[:2]
+        platforms = [self.platform_tag]
+        return list(
+            tags.cpython_tags(
+                python_version, [self.python_tag, "abi3", "none"], platforms
+            )
+        ) + list(tags.compatible_tags(python_version, self.python_tag, platforms))
+
+    @property
+    def marker_environment(self):
+        """
+        Environment to evaluate the markers of requirements for the target
+        (e.g. ``sys_platform == "win32"``).
+        """
+        return {
+            "implementation_name": "cpython",
+            "implementation_version": self.python_version,
+            "os_name": "nt",
+            "platform_machine": PLATFORM_MACHINES[self.arch],
+            "platform_python_implementation": "CPython",
+            "platform_release": "",
+            "platform_system": "Windows",
+            "platform_version": "",
+            "python_full_version": self.python_version,
+            "python_version": self.short_version,
+            "sys_platform": "win32",
+        }
+
+    @property
+    def is_host(self):
+        """
+        Whether the target matches the running interpreter.
+        """
+        return sys.platform == "win32" and self == self.host()
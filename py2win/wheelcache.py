@@ -0,0 +1,222 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import json
+import time
+import shutil
+import tempfile
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+from packaging.utils import parse_wheel_filename
+
+# Local modules.
+from py2win.cache import sha256sum
+
+# Globals and constants variables.
+ENTRY_FILENAME = "entry.json"
+
+SDIST_SUFFIXES = (".tar.gz", ".zip", ".tar.bz2", ".tgz")
+
+
+def is_sdist(filepath):
+    """
+    Returns whether *filepath* is a source distribution.
+    """
+    return Path(filepath).name.lower().endswith(SDIST_SUFFIXES)
+
+
+def target_tag(target):
+    """
+    Returns the Python, ABI and platform tags of the wheels built for
+    *target* (e.g. ``cp310-cp310-win_amd64``).
+    """
+    return "{0}-{0}-{1}".format(target.python_tag, target.platform_tag)
+
+
+class WheelBuildCache:
+    """
+    Directory of the wheels built from source distributions, keyed by the
+    SHA-256 of the source distribution and the tags of the target.
+
+    Each entry is a folder ``<sha256>/<tag>`` with the wheel and an
+    ``entry.json`` written last, so the directory can be shared between build
+    agents: an entry is either complete or ignored, and concurrent builds of
+    the same wheel replace each other atomically.
+
+    The source distributions found by a resolution (e.g. ``pip download`` of
+    the requirements) can be recorded under a key, the digest of the inputs
+    of the resolution, so the wheels are found again without resolving.
+    """
+
+    def __init__(self, root):
+        """
+        :arg root: directory of the cache
+        """
+        self.root = Path(root)
+
+    def _resolution_filepath(self, key):
+        return self.root.joinpath("resolutions", key + ".json")
+
+    def get_resolved(self, key, target):
+        """
+        Returns the wheels for *target* of the source distributions recorded
+        under *key*, or ``None`` if no resolution was recorded or one of the
+        wheels is not cached.
+        """
+        filepath = self._resolution_filepath(key)
+        if not filepath.exists():
+            return None
+
+        try:
+            with open(filepath, "r") as fp:
+                sdist_sha256s = json.load(fp)["sdists"]
+        except (ValueError, KeyError):
+            logger.warning("corrupted resolution {0}".format(filepath))
+            return None
+
+        wheel_filepaths = []
+        for sdist_sha256 in sdist_sha256s:
+            wheel_filepath = self.get(sdist_sha256, target)
+            if wheel_filepath is None:
+                return None
+            wheel_filepaths.append(wheel_filepath)
+        return wheel_filepaths
+
+    def put_resolved(self, key, sdist_filepaths):
+        """
+        Records the source distributions *sdist_filepaths* found by the
+        resolution *key*.
+        """
+        filepath = self._resolution_filepath(key)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        data = {"sdists": [sha256sum(path) for path in sdist_filepaths]}
+        fd, tmpfilepath = tempfile.mkstemp(dir=filepath.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp, indent=1)
+        os.replace(tmpfilepath, filepath)
+
+    def _entry_dirpath(self, sdist_sha256, target):
+        return self.root.joinpath(sdist_sha256[:2], sdist_sha256, target_tag(target))
+
+    def get(self, sdist_sha256, target):
+        """
+        Returns the path of the wheel built from the source distribution with
+        digest *sdist_sha256* for *target*, or ``None`` if it was not built or
+        is corrupted.
+        """
+        dirpath = self._entry_dirpath(sdist_sha256, target)
+        entry_filepath = dirpath.joinpath(ENTRY_FILENAME)
+        if not entry_filepath.exists():
+            return None
+
+        try:
+            with open(entry_filepath, "r") as fp:
+                entry = json.load(fp)
+            filepath = dirpath.joinpath(entry["filename"])
+        except (ValueError, KeyError):
+            logger.warning("corrupted wheel cache entry {0}".format(dirpath))
+            return None
+
+        if not filepath.exists() or sha256sum(filepath) != entry["sha256"]:
+            logger.warning("wheel cache entry {0} is corrupted".format(dirpath))
+            return None
+
+        logger.debug("wheel cache hit {0}".format(entry["filename"]))
+        return filepath
+
+    def put(self, sdist_sha256, target, wheel_filepath, sdist_filename=None):
+        """
+        Stores the wheel at *wheel_filepath*, built from the source
+        distribution with digest *sdist_sha256* for *target*, and returns the
+        path of the cached wheel.
+        """
+        wheel_filepath = Path(wheel_filepath)
+        parse_wheel_filename(wheel_filepath.name)
+
+        dirpath = self._entry_dirpath(sdist_sha256, target)
+        dirpath.mkdir(parents=True, exist_ok=True)
+
+        filepath = dirpath.joinpath(wheel_filepath.name)
+        fd, tmpfilepath = tempfile.mkstemp(dir=dirpath, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(wheel_filepath, tmpfilepath)
+        os.replace(tmpfilepath, filepath)
+
+        entry = {
+            "filename": filepath.name,
+            "sha256": sha256sum(filepath),
+            "sdist": sdist_filename,
+            "tag": target_tag(target),
+            "created": time.time(),
+        }
+        fd, tmpfilepath = tempfile.mkstemp(dir=dirpath, suffix=".tmp")
+        with os.fdopen(fd, "w") as fp:
+            json.dump(entry, fp, indent=1)
+        os.replace(tmpfilepath, dirpath.joinpath(ENTRY_FILENAME))
+
+        return filepath
+
+    def _build(self, sdist_filepath, sdist_sha256, target, build):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            logger.info("building wheel of {0}".format(sdist_filepath.name))
+            build(sdist_filepath, Path(tmpdir))
+
+            wheel_filepaths = list(Path(tmpdir).glob("*.whl"))
+            if len(wheel_filepaths) != 1:
+                raise IOError(
+                    "Expected one wheel built from {0}, got {1}".format(
+                        sdist_filepath.name, len(wheel_filepaths)
+                    )
+                )
+
+            return self.put(
+                sdist_sha256, target, wheel_filepaths[0], sdist_filepath.name
+            )
+
+    def get_or_build(self, sdist_filepaths, target, build, max_workers=None):
+        """
+        Returns the wheels of the source distributions *sdist_filepaths* for
+        *target*, building concurrently the ones which are not cached.
+
+        :arg build: function called with the path of a source distribution
+            and a directory where to write the wheel built from it
+        :arg max_workers: maximum number of concurrent builds
+        :return: :class:`tuple` of the paths of the wheels, in the order of
+            *sdist_filepaths*, and the number of wheels built
+        """
+        sdist_filepaths = [Path(filepath) for filepath in sdist_filepaths]
+
+        wheel_filepaths = {}
+        missing = []
+        for sdist_filepath in sdist_filepaths:
+            sdist_sha256 = sha256sum(sdist_filepath)
+            wheel_filepath = self.get(sdist_sha256, target)
+            if wheel_filepath is None:
+                missing.append((sdist_filepath, sdist_sha256))
+            else:
+                wheel_filepaths[sdist_filepath] = wheel_filepath
+
+        if missing:
+            logger.info("building {0} wheels".format(len(missing)))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self._build, sdist_filepath, sdist_sha256, target, build
+                ): sdist_filepath
+                for sdist_filepath, sdist_sha256 in missing
+            }
+            for future in concurrent.futures.as_completed(futures):
+                wheel_filepaths[futures[future]] = future.result()
+
+        return (
+            [wheel_filepaths[sdist_filepath] for sdist_filepath in sdist_filepaths],
+            len(missing),
+        )
@@ -0,0 +1,266 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import json
+import zipfile
+import tempfile
+import threading
+import collections
+import email.parser
+import concurrent.futures
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.specifiers import SpecifierSet
+from packaging.utils import parse_wheel_filename, canonicalize_name
+from packaging.version import Version, InvalidVersion
+
+# Local modules.
+from py2win.cache import sha256sum
+
+# Globals and constants variables.
+INDEX_VERSION = 1
+
+IndexedWheel = collections.namedtuple(
+    "IndexedWheel",
+    ["filename", "name", "version", "tags", "sha256", "requires", "size", "mtime_ns"],
+)
+
+
+def read_wheel_requires(filepath):
+    """
+    Returns the ``Requires-Dist`` of the wheel at *filepath*.
+    """
+    with zipfile.ZipFile(filepath, "r") as zf:
+        for arcname in zf.namelist():
+            parts = arcname.split("/")
+            if (
+                len(parts) == 2
+                and parts[0].endswith(".dist-info")
+                and parts[1] == "METADATA"
+            ):
+                data = zf.read(arcname).decode("utf-8")
+                break
+        else:
+            raise IOError("No METADATA in {}".format(filepath))
+
+    message = email.parser.HeaderParser().parsestr(data)
+    return message.get_all("Requires-Dist") or []
+
+
+def pinned_versions(requirements):
+    """
+    Returns the versions of the *requirements* pinned to an exact version
+    with ``==``, keyed by the canonical name of the project.
+    Other requirements (ranges, wildcards, paths) are ignored.
+    """
+    versions = {}
+    for requirement in requirements:
+        try:
+            requirement = Requirement(requirement)
+        except InvalidRequirement:
+            continue
+
+        specifiers = list(requirement.specifier)
+        if (
+            requirement.url is None
+            and len(specifiers) == 1
+            and specifiers[0].operator == "=="
+            and not specifiers[0].version.endswith("*")
+        ):
+            versions[canonicalize_name(requirement.name)] = Version(
+                specifiers[0].version
+            )
+    return versions
+
+
+def _index_wheel(filepath, stat):
+    name, version, _build, tags = parse_wheel_filename(filepath.name)
+    return IndexedWheel(
+        filepath.name,
+        str(name),
+        str(version),
+        sorted(str(tag) for tag in tags),
+        sha256sum(filepath),
+        read_wheel_requires(filepath),
+        stat.st_size,
+        stat.st_mtime_ns,
+    )
+
+
+class WheelIndex:
+    """
+    Index of the wheels of a directory: name, version, tags, SHA-256 and
+    requirements of each wheel.
+    The index is saved in a JSON file and updated incrementally: only the
+    wheels whose size or modification time changed are read again.
+    """
+
+    def __init__(self, dirpath, index_filepath, max_workers=None):
+        """
+        :arg dirpath: directory containing the wheels
+        :arg index_filepath: path of the JSON file of the index
+        :arg max_workers: number of threads to read new wheels
+        """
+        self.dirpath = Path(dirpath)
+        self.index_filepath = Path(index_filepath)
+        self.max_workers = max_workers
+        self.wheels = {}
+        self._lock = threading.Lock()
+
+        if self.index_filepath.exists():
+            try:
+                with open(self.index_filepath, "r") as fp:
+                    data = json.load(fp)
+                if data.get("version") == INDEX_VERSION:
+                    self.wheels = {
+                        item["filename"]: IndexedWheel(**item)
+                        for item in data["wheels"]
+                    }
+            except (ValueError, TypeError):
+                logger.warning("corrupted wheel index {0}".format(self.index_filepath))
+
+    def update(self):
+        """
+        Updates the index with the wheels added, modified or removed since
+        the previous update.
+
+        :return: whether the index changed
+        """
+        with self._lock:
+            entries = {}
+            for entry in os.scandir(self.dirpath):
+                if entry.name.endswith(".whl") and entry.is_file():
+                    entries[entry.name] = Path(entry.path), entry.stat()
+
+            changed = False
+            for filename in list(self.wheels):
+                if filename not in entries:
+                    del self.wheels[filename]
+                    changed = True
+
+            outdated = []
+            for filename, (filepath, stat) in entries.items():
+                wheel = self.wheels.get(filename)
+                if (
+                    wheel is None
+                    or wheel.size != stat.st_size
+                    or wheel.mtime_ns != stat.st_mtime_ns
+                ):
+                    outdated.append((filepath, stat))
+
+            if outdated:
+                logger.info("indexing {0} wheels".format(len(outdated)))
+
+            with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+                futures = {
+                    executor.submit(_index_wheel, filepath, stat): filepath
+                    for filepath, stat in outdated
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        wheel = future.result()
+                    except (ValueError, IOError, zipfile.BadZipFile) as ex:
+                        logger.warning(
+                            "ignoring invalid wheel {0}: {1}".format(
+                                futures[future].name, ex
+                            )
+                        )
+                        continue
+                    self.wheels[wheel.filename] = wheel
+                    changed = True
+
+            if changed:
+                self.save()
+
+            return changed
+
+    def save(self):
+        self.index_filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        data = {
+            "version": INDEX_VERSION,
+            "dirpath": str(self.dirpath),
+            "wheels": [wheel._asdict() for _, wheel in sorted(self.wheels.items())],
+        }
+
+        fd, tmpfilepath = tempfile.mkstemp(
+            dir=self.index_filepath.parent, suffix=".tmp"
+        )
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp)
+        os.replace(tmpfilepath, self.index_filepath)
+
+    def compatible_wheels(self, target):
+        """
+        Returns the wheels compatible with *target*, per normalized name.
+        """
+        supported = {str(tag) for tag in target.supported_tags}
+
+        wheels = collections.defaultdict(list)
+        for wheel in self.wheels.values():
+            if supported.intersection(wheel.tags):
+                wheels[canonicalize_name(wheel.name)].append(wheel)
+        return wheels
+
+    def select(self, target, requirements):
+        """
+        Returns the wheels needed to install *requirements* on *target*: the
+        compatible wheels matching the requirements and, recursively, the
+        requirements of these wheels.
+        Requirements without matching wheel are ignored (e.g. packages
+        downloaded from an index).
+
+        :arg requirements: requirement strings (e.g. ``requests>=2``)
+        :return: list of :class:`IndexedWheel`, sorted by filename
+        """
+        candidates = self.compatible_wheels(target)
+        environment = target.marker_environment
+
+        specifiers = {}
+        extras = collections.defaultdict(set)
+        selected = {}
+
+        queue = collections.deque((requirement, "") for requirement in requirements)
+        while queue:
+            requirement, extra = queue.popleft()
+            try:
+                requirement = Requirement(requirement)
+            except InvalidRequirement:
+                logger.warning("ignoring invalid requirement {0}".format(requirement))
+                continue
+
+            if requirement.marker is not None and not requirement.marker.evaluate(
+                dict(environment, extra=extra)
+            ):
+                continue
+
+            name = canonicalize_name(requirement.name)
+            specifier = specifiers.get(name, SpecifierSet()) & requirement.specifier
+            new_extras = set(requirement.extras) - extras[name]
+            if specifier == specifiers.get(name) and not new_extras:
+                continue
+            specifiers[name] = specifier
+            extras[name] |= new_extras
+
+            for wheel in candidates.get(name, []):
+                try:
+                    if not specifier.contains(wheel.version, prereleases=True):
+                        continue
+                except InvalidVersion:
+                    continue
+
+                if wheel.filename not in selected:
+                    selected[wheel.filename] = wheel
+                    queue.extend((other, "") for other in wheel.requires)
+
+                # Requirements of the extras, including the new ones
+                for name_extra in extras[name]:
+                    queue.extend((other, name_extra) for other in wheel.requires)
+
+        return sorted(selected.values(), key=lambda wheel: wheel.filename)
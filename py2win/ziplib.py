@@ -0,0 +1,174 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import os
+import shutil
+import zipfile
+import tempfile
+import py_compile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third party modules.
+
+# Local modules.
+
+# Globals and constants variables.
+PYTHON_SUFFIXES = {".py", ".pyc"}
+
+"""
+Directories of *site-packages* which are never zipped.
+"""
+METADATA_SUFFIXES = {".dist-info", ".egg-info", ".data"}
+
+SITE_PACKAGES_ZIP_FILENAME = "site-packages.zip"
+
+
+def repack_stdlib(filepath, libdir, exclude_packages=()):
+    """
+    Rewrites the standard library zip of the embedded distribution without
+    compression, so modules can be imported without decompressing them.
+    The packages in *exclude_packages* are extracted in *libdir* and removed
+    from the zip.
+    """
+    logger.info("repacking {0}".format(filepath.name))
+
+    tmpfilepath = filepath.with_suffix(".tmp")
+    with zipfile.ZipFile(filepath, "r") as zf_in, zipfile.ZipFile(
+        tmpfilepath, "w", zipfile.ZIP_STORED
+    ) as zf_out:
+        for info in zf_in.infolist():
+            top = info.filename.split("/", 1)[0]
+            if top in exclude_packages:
+                zf_in.extract(info, libdir)
+                continue
+
+            data = zf_in.read(info)
+            info.compress_type = zipfile.ZIP_STORED
+            zf_out.writestr(info, data)
+
+    os.replace(tmpfilepath, filepath)
+
+
+def is_zip_safe(path):
+    """
+    Returns whether the module or package at *path*, a top-level entry of
+    *site-packages*, can be imported from a zip: it only contains Python
+    modules, is a regular package and does not refer to ``__file__``.
+    """
+    path = Path(path)
+    if path.is_file():
+        filepaths = [path]
+    else:
+        if not any(
+            path.joinpath(name).exists() for name in ("__init__.py", "__init__.pyc")
+        ):
+            return False
+        filepaths = [
+            filepath
+            for filepath in path.rglob("*")
+            if filepath.is_file() and "__pycache__" not in filepath.parts
+        ]
+
+    for filepath in filepaths:
+        if filepath.suffix not in PYTHON_SUFFIXES:
+            return False
+        if b"__file__" in filepath.read_bytes():
+            return False
+
+    return True
+
+
+def _compile_source(filepath, arcname, optimize):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cfile = os.path.join(tmpdir, "module.pyc")
+        py_compile.compile(
+            str(filepath),
+            cfile=cfile,
+            dfile=arcname,
+            doraise=True,
+            optimize=optimize,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+        with open(cfile, "rb") as fp:
+            return fp.read()
+
+
+def zip_site_packages(site_packages, zip_filepath, compile_bytecode=True, optimize=0):
+    """
+    Moves the zip-safe modules and packages of *site-packages* in an
+    uncompressed zip at *zip_filepath*.
+    Native extensions, data files and packages which are not zip-safe are
+    kept on disk.
+
+    :arg compile_bytecode: whether to store bytecode instead of the sources.
+        The running interpreter must have the same major and minor version as
+        the distribution.
+    :arg optimize: optimization level of the bytecode
+    :return: names of the zipped modules and packages
+    """
+    site_packages = Path(site_packages)
+
+    paths = []
+    for path in sorted(site_packages.iterdir()):
+        if path.suffix in METADATA_SUFFIXES or path.name == "__pycache__":
+            continue
+        if path.is_file() and path.suffix not in PYTHON_SUFFIXES:
+            continue
+
+        if is_zip_safe(path):
+            paths.append(path)
+        else:
+            logger.debug("{0} is not zip-safe, kept on disk".format(path.name))
+
+    logger.info("zipping {0} modules and packages".format(len(paths)))
+
+    with zipfile.ZipFile(zip_filepath, "w", zipfile.ZIP_STORED) as zf:
+        for path in paths:
+            filepaths = [path] if path.is_file() else sorted(path.rglob("*"))
+            for filepath in filepaths:
+                if not filepath.is_file() or "__pycache__" in filepath.parts:
+                    continue
+
+                arcname = filepath.relative_to(site_packages).as_posix()
+                if filepath.suffix == ".pyc":
+                    if filepath.with_suffix(".py").exists() and compile_bytecode:
+                        continue  # Compiled again below
+                    zf.write(filepath, arcname)
+                elif compile_bytecode:
+                    data = _compile_source(filepath, arcname, optimize)
+                    zf.writestr(arcname + "c", data)
+                else:
+                    zf.write(filepath, arcname)
+
+    for path in paths:
+        if path.is_file():
+            path.unlink()
+        else:
+            shutil.rmtree(path)
+
+    return [path.name for path in paths]
+
+
+def write_pth(workdir, target, paths, import_site=True):
+    """
+    Writes the ``._pth`` file of the embedded distribution, which defines the
+    module search path.
+
+    :arg paths: paths relative to the root of the distribution
+    :arg import_site: whether the :mod:`site` module is imported at startup
+    """
+    filepath = Path(workdir).joinpath(
+        "python{0}{1}._pth".format(*target.version_info[:2])
+    )
+
+    lines = [str(path).replace("/", "\\") for path in paths]
+    if import_site:
+        lines.append("import site")
+
+    with open(filepath, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+    return filepath
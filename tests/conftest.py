@@ -2,6 +2,14 @@
 
 # Standard library modules.
 from pathlib import Path
+import functools
+import http.server
+import threading
+import zipfile
+import tarfile
+import io
+import base64
+import hashlib
 
 # Third party modules.
 import pytest
@@ -14,3 +22,141 @@ import pytest
 @pytest.fixture
 def sampleproject_dirpath():
     return Path(__file__).parent.resolve() / "testdata" / "sampleproject"
+
+
+class QuietHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def httpdir(tmp_path):
+    """
+    Serves a temporary directory over HTTP.
+    Returns the directory and its base URL.
+    """
+    dirpath = tmp_path / "www"
+    dirpath.mkdir()
+
+    handler = functools.partial(QuietHTTPRequestHandler, directory=str(dirpath))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield dirpath, "http://127.0.0.1:{}".format(server.server_address[1])
+
+    server.shutdown()
+    server.server_close()
+
+
+def _record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def create_wheel(dirpath, name, version, tag="py3-none-any", files=None, requires=()):
+    """
+    Creates a minimal wheel in *dirpath* and returns its path.
+
+    :arg files: :class:`dict` of archive names and contents, defaults to a
+        package named after the distribution
+    """
+    if files is None:
+        files = {"{}/__init__.py".format(name): "VERSION = {!r}\n".format(version)}
+
+    distinfo = "{}-{}.dist-info".format(name, version)
+    metadata = "Metadata-Version: 2.1\nName: {}\nVersion: {}\n".format(name, version)
+    for requirement in requires:
+        metadata += "Requires-Dist: {}\n".format(requirement)
+
+    files = dict(files)
+    files[distinfo + "/METADATA"] = metadata
+    files[distinfo + "/WHEEL"] = (
+        "Wheel-Version: 1.0\nGenerator: test\nRoot-Is-Purelib: {}\nTag: {}\n".format(
+            "true" if tag.endswith("-none-any") else "false", tag
+        )
+    )
+
+    records = []
+    filepath = dirpath / "{}-{}-{}.whl".format(name, version, tag)
+    with zipfile.ZipFile(filepath, "w") as zf:
+        for arcname, content in files.items():
+            if isinstance(content, str):
+                content = content.encode("utf-8")
+            zf.writestr(arcname, content)
+            records.append(
+                "{},{},{}".format(arcname, _record_hash(content), len(content))
+            )
+
+        records.append(distinfo + "/RECORD,,")
+        zf.writestr(distinfo + "/RECORD", "\n".join(records) + "\n")
+
+    return filepath
+
+
+def create_sdist(dirpath, name, version):
+    """
+    Creates a minimal source distribution of a pure Python package, built with
+    setuptools, in *dirpath* and returns its path.
+    """
+    basename = "{}-{}".format(name, version)
+    files = {
+        "pyproject.toml": (
+            "[build-system]\n"
+            'requires = ["setuptools"]\n'
+            'build-backend = "setuptools.build_meta"\n'
+            "[project]\n"
+            'name = "{}"\n'
+            'version = "{}"\n'.format(name, version)
+        ),
+        "{}/__init__.py".format(name): "VERSION = {!r}\n".format(version),
+    }
+
+    filepath = dirpath / (basename + ".tar.gz")
+    with tarfile.open(filepath, "w:gz") as tar:
+        for arcname, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(basename + "/" + arcname)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    return filepath
+
+
+@pytest.fixture
+def wheelhouse(tmp_path):
+    """
+    Returns a factory creating wheels in a temporary wheelhouse.
+    The wheelhouse directory is available as ``factory.dirpath``.
+    """
+    dirpath = tmp_path / "wheelhouse"
+    dirpath.mkdir()
+
+    def factory(*args, **kwargs):
+        return create_wheel(dirpath, *args, **kwargs)
+
+    factory.dirpath = dirpath
+    return factory
+
+
+@pytest.fixture
+def embedserver(httpdir):
+    """
+    Serves a synthetic embedded distribution for Python 3.10.11 (amd64).
+    Returns the base URL to use as ``PYTHON_EMBED_BASEURL``.
+    """
+    dirpath, baseurl = httpdir
+
+    filepath = dirpath / "python-3.10.11-embed-amd64.zip"
+    with zipfile.ZipFile(filepath, "w") as zf:
+        zf.writestr("python.exe", b"MZ")
+        zf.writestr("python310.dll", b"MZ")
+        zf.writestr("vcruntime140.dll", b"MZVC")
+        zf.writestr("python310._pth", "python310.zip\n.\n")
+
+        with zf.open("python310.zip", "w") as fp:
+            with zipfile.ZipFile(fp, "w") as zf_stdlib:
+                zf_stdlib.writestr("os.pyc", b"")
+                zf_stdlib.writestr("encodings/__init__.pyc", b"")
+
+    return baseurl + "/python-{version}-embed-{arch}.zip"
@@ -0,0 +1,144 @@
+""""""
+
+# Standard library modules.
+import os
+import zipfile
+
+# Third party modules.
+import pytest
+
+# Local modules.
+import py2win.archive
+from py2win.archive import (
+    create_archive,
+    get_compresslevel,
+    compress_data,
+    write_member,
+    zip_date_time,
+)
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def root_dir(tmp_path):
+    root_dir = tmp_path / "dist"
+    basedir = root_dir / "sample-1.2.0"
+    basedir.joinpath("Lib", "empty").mkdir(parents=True)
+    basedir.joinpath("python.exe").write_bytes(b"MZ" * 100)
+    basedir.joinpath("python310.dll").write_bytes(os.urandom(1000))
+    for i in range(20):
+        basedir.joinpath("Lib", "module{0}.py".format(i)).write_text("x = 1\n" * i)
+    return root_dir
+
+
+def testget_compresslevel():
+    assert get_compresslevel("a/b.py") == 6
+    assert get_compresslevel("a/b.PYD") == 0
+    assert get_compresslevel("a/b.py", 9) == 9
+    assert get_compresslevel("a/b.pyc", 6, {".pyc": 1}) == 1
+    assert get_compresslevel("a/b.dll", 6, {".dll": 9}) == 9
+
+
+def testzip_date_time(monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    assert zip_date_time() == (1980, 1, 1, 0, 0, 0)
+
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1600000000")
+    assert zip_date_time() == (2020, 9, 13, 12, 26, 40)
+
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "0")
+    assert zip_date_time() == (1980, 1, 1, 0, 0, 0)
+
+
+def testwrite_member(tmp_path):
+    filepath = tmp_path / "sample.zip"
+    with zipfile.ZipFile(filepath, "w") as zf:
+        zf.writestr("a.txt", b"a")
+        write_member(zf, "b.txt", compress_data(b"b" * 1000, 6), zip_date_time())
+        write_member(zf, "c.dll", compress_data(b"c", 0), zip_date_time())
+        zf.writestr("d.txt", b"d")
+
+    with zipfile.ZipFile(filepath) as zf:
+        assert zf.testzip() is None
+        assert zf.getinfo("b.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read("b.txt") == b"b" * 1000
+        assert zf.read("c.dll") == b"c"
+        assert zf.namelist() == ["a.txt", "b.txt", "c.dll", "d.txt"]
+
+
+def testwrite_member_writing(tmp_path):
+    with zipfile.ZipFile(tmp_path / "sample.zip", "w") as zf:
+        with zf.open("a.txt", "w") as fp:
+            fp.write(b"a")
+            with pytest.raises(ValueError):
+                write_member(zf, "b.txt", compress_data(b"b", 6), zip_date_time())
+
+
+def testcreate_archive(root_dir, tmp_path):
+    filepath = create_archive(tmp_path / "sample.zip", root_dir, "sample-1.2.0")
+
+    with zipfile.ZipFile(filepath) as zf:
+        assert zf.testzip() is None
+
+        infos = {info.filename: info for info in zf.infolist()}
+        assert infos["sample-1.2.0/Lib/empty/"].is_dir()
+        assert infos["sample-1.2.0/python.exe"].compress_type == zipfile.ZIP_DEFLATED
+        assert infos["sample-1.2.0/python310.dll"].compress_type == zipfile.ZIP_STORED
+        assert infos["sample-1.2.0/python.exe"].date_time == (1980, 1, 1, 0, 0, 0)
+        assert zf.read("sample-1.2.0/Lib/module3.py") == b"x = 1\n" * 3
+
+        filenames = [info.filename for info in zf.infolist()]
+        assert filenames[0] == "sample-1.2.0/"
+
+
+def testcreate_archive_reproducible(root_dir, tmp_path):
+    filepath1 = create_archive(
+        tmp_path / "sample1.zip", root_dir, "sample-1.2.0", max_workers=1
+    )
+
+    filepath = root_dir.joinpath("sample-1.2.0", "Lib", "module1.py")
+    os.utime(filepath, (0, 0))
+    os.chmod(filepath, 0o600)
+
+    filepath2 = create_archive(
+        tmp_path / "sample2.zip", root_dir, "sample-1.2.0", max_workers=8
+    )
+
+    assert filepath1.read_bytes() == filepath2.read_bytes()
+
+
+def testcreate_archive_source_date_epoch(root_dir, tmp_path, monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1600000000")
+    filepath = create_archive(tmp_path / "sample.zip", root_dir, "sample-1.2.0")
+
+    with zipfile.ZipFile(filepath) as zf:
+        info = zf.getinfo("sample-1.2.0/python.exe")
+        assert info.date_time == (2020, 9, 13, 12, 26, 40)
+
+
+def testcreate_archive_dedup(root_dir, tmp_path, monkeypatch):
+    basedir = root_dir / "sample-1.2.0"
+    data = b"abc" * 100000
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        basedir.joinpath(name).write_bytes(data)
+
+    calls = []
+    compress_file = py2win.archive.compress_file
+    monkeypatch.setattr(
+        py2win.archive,
+        "compress_file",
+        lambda path, level: calls.append(path.name) or compress_file(path, level),
+    )
+
+    filepath = create_archive(
+        tmp_path / "sample.zip", root_dir, "sample-1.2.0", max_workers=1, dedup=True
+    )
+
+    # Compressed once, written for each member
+    assert calls.count("a.txt") == 1
+    assert "b.txt" not in calls and "c.txt" not in calls
+    with zipfile.ZipFile(filepath) as zf:
+        assert zf.testzip() is None
+        for name in ["a.txt", "b.txt", "c.txt"]:
+            assert zf.read("sample-1.2.0/" + name) == data
@@ -0,0 +1,110 @@
+""""""
+
+# Standard library modules.
+import threading
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.basetree import clone_tree, BaseTreePool
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def tree(tmp_path):
+    dirpath = tmp_path / "tree"
+    dirpath.joinpath("Lib", "encodings").mkdir(parents=True)
+    dirpath.joinpath("python.exe").write_bytes(b"MZ")
+    dirpath.joinpath("Lib", "encodings", "__init__.pyc").write_bytes(b"pyc")
+    return dirpath
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "auto"])
+def testclone_tree(tree, tmp_path, mode):
+    dst = tmp_path / "dist"
+    dst.mkdir()
+    dst.joinpath("python.exe").write_bytes(b"old")
+
+    used_mode = clone_tree(tree, dst, mode)
+
+    assert dst.joinpath("python.exe").read_bytes() == b"MZ"
+    assert dst.joinpath("Lib", "encodings", "__init__.pyc").read_bytes() == b"pyc"
+
+    same_inode = dst.joinpath("python.exe").samefile(tree / "python.exe")
+    assert same_inode == (used_mode == "hardlink")
+    if mode != "auto":
+        assert used_mode == mode
+
+
+def testclone_tree_invalid_mode(tree, tmp_path):
+    with pytest.raises(ValueError):
+        clone_tree(tree, tmp_path / "dist", "symlink")
+
+
+def testbase_tree_pool(tmp_path):
+    pool = BaseTreePool(tmp_path / "pool", max_trees=2)
+    calls = []
+
+    def builder(dirpath):
+        calls.append(dirpath)
+        dirpath.joinpath("python.exe").write_bytes(b"MZ")
+
+    assert pool.get("a") is None
+
+    threads = [
+        threading.Thread(target=pool.create, args=("a", builder)) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert pool.get("a").joinpath("python.exe").exists()
+
+    dst = tmp_path / "dist"
+    pool.clone("a", dst)
+    assert dst.joinpath("python.exe").exists()
+    assert not dst.joinpath(".py2win-complete").exists()
+
+    # Least recently used tree is evicted
+    pool.create("b", builder)
+    pool.get("a")
+    pool.create("c", builder)
+    assert pool.get("a") is not None
+    assert pool.get("b") is None
+    assert pool.get("c") is not None
+
+
+def testbase_tree_pool_failed_build(tmp_path):
+    pool = BaseTreePool(tmp_path / "pool")
+
+    def builder(dirpath):
+        dirpath.joinpath("python.exe").write_bytes(b"MZ")
+        raise IOError("download failed")
+
+    with pytest.raises(IOError):
+        pool.create("a", builder)
+
+    assert pool.get("a") is None
+    assert list(pool.root.iterdir()) == []
+
+
+def testbase_tree_pool_created_concurrently(tmp_path):
+    pool = BaseTreePool(tmp_path / "pool")
+    other = BaseTreePool(tmp_path / "pool")
+
+    def other_builder(dirpath):
+        dirpath.joinpath("python.exe").write_bytes(b"other")
+
+    def builder(dirpath):
+        # Another process completes the tree in the meantime
+        other.create("a", other_builder)
+        dirpath.joinpath("python.exe").write_bytes(b"MZ")
+
+    dirpath = pool.create("a", builder)
+
+    assert dirpath.joinpath("python.exe").read_bytes() == b"other"
+    assert [path.name for path in pool.root.iterdir()] == ["a"]
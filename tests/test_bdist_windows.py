@@ -5,12 +5,14 @@ import sys
 import subprocess
 
 # Third party modules.
+import pytest
 
 # Local modules.
 
 # Globals and constants variables.
 
 
+@pytest.mark.skipif(sys.platform != "win32", reason="Runs the built Windows executables")
 def testbdist_windows(sampleproject_dirpath):
     args = [sys.executable, "setup.py", "--command-packages", "py2win", "bdist_windows"]
     subprocess.run(args, cwd=str(sampleproject_dirpath), check=True)
@@ -0,0 +1,43 @@
+""""""
+
+# Standard library modules.
+from pathlib import Path
+import json
+import importlib.util
+
+# Third party modules.
+import pytest
+
+# Local modules.
+
+# Globals and constants variables.
+BENCH_FILEPATH = Path(__file__).parent.parent / "benchmarks" / "bench_embed.py"
+
+
+@pytest.fixture
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_embed", BENCH_FILEPATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def testbench_embed(bench, tmp_path):
+    filepath = tmp_path / "results.json"
+    assert (
+        bench.main(["--sizes", "tiny", "--repeat", "1", "--output", str(filepath)]) == 0
+    )
+
+    results = json.loads(filepath.read_text())
+    timings = results["sizes"]["tiny"]
+    assert timings["cold/run"] > 0.0
+    assert "cold/python" in timings
+    assert "cold/zip" in timings
+
+
+def testcompare(bench):
+    baseline = {"sizes": {"tiny": {"cold/run": 1.0, "cold/zip": 0.01}}}
+    results = {"sizes": {"tiny": {"cold/run": 2.0, "cold/zip": 0.02}}}
+
+    assert bench.compare(results, baseline) == [("tiny", "cold/run", 1.0, 2.0)]
+    assert bench.compare(results, baseline, tolerance=1.5) == []
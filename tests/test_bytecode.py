@@ -0,0 +1,57 @@
+""""""
+
+# Standard library modules.
+import importlib.util
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.bytecode import compile_tree
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def libdir(tmp_path):
+    libdir = tmp_path / "Lib"
+    libdir.joinpath("pkga").mkdir(parents=True)
+    libdir.joinpath("pkga", "__init__.py").write_text("VALUE = 1\n")
+    libdir.joinpath("pkga", "module.py").write_text("def f():\n    return 2\n")
+    libdir.joinpath("lib2to3", "fixes").mkdir(parents=True)
+    libdir.joinpath("lib2to3", "fixes", "fix_a.py").write_text("")
+    return libdir
+
+
+def testcompile_tree(libdir):
+    compile_tree(libdir, max_workers=2)
+
+    tag = importlib.util.cache_from_source(str(libdir / "pkga" / "module.py"))
+    assert libdir.joinpath("pkga", "module.py").exists()
+    assert (libdir / "pkga" / "__pycache__").joinpath(tag.rsplit("/", 1)[-1]).exists()
+
+
+def testcompile_tree_drop_sources(libdir):
+    compile_tree(libdir, optimize=2, drop_sources=True, max_workers=2)
+
+    assert not libdir.joinpath("pkga", "module.py").exists()
+    assert libdir.joinpath("pkga", "module.pyc").exists()
+    assert libdir.joinpath("pkga", "__init__.pyc").exists()
+    assert libdir.joinpath("lib2to3", "fixes", "fix_a.py").exists()
+
+
+def testcompile_tree_optimize_with_sources(libdir):
+    with pytest.raises(ValueError, match="drop_sources"):
+        compile_tree(libdir, optimize=1)
+
+
+def testcompile_tree_invalid_mode(libdir):
+    with pytest.raises(ValueError):
+        compile_tree(libdir, invalidation_mode="never")
+
+
+def testcompile_tree_syntax_error(libdir):
+    libdir.joinpath("pkga", "invalid.py").write_text("def f(:\n")
+
+    with pytest.raises(IOError):
+        compile_tree(libdir, max_workers=1)
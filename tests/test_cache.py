@@ -0,0 +1,188 @@
+""""""
+
+# Standard library modules.
+import json
+import time
+import hashlib
+import concurrent.futures
+from pathlib import Path
+
+# Third party modules.
+import pytest
+
+# Local modules.
+import py2win.cache
+from py2win.cache import ArtifactCache, sha256sum, ATIME_RESOLUTION
+
+# Globals and constants variables.
+URL = "https://example.com/file.bin"
+
+
+def _set_atimes(cache, atimes):
+    index_filepath = cache.root / cache.INDEX_FILENAME
+    index = json.loads(index_filepath.read_text())
+    for key, atime in atimes.items():
+        index[key]["atime"] = atime
+    index_filepath.write_text(json.dumps(index))
+
+
+def _put_many(root, prefix, count):
+    cache = ArtifactCache(root, max_size=None)
+    for i in range(count):
+        filepath = Path(root).parent.joinpath("{0}-{1}.bin".format(prefix, i))
+        filepath.write_bytes("{0}-{1}".format(prefix, i).encode("ascii"))
+        cache.put("{0}-{1}".format(prefix, i), filepath)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(tmp_path / "cache", max_size=None)
+
+
+@pytest.fixture
+def filepath(tmp_path):
+    filepath = tmp_path / "file.bin"
+    filepath.write_bytes(b"abc" * 100)
+    return filepath
+
+
+def testsha256sum(filepath):
+    assert sha256sum(filepath) == hashlib.sha256(b"abc" * 100).hexdigest()
+
+
+def testput_get(cache, filepath):
+    digest = sha256sum(filepath)
+    cached_filepath = cache.put(URL, filepath, digest)
+
+    assert cached_filepath.name == digest
+    assert cache.get(URL) == cached_filepath
+    assert cache.get(URL, digest.upper()) == cached_filepath
+    assert cache.get(URL, "0" * 64) is None
+    assert cache.get("https://example.com/other.bin") is None
+
+
+def testput_checksum_mismatch(cache, filepath):
+    with pytest.raises(IOError):
+        cache.put(URL, filepath, "0" * 64)
+    assert cache.get(URL) is None
+
+
+def testget_corrupted(cache, filepath):
+    cached_filepath = cache.put(URL, filepath)
+    cached_filepath.write_bytes(b"corrupted")
+
+    assert cache.get(URL) is None
+    assert not cached_filepath.exists()
+
+
+def testget_verified_once(cache, filepath, monkeypatch):
+    cached_filepath = cache.put(URL, filepath)
+
+    calls = []
+    monkeypatch.setattr(
+        py2win.cache, "sha256sum", lambda path: calls.append(path) or sha256sum(path)
+    )
+
+    # Verified when stored
+    assert cache.get(URL) == cached_filepath
+    assert calls == []
+
+    # Verified again by another instance
+    other = ArtifactCache(cache.root, max_size=None)
+    assert other.get(URL) == cached_filepath
+    assert other.get(URL) == cached_filepath
+    assert calls == [cached_filepath]
+
+    # Verified again once modified
+    cached_filepath.write_bytes(b"corrupted")
+    assert other.get(URL) is None
+
+
+def testget_atime(cache, filepath):
+    cache.put(URL, filepath)
+    index_filepath = cache.root / cache.INDEX_FILENAME
+
+    # Recently accessed, the index is not rewritten
+    mtime_ns = index_filepath.stat().st_mtime_ns
+    time.sleep(0.01)
+    cache.get(URL)
+    assert index_filepath.stat().st_mtime_ns == mtime_ns
+
+    atime = time.time() - ATIME_RESOLUTION - 1
+    _set_atimes(cache, {URL: atime})
+    cache.get(URL)
+    assert json.loads(index_filepath.read_text())[URL]["atime"] > atime
+
+
+def testput_same_content(cache, filepath):
+    cached_filepath1 = cache.put(URL, filepath)
+    cached_filepath2 = cache.put(URL + "2", filepath)
+    assert cached_filepath1 == cached_filepath2
+
+
+def testevict_lru(cache, tmp_path):
+    for i in range(3):
+        filepath = tmp_path / "file{}.bin".format(i)
+        filepath.write_bytes(bytes([i]) * 100)
+        cache.put("key{}".format(i), filepath)
+
+    # Last accessed over ATIME_RESOLUTION ago
+    now = time.time()
+    _set_atimes(cache, {"key{}".format(i): now - 3600 + i for i in range(3)})
+
+    cache.get("key0")
+    cache.evict(max_size=200)
+
+    assert cache.get("key0") is not None
+    assert cache.get("key1") is None
+    assert cache.get("key2") is not None
+
+
+def testcopy_read_bytes(cache, filepath, tmp_path):
+    cache.put(URL, filepath)
+
+    dst = tmp_path / "copy.bin"
+    assert cache.copy(URL, dst) == dst
+    assert dst.read_bytes() == filepath.read_bytes()
+    assert cache.read_bytes(URL) == filepath.read_bytes()
+
+    assert cache.copy(URL + "2", tmp_path / "missing.bin") is None
+    assert cache.read_bytes(URL + "2") is None
+
+
+def testevict_unindexed(cache, filepath):
+    cached_filepath = cache.put(URL, filepath)
+    orphan = cached_filepath.with_name("0" * 64)
+    orphan.write_bytes(b"orphan")
+
+    cache.evict()
+
+    assert not orphan.exists()
+    assert cache.get(URL) == cached_filepath
+
+
+def testclear(cache, filepath):
+    cache.put(URL, filepath)
+    cache.root.joinpath("base-trees").mkdir()
+
+    cache.clear()
+
+    assert cache.get(URL) is None
+    assert cache.root.joinpath("base-trees").exists()
+
+
+def testput_processes(tmp_path):
+    root = tmp_path / "cache"
+    with concurrent.futures.ProcessPoolExecutor(4) as executor:
+        futures = [
+            executor.submit(_put_many, root, "p{}".format(i), 10) for i in range(4)
+        ]
+        for future in futures:
+            future.result()
+
+    cache = ArtifactCache(root, max_size=None)
+    for i in range(4):
+        for j in range(10):
+            assert cache.read_bytes("p{0}-{1}".format(i, j)) == "p{0}-{1}".format(
+                i, j
+            ).encode("ascii")
@@ -0,0 +1,122 @@
+""""""
+
+# Standard library modules.
+import shutil
+import logging
+import threading
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.daemon import BuildService, BuildServer, BuildClient
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def mirror_dir(embedserver, httpdir, tmp_path):
+    dirpath, _baseurl = httpdir
+    mirror_dir = tmp_path / "mirror"
+    mirror_dir.joinpath("3.10.11").mkdir(parents=True)
+    shutil.copy(
+        dirpath / "python-3.10.11-embed-amd64.zip", mirror_dir.joinpath("3.10.11")
+    )
+    return mirror_dir
+
+
+@pytest.fixture
+def client(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger="py2win")
+
+    service = BuildService(tmp_path / "cache", max_workers=2)
+    server = BuildServer(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield BuildClient(server.state_filepath)
+
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def _create_spec(tmp_path, mirror_dir, wheel_filepath, **options):
+    options.update(
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+        python_mirror=str(mirror_dir),
+    )
+    return {
+        "project_name": "sample",
+        "project_version": "1.2.0",
+        "dist_dir": str(tmp_path / "dist"),
+        "options": options,
+        "wheels": [str(wheel_filepath)],
+        "zip_dist": True,
+    }
+
+
+def testdaemon_build(client, mirror_dir, wheelhouse, tmp_path):
+    spec = _create_spec(tmp_path, mirror_dir, wheelhouse("pkga", "1.0"))
+
+    messages = []
+    paths, report = client.build(spec, lambda level, message: messages.append(message))
+
+    (path,) = paths
+    assert path == str(tmp_path / "dist" / "sample-1.2.0")
+    assert tmp_path.joinpath(
+        "dist", "sample-1.2.0", "Lib", "site-packages", "pkga"
+    ).exists()
+    assert tmp_path.joinpath("dist", "sample-1.2.0.zip").exists()
+    assert [stage["name"] for stage in report["stages"]] == [
+        "python",
+        "packages",
+        "zip",
+    ]
+    assert any("extracting" in message for message in messages)
+    assert client.status() == []
+
+    # Base tree prepared by the first build
+    assert tmp_path.joinpath("cache", "base-trees").exists()
+
+
+def testdaemon_build_error(client, mirror_dir, wheelhouse, tmp_path):
+    spec = _create_spec(tmp_path, mirror_dir, wheelhouse("pkga", "1.0"), foo=1)
+    with pytest.raises(IOError, match="Unknown options: foo"):
+        client.build(spec)
+
+    spec = _create_spec(tmp_path, mirror_dir, wheelhouse("pkga", "1.0"))
+    spec["dist_dir"] = "dist"
+    with pytest.raises(IOError, match="absolute"):
+        client.build(spec)
+
+
+def testdaemon_invalid_token(client):
+    client.state_filepath.write_text(
+        client.state_filepath.read_text().replace('"token": "', '"token": "x')
+    )
+
+    with pytest.raises(IOError, match="Invalid token"):
+        client.status()
+
+
+def testdaemon_not_running(tmp_path):
+    client = BuildClient(tmp_path / "daemon.json")
+    with pytest.raises(IOError):
+        client.status()
+
+
+def testdaemon_shared_state(mirror_dir, wheelhouse, tmp_path):
+    service = BuildService(tmp_path / "cache")
+    try:
+        spec = _create_spec(tmp_path, mirror_dir, wheelhouse("pkga", "1.0"))
+        embed1 = service.create_embed(spec)
+        embed2 = service.create_embed(spec)
+    finally:
+        service.close()
+
+    assert embed1.base_tree_pool is embed2.base_tree_pool
+    assert embed1._wheel_indexes is embed2._wheel_indexes
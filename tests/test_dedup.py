@@ -0,0 +1,124 @@
+""""""
+
+# Standard library modules.
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.dedup import (
+    find_duplicates,
+    deduplicate_tree,
+    is_runtime_dll,
+    PYTHON_PACKAGE,
+    STDLIB_PACKAGE,
+)
+
+# Globals and constants variables.
+VCRUNTIME = b"VCRUNTIME" * 100
+QT = b"QT" * 1000
+CRYPTO = b"CRYPTO" * 50
+
+
+def _create_tree(dirpath, files):
+    for relpath, content in files.items():
+        filepath = dirpath.joinpath(relpath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_bytes(content)
+    return dirpath
+
+
+@pytest.fixture
+def tree(tmp_path):
+    return _create_tree(
+        tmp_path / "sample-1.2.0",
+        {
+            "python.exe": b"MZ",
+            "vcruntime140.dll": VCRUNTIME,
+            "Lib/os.py": b"import sys\n",
+            "Lib/site-packages/pkga/__init__.py": b"",
+            "Lib/site-packages/pkga/VCRUNTIME140.dll": VCRUNTIME,
+            "Lib/site-packages/pkga/qt5core.dll": QT,
+            "Lib/site-packages/pkga-1.0.dist-info/RECORD": (
+                b"pkga/__init__.py,,\n"
+                b"pkga/VCRUNTIME140.dll,,\n"
+                b"pkga/qt5core.dll,,\n"
+                b"pkga-1.0.dist-info/RECORD,,\n"
+            ),
+            "Lib/site-packages/pkgb/__init__.py": (
+                b"import ctypes\nctypes.CDLL('vcruntime140.dll')\n"
+            ),
+            "Lib/site-packages/pkgb/vcruntime140.dll": VCRUNTIME,
+            "Lib/site-packages/pkgc.libs/qt5core.dll": QT,
+            "libcrypto-1_1.dll": CRYPTO,
+            "Lib/site-packages/pkgc.libs/libcrypto-1_1.dll": CRYPTO,
+        },
+    )
+
+
+def testfind_duplicates():
+    hashes = {"a": "1", "b": "1", "c": "1", "d": "2", "e": "3", "f": "3"}
+    sizes = {"a": 10, "b": 10, "c": 10, "d": 5, "e": 0, "f": 0}
+
+    (group,) = find_duplicates(hashes, sizes)
+
+    assert group["paths"] == ["a", "b", "c"]
+    assert group["duplicate_bytes"] == 20
+
+
+def testdeduplicate_tree(tree):
+    result = deduplicate_tree(tree)
+
+    assert result["duplicate_bytes"] == 2 * len(VCRUNTIME) + len(QT) + len(CRYPTO)
+    assert [group["size"] for group in result["duplicates"]] == [
+        len(QT),
+        len(VCRUNTIME),
+        len(CRYPTO),
+    ]
+
+    # Only the runtime DLL resolvable from the application directory is
+    # removed
+    assert result["collapsed"] == {
+        "Lib/site-packages/pkga/VCRUNTIME140.dll": "vcruntime140.dll"
+    }
+    assert result["collapsed_bytes"] == len(VCRUNTIME)
+    assert not tree.joinpath(
+        "Lib", "site-packages", "pkga", "VCRUNTIME140.dll"
+    ).exists()
+    assert tree.joinpath("Lib", "site-packages", "pkgb", "vcruntime140.dll").exists()
+    assert tree.joinpath("Lib", "site-packages", "pkga", "qt5core.dll").exists()
+    assert tree.joinpath(
+        "Lib", "site-packages", "pkgc.libs", "libcrypto-1_1.dll"
+    ).exists()
+
+    def size(*parts):
+        return sum(
+            path.stat().st_size
+            for path in [tree.joinpath(*parts)] + list(tree.joinpath(*parts).rglob("*"))
+            if path.is_file()
+        )
+
+    packages = result["packages"]
+    site_packages = ("Lib", "site-packages")
+    assert packages["pkga"] == size(*site_packages, "pkga") + size(
+        *site_packages, "pkga-1.0.dist-info"
+    )
+    assert packages["pkgb"] == size(*site_packages, "pkgb")
+    assert packages["pkgc.libs"] == len(QT) + len(CRYPTO)
+    assert packages[STDLIB_PACKAGE] == size("Lib", "os.py")
+    assert packages[PYTHON_PACKAGE] == 2 + len(VCRUNTIME) + len(CRYPTO)
+
+
+def testis_runtime_dll():
+    assert is_runtime_dll("VCRUNTIME140_1.dll")
+    assert is_runtime_dll("msvcp140.dll")
+    assert is_runtime_dll("api-ms-win-crt-runtime-l1-1-0.dll")
+    assert not is_runtime_dll("python3.dll")
+    assert not is_runtime_dll("libcrypto-1_1.dll")
+
+
+def testdeduplicate_tree_no_collapse(tree):
+    result = deduplicate_tree(tree, collapse=False)
+
+    assert result["collapsed"] == {}
+    assert tree.joinpath("Lib", "site-packages", "pkga", "VCRUNTIME140.dll").exists()
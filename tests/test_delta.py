@@ -0,0 +1,118 @@
+""""""
+
+# Standard library modules.
+import sys
+import shutil
+import zipfile
+import subprocess
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.archive import create_archive
+from py2win.applydelta import apply_delta, MANIFEST_ARCNAME
+from py2win.delta import create_delta, hash_tree
+
+# Globals and constants variables.
+
+
+def _create_tree(dirpath, files):
+    for relpath, content in files.items():
+        filepath = dirpath.joinpath(relpath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_bytes(content)
+    return dirpath
+
+
+@pytest.fixture
+def trees(tmp_path):
+    old = _create_tree(
+        tmp_path / "dist" / "sample-1.0",
+        {
+            "python.exe": b"MZ",
+            "python310.dll": b"DLL" * 1000,
+            "Lib/site-packages/sample/__init__.py": b"VERSION = '1.0'\n",
+            "Lib/site-packages/old/__init__.py": b"",
+        },
+    )
+    new = _create_tree(
+        tmp_path / "dist" / "sample-1.1",
+        {
+            "python.exe": b"MZ",
+            "python310.dll": b"DLL" * 1000,
+            "Lib/site-packages/sample/__init__.py": b"VERSION = '1.1'\n",
+            "Lib/site-packages/new/__init__.py": b"",
+        },
+    )
+    return old, new
+
+
+def testcreate_delta(trees, tmp_path):
+    old, new = trees
+    filepath = tmp_path / "sample-1.1.delta.zip"
+
+    manifest = create_delta(old, new, filepath)
+
+    assert sorted(manifest["added"]) == ["Lib/site-packages/new/__init__.py"]
+    assert sorted(manifest["changed"]) == ["Lib/site-packages/sample/__init__.py"]
+    assert sorted(manifest["removed"]) == ["Lib/site-packages/old/__init__.py"]
+    assert manifest["unchanged"] == 2
+
+    with zipfile.ZipFile(filepath) as zf:
+        assert sorted(zf.namelist()) == [
+            "__main__.py",
+            "files/Lib/site-packages/new/__init__.py",
+            "files/Lib/site-packages/sample/__init__.py",
+            MANIFEST_ARCNAME,
+        ]
+
+
+def testcreate_delta_zip(trees, tmp_path):
+    old, new = trees
+    zip_filepath = create_archive(tmp_path / "sample-1.0.zip", old.parent, old.name)
+
+    manifest = create_delta(zip_filepath, new, tmp_path / "delta.zip")
+
+    assert hash_tree(zip_filepath) == hash_tree(old)
+    assert manifest["unchanged"] == 2
+    assert len(manifest["changed"]) == 1
+
+
+def testapply_delta(trees, tmp_path):
+    old, new = trees
+    filepath = tmp_path / "delta.zip"
+    create_delta(old, new, filepath)
+
+    apply_delta(filepath, old)
+
+    assert hash_tree(old) == hash_tree(new)
+    assert not old.joinpath("Lib", "site-packages", "old").exists()
+
+
+def testapply_delta_script(trees, tmp_path):
+    old, new = trees
+    filepath = tmp_path / "delta.zip"
+    create_delta(old, new, filepath)
+
+    # Applied without py2win
+    args = [sys.executable, "-I", str(filepath), str(old)]
+    subprocess.run(args, check=True, cwd=str(tmp_path))
+
+    assert hash_tree(old) == hash_tree(new)
+
+
+def testapply_delta_modified(trees, tmp_path):
+    old, new = trees
+    filepath = tmp_path / "delta.zip"
+    create_delta(old, new, filepath)
+
+    installed = tmp_path / "installed"
+    shutil.copytree(old, installed)
+    installed.joinpath("Lib", "site-packages", "sample", "__init__.py").write_text("")
+    expected = hash_tree(installed)
+
+    with pytest.raises(IOError):
+        apply_delta(filepath, installed)
+
+    assert hash_tree(installed) == expected
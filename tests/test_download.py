@@ -0,0 +1,168 @@
+""""""
+
+# Standard library modules.
+import os
+import hashlib
+import threading
+import http.server
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.download import Downloader
+
+# Globals and constants variables.
+PAYLOAD = os.urandom(256 * 1024)
+ETAG = '"v1"'
+
+
+class FaultyRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves :data:`PAYLOAD`, with range requests, and fails the requests as
+    listed in ``server.faults``: ``"503"`` returns an error, ``"reset:N"``
+    closes the connection after *N* bytes of the content.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        fault = self.server.faults.pop(0) if self.server.faults else None
+
+        if fault == "503":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start = 0
+        if "Range" in self.headers and self.headers.get("If-Range") == ETAG:
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+
+        data = PAYLOAD[start:]
+        if start:
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                "bytes {0}-{1}/{2}".format(start, len(PAYLOAD) - 1, len(PAYLOAD)),
+            )
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+
+        if fault is not None and fault.startswith("reset:"):
+            self.wfile.write(data[: int(fault.split(":")[1])])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FaultyRequestHandler)
+    server.faults = []
+    server.requests = []
+    server.url = "http://127.0.0.1:{}/file.bin".format(server.server_address[1])
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def downloader():
+    downloader = Downloader(retries=3, backoff=0.0, chunk_size=1024)
+    yield downloader
+    downloader.close()
+
+
+def testdownload(server, downloader, tmp_path):
+    filepath = tmp_path / "file.bin"
+    stats = downloader.download(server.url, filepath)
+
+    assert filepath.read_bytes() == PAYLOAD
+    assert stats.size == len(PAYLOAD)
+    assert stats.bytes == len(PAYLOAD)
+    assert stats.attempts == 1
+    assert stats.resumed == 0
+    assert stats.throughput > 0
+    assert downloader.stats == [stats]
+    assert server.requests[0]["Accept-Encoding"] == "identity"
+    assert not tmp_path.joinpath("file.bin.part").exists()
+
+
+def testdownload_retry(server, downloader, tmp_path):
+    server.faults = ["503", "503"]
+    filepath = tmp_path / "file.bin"
+
+    stats = downloader.download(server.url, filepath)
+
+    assert filepath.read_bytes() == PAYLOAD
+    assert stats.attempts == 3
+
+
+def testdownload_resume(server, downloader, tmp_path):
+    server.faults = ["reset:10240", "reset:20480"]
+    filepath = tmp_path / "file.bin"
+
+    sha256 = hashlib.sha256(PAYLOAD).hexdigest()
+    stats = downloader.download(server.url, filepath, sha256)
+
+    assert filepath.read_bytes() == PAYLOAD
+    assert stats.attempts == 3
+    assert stats.resumed == 2
+    assert stats.bytes == len(PAYLOAD)
+    assert server.requests[1]["Range"] == "bytes=10240-"
+    assert server.requests[2]["Range"] == "bytes=30720-"
+
+
+def testdownload_too_many_failures(server, downloader, tmp_path):
+    server.faults = ["503"] * 4
+    filepath = tmp_path / "file.bin"
+
+    with pytest.raises(IOError):
+        downloader.download(server.url, filepath)
+
+    assert not filepath.exists()
+    assert not tmp_path.joinpath("file.bin.part").exists()
+
+
+def testdownload_checksum_mismatch(server, downloader, tmp_path):
+    filepath = tmp_path / "file.bin"
+
+    with pytest.raises(IOError):
+        downloader.download(server.url, filepath, "0" * 64)
+
+    assert not filepath.exists()
+    assert not tmp_path.joinpath("file.bin.part").exists()
+
+
+def testdownload_connection_reuse(server, downloader, tmp_path):
+    for i in range(3):
+        downloader.download(server.url, tmp_path / "file{0}.bin".format(i))
+
+    # A single connection in the pool of the session
+    adapter = downloader.session.get_adapter(server.url)
+    assert len(adapter.poolmanager.pools) == 1
+
+
+def testopen(server, downloader):
+    server.faults = ["503"]
+
+    with downloader.open(server.url) as fp:
+        assert fp.read() == PAYLOAD
+
+    assert downloader.stats[0].bytes == len(PAYLOAD)
+    assert downloader.stats[0].attempts == 2
@@ -1,18 +1,88 @@
 """"""
 
 # Standard library modules.
+from pathlib import Path
+import io
+import json
+import importlib.util
+import marshal
+import shutil
 import subprocess
 import sys
+import tarfile
+import zipfile
 
 # Third party modules.
 import pytest
 
 # Local modules.
 from py2win.embed import EmbedPython
+from py2win.launcher import get_launcher_key, read_stamp
+from py2win.target import Target
+from conftest import create_sdist
 
 # Globals and constants variables.
 
 
+def _create_source_tarball(filepath):
+    with tarfile.open(filepath, "w:gz") as tar:
+        for name in [
+            "Python-3.x/Lib/lib2to3/__init__.py",
+            "Python-3.x/Lib/lib2to3/fixes/fix_a.py",
+            "Python-3.x/Lib/lib2to3/fixes/data/fix_c.py",
+            "Python-3.x/Lib/lib2to3/pgen2/grammar.py",
+            "Python-3.x/Lib/lib2to3/tests/test_a.py",
+            "Python-3.x/Lib/os.py",
+            # Members of a directory are not always contiguous
+            "Python-3.x/Lib/lib2to3/fixes/fix_b.py",
+        ]:
+            data = name.encode("ascii")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def testembed_fix_lib2to3(httpdir, tmp_path):
+    dirpath, baseurl = httpdir
+    _create_source_tarball(dirpath / "Python.tgz")
+
+    embed = EmbedPython("sample", "1.2.0", cache_dir=tmp_path / "cache")
+    embed.PYTHON_SOURCE_BASEURL = baseurl + "/Python.tgz"
+
+    workdir = tmp_path / "dist"
+    workdir.joinpath("Lib", "lib2to3").mkdir(parents=True)
+
+    embed._fix_lib2to3(workdir)
+
+    filepaths = sorted(p.relative_to(workdir).as_posix() for p in workdir.rglob("*.py"))
+    assert filepaths == [
+        "Lib/lib2to3/fixes/fix_a.py",
+        "Lib/lib2to3/fixes/fix_b.py",
+        "Lib/lib2to3/pgen2/grammar.py",
+    ]
+
+    # Second run uses cached payload
+    dirpath.joinpath("Python.tgz").unlink()
+    workdir = tmp_path / "dist2"
+    workdir.joinpath("Lib", "lib2to3").mkdir(parents=True)
+
+    embed._fix_lib2to3(workdir)
+
+    assert workdir.joinpath("Lib", "lib2to3", "fixes", "fix_a.py").exists()
+
+
+def testembed_fix_lib2to3_skip(tmp_path):
+    embed = EmbedPython("sample", "1.2.0", cache_dir=tmp_path / "cache")
+    embed.PYTHON_SOURCE_BASEURL = "http://127.0.0.1:1/Python.tgz"
+
+    # No lib2to3 in the distribution
+    embed._fix_lib2to3(tmp_path)
+    assert not tmp_path.joinpath("Lib").exists()
+
+
+@pytest.mark.skipif(
+    sys.platform != "win32", reason="Runs the built Windows executables"
+)
 def testembed_run(sampleproject_dirpath, tmp_path):
     # Create wheel
     args = [sys.executable, "setup.py", "bdist_wheel"]
@@ -39,3 +109,784 @@ def testembed_run(sampleproject_dirpath, tmp_path):
     args = [str(workdir.joinpath("sample-console.exe")), "--hello"]
     out = subprocess.run(args, cwd=str(workdir), check=True, stdout=subprocess.PIPE)
     assert out.stdout.strip() == b"Hello world"
+
+
+def testembed_run_cross_build(embedserver, wheelhouse, tmp_path, monkeypatch):
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+
+    wheelhouse("pkgb", "1.0", requires=["pkgc"])
+    wheelhouse(
+        "pkgc",
+        "1.0",
+        tag="cp310-cp310-win_amd64",
+        files={"pkgc/__init__.py": "", "pkgc/_ext.pyd": b"MZ"},
+    )
+    wheelhouse(
+        "pkgc",
+        "1.1",
+        tag="cp310-cp310-manylinux1_x86_64",
+        files={"pkgc/__init__.py": "", "pkgc/_ext.so": b""},
+    )
+    filepath = wheelhouse("pkga", "1.0", requires=["pkgb"])
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        extra_wheel_dir=wheelhouse.dirpath,
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_wheel(filepath)
+
+    workdir = embed.run(tmp_path / "dist")
+
+    assert workdir.joinpath("python.exe").exists()
+    assert workdir.joinpath("Lib", "os.pyc").exists()
+    assert not workdir.joinpath("python310._pth").exists()
+
+    site_packages = workdir.joinpath("Lib", "site-packages")
+    assert site_packages.joinpath("pkga", "__init__.py").exists()
+    assert site_packages.joinpath("pkgb", "__init__.py").exists()
+    assert site_packages.joinpath("pkgc", "_ext.pyd").exists()
+    assert site_packages.joinpath("pkgc-1.0.dist-info").exists()
+
+
+def testembed_run_cross_build_scripts(embedserver, tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_script("sample.console", "main", "sample-console", console=True)
+    embed.add_script("sample.gui", "main", "sample-gui", console=False)
+
+    # No launcher in cache
+    with pytest.raises(OSError):
+        embed.run(tmp_path / "dist")
+
+    for console in [True, False]:
+        filepath = tmp_path / "launcher.exe"
+        filepath.write_bytes(b"MZlauncher")
+        embed.cache.put(get_launcher_key(embed.target, console), filepath)
+
+    workdir = embed.run(tmp_path / "dist")
+
+    filepath = workdir.joinpath("sample-console.exe")
+    assert filepath.read_bytes().startswith(b"MZlauncher")
+    assert read_stamp(filepath)["module"] == "sample.console"
+    assert read_stamp(workdir.joinpath("sample-gui.exe"))["module"] == "sample.gui"
+
+
+def testembed_run_pyconfig_launcher(embedserver, tmp_path):
+    def create_embed(launcher_site):
+        embed = EmbedPython(
+            "sample",
+            "1.2.0",
+            cache_dir=tmp_path / "cache",
+            python_version="3.10.11",
+            arch="amd64",
+            cross_build=True,
+            zip_stdlib=True,
+            launcher="pyconfig",
+            launcher_site=launcher_site,
+        )
+        embed.PYTHON_EMBED_BASEURL = embedserver
+        embed.add_script("sample.console", "main", "sample-console", console=True)
+        return embed
+
+    filepath = tmp_path / "launcher.exe"
+    filepath.write_bytes(b"MZpyconfig")
+    embed = create_embed(True)
+    embed.cache.put(get_launcher_key(embed.target, True, "pyconfig"), filepath)
+
+    workdir = embed.run(tmp_path / "dist")
+
+    filepath = workdir.joinpath("sample-console.exe")
+    assert filepath.read_bytes().startswith(b"MZpyconfig")
+    values = read_stamp(filepath)
+    assert values["path"] == "python310.zip;.;Lib"
+    assert values["site"] == "1"
+
+    # Executable is stamped again without site
+    workdir = create_embed(False).run(tmp_path / "dist", clean=False)
+
+    values = read_stamp(workdir.joinpath("sample-console.exe"))
+    assert values["path"] == "python310.zip;.;Lib;Lib\\site-packages"
+    assert values["site"] == "0"
+
+
+def testembed_run_cross_build_builtin(embedserver, wheelhouse, tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+    embed.add_wheel(wheelhouse("pkgb", "1.0"))
+
+    workdir = embed.run(tmp_path / "dist")
+
+    site_packages = workdir.joinpath("Lib", "site-packages")
+    assert site_packages.joinpath("pkga", "__init__.py").exists()
+    assert site_packages.joinpath("pkgb-1.0.dist-info", "INSTALLER").exists()
+    assert not site_packages.joinpath("pip").exists()
+
+
+def testembed_run_lock(embedserver, wheelhouse, tmp_path, monkeypatch):
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+
+    wheelhouse("pkgb", "1.0")
+    wheelhouse("pkgc", "1.0", tag="cp310-cp310-win_amd64")
+
+    def create_embed():
+        embed = EmbedPython(
+            "sample",
+            "1.2.0",
+            extra_wheel_dir=wheelhouse.dirpath,
+            cache_dir=tmp_path / "cache",
+            python_version="3.10.11",
+            arch="amd64",
+            cross_build=True,
+        )
+        embed.PYTHON_EMBED_BASEURL = embedserver
+        embed.add_wheel(wheelhouse("pkga", "1.0", requires=["pkgb"]))
+        embed.add_requirement("pkgc")
+        return embed
+
+    lock_filepath = tmp_path / "py2win.lock"
+    create_embed().write_lock(lock_filepath)
+
+    # Newer version in the wheelhouse must not be picked up
+    wheelhouse("pkgb", "2.0")
+
+    embed = create_embed()
+    embed.use_lock(lock_filepath)
+    workdir = embed.run(tmp_path / "dist")
+
+    site_packages = workdir.joinpath("Lib", "site-packages")
+    assert site_packages.joinpath("pkga-1.0.dist-info").exists()
+    assert site_packages.joinpath("pkgb-1.0.dist-info").exists()
+    assert site_packages.joinpath("pkgc-1.0.dist-info").exists()
+    assert not site_packages.joinpath("pip").exists()
+
+    # Requirements must match the lock file
+    embed.add_requirement("pkgd")
+    with pytest.raises(ValueError):
+        embed.run(tmp_path / "dist")
+
+
+def testembed_run_incremental(embedserver, wheelhouse, tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+
+    dist_dir = tmp_path / "dist"
+    embed.run(dist_dir, zip_dist=True)
+
+    calls = []
+    embed._download_python_embedded = lambda workdir: calls.append("python")
+    embed._install_builtin = lambda workdir: calls.append("packages")
+    embed._create_zip = lambda *args: calls.append("zip")
+
+    # Nothing changed
+    embed.run(dist_dir, clean=False, zip_dist=True)
+    assert calls == []
+
+    # New wheel
+    embed.add_wheel(wheelhouse("pkgb", "1.0"))
+    embed.run(dist_dir, clean=False, zip_dist=True)
+    assert calls == ["packages", "zip"]
+
+    # Clean
+    calls.clear()
+    embed.run(dist_dir, clean=True)
+    assert calls[0] == "python"
+
+
+def testembed_run_compile_bytecode_mismatch(tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        python_version="3.4.4",
+        arch="amd64",
+        cross_build=True,
+        compile_bytecode=True,
+    )
+
+    with pytest.raises(OSError):
+        embed.run(tmp_path)
+
+
+def testembed_optimize_requires_drop_sources(tmp_path):
+    with pytest.raises(ValueError, match="drop_sources"):
+        EmbedPython(
+            "sample",
+            "1.2.0",
+            cache_dir=tmp_path / "cache",
+            compile_bytecode=True,
+            optimize=2,
+        )
+
+
+def testembed_run_zip(embedserver, wheelhouse, tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+        zip_stdlib=True,
+        zip_site_packages=True,
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+
+    workdir = embed.run(tmp_path / "dist")
+
+    assert workdir.joinpath("python310.zip").exists()
+    assert not workdir.joinpath("Lib", "os.pyc").exists()
+    assert "python310.zip" in workdir.joinpath("python310._pth").read_text()
+
+    assert workdir.joinpath("Lib", "site-packages.zip").exists()
+    assert workdir.joinpath("Lib", "site-packages", "py2win-zip.pth").exists()
+    assert not workdir.joinpath("Lib", "site-packages", "pkga").exists()
+
+    # Upgrade
+    embed.wheel_filepaths = [wheelhouse("pkga", "2.0")]
+    workdir = embed.run(tmp_path / "dist", clean=False)
+
+    site_packages = workdir.joinpath("Lib", "site-packages")
+    assert site_packages.joinpath("pkga-2.0.dist-info").exists()
+    assert not site_packages.joinpath("pkga-1.0.dist-info").exists()
+
+
+def testembed_run_tree_shaking(httpdir, wheelhouse, tmp_path):
+    host = Target.host()
+    dirpath, baseurl = httpdir
+
+    # Embedded distribution of the running interpreter, with real bytecode
+    name = "python{0}{1}".format(*host.version_info[:2])
+    filepath = dirpath / "python-{0.python_version}-embed-{0.arch}.zip".format(host)
+    with zipfile.ZipFile(filepath, "w") as zf:
+        zf.writestr("python.exe", b"MZ")
+        with zf.open(name + ".zip", "w") as fp:
+            with zipfile.ZipFile(fp, "w") as zf_stdlib:
+                for arcname in ["os.pyc", "encodings/__init__.pyc", "this.pyc"]:
+                    code = compile("", arcname, "exec")
+                    data = importlib.util.MAGIC_NUMBER + bytes(12) + marshal.dumps(code)
+                    zf_stdlib.writestr(arcname, data)
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        cross_build=True,
+        installer="builtin",
+        tree_shaking=True,
+    )
+    embed.PYTHON_EMBED_BASEURL = baseurl + "/python-{version}-embed-{arch}.zip"
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+    embed.add_wheel(wheelhouse("pkgb", "1.0"))
+    embed.add_script("pkga", "main", "sample-console")
+    tmp_path.joinpath("launcher.exe").write_bytes(b"MZ")
+    embed.cache.put(get_launcher_key(embed.target), tmp_path / "launcher.exe")
+
+    dist_dir = tmp_path / "dist"
+    workdir = embed.run(dist_dir)
+
+    libdir = workdir.joinpath("Lib")
+    assert libdir.joinpath("os.pyc").exists()
+    assert not libdir.joinpath("this.pyc").exists()
+    assert libdir.joinpath("site-packages", "pkga").exists()
+    assert not libdir.joinpath("site-packages", "pkgb").exists()
+    assert dist_dir.joinpath("sample-1.2.0.py2win-shake.json").exists()
+
+    # Removed modules are restored when hidden imports change
+    embed.add_hidden_import("pkgb")
+    workdir = embed.run(dist_dir, clean=False)
+    assert libdir.joinpath("site-packages", "pkgb").exists()
+    assert not libdir.joinpath("this.pyc").exists()
+
+
+def testembed_run_tree_shaking_mismatch(tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        python_version="3.4.4",
+        arch="amd64",
+        cross_build=True,
+        tree_shaking=True,
+    )
+
+    with pytest.raises(OSError):
+        embed.run(tmp_path)
+
+
+def testembed_run_targets(httpdir, wheelhouse, tmp_path):
+    dirpath, baseurl = httpdir
+    for version, arch in [("3.10.11", "amd64"), ("3.11.4", "win32")]:
+        name = "python{0}".format("".join(version.split(".")[:2]))
+        filepath = dirpath / "python-{0}-embed-{1}.zip".format(version, arch)
+        with zipfile.ZipFile(filepath, "w") as zf:
+            zf.writestr("python.exe", b"MZ")
+            zf.writestr(name + "._pth", name + ".zip\n.\n")
+            with zf.open(name + ".zip", "w") as fp:
+                with zipfile.ZipFile(fp, "w") as zf_stdlib:
+                    zf_stdlib.writestr("os.pyc", b"")
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        targets=[("3.10.11", "amd64"), ("3.11.4", "win32")],
+        cross_build=True,
+        installer="builtin",
+    )
+    embed.PYTHON_EMBED_BASEURL = baseurl + "/python-{version}-embed-{arch}.zip"
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+
+    dist_dir = tmp_path / "dist"
+    workdirs = embed.run(dist_dir, zip_dist=True)
+
+    assert [workdir.name for workdir in workdirs] == [
+        "sample-1.2.0-cp310-win_amd64",
+        "sample-1.2.0-cp311-win32",
+    ]
+    for workdir in workdirs:
+        assert workdir.joinpath("Lib", "os.pyc").exists()
+        assert workdir.joinpath("Lib", "site-packages", "pkga").exists()
+        assert dist_dir.joinpath(workdir.name + ".zip").exists()
+
+
+def testembed_targets_invalid():
+    with pytest.raises(ValueError):
+        EmbedPython(
+            "sample", "1.2.0", python_version="3.10.11", targets=[("3.10.11", "amd64")]
+        )
+
+    with pytest.raises(ValueError):
+        EmbedPython("sample", "1.2.0", targets=[("3.10.11", "amd64")] * 2)
+
+    # Same distribution name
+    with pytest.raises(ValueError, match="same tags cp310-win_amd64"):
+        EmbedPython(
+            "sample", "1.2.0", targets=[("3.10.11", "amd64"), ("3.10.9", "amd64")]
+        )
+
+    EmbedPython("sample", "1.2.0", targets=[("3.10.11", "amd64"), ("3.10.9", "win32")])
+
+
+def testembed_run_report(embedserver, wheelhouse, tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+
+    dist_dir = tmp_path / "dist"
+    embed.run(dist_dir, zip_dist=True)
+
+    report = embed.report.to_dict()
+    assert [stage["name"] for stage in report["stages"]] == [
+        "python",
+        "packages",
+        "zip",
+    ]
+    assert report["counters"]["cache_misses"] == 1
+    assert report["counters"]["bytes_downloaded"] > 0
+    assert report["stages"][1]["files_written"] > 0
+
+    target = report["targets"]["3.10.11-amd64"]
+    assert target["tree_files"] > 0
+    assert target["zip_size"] > 0
+
+    # Up-to-date stages are skipped
+    embed.run(dist_dir, clean=False, zip_dist=True)
+    report = embed.report.to_dict()
+    assert all(stage["skipped"] for stage in report["stages"])
+
+
+def testembed_run_schedule(embedserver, wheelhouse, tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+        concurrent_stages=2,
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+
+    embed.run(tmp_path / "dist", zip_dist=True)
+
+    schedule = embed.report.to_dict()["schedule"]
+    names = [entry["name"] for entry in schedule]
+    assert set(names) == {
+        "python",
+        "python:embed",
+        "python:stdlib",
+        "python:fetch_lib2to3",
+        "python:lib2to3",
+        "packages",
+    }
+    assert all(entry["status"] == "done" for entry in schedule)
+    assert all(entry["target"] == "3.10.11-amd64" for entry in schedule)
+
+    # Errors of a stage are raised and the following stages are cancelled
+    def fail(workdir):
+        raise IOError("failed")
+
+    embed._install_builtin = fail
+    with pytest.raises(IOError, match="failed"):
+        embed.run(tmp_path / "dist", zip_dist=True)
+
+    report = embed.report.to_dict()
+    assert "zip" not in [stage["name"] for stage in report["stages"]]
+    assert {entry["name"]: entry["status"] for entry in report["schedule"]}[
+        "packages"
+    ] == "failed"
+
+
+def testembed_share_state(tmp_path):
+    embed1 = EmbedPython(
+        "sample", "1.2.0", cache_dir=tmp_path / "cache", base_tree=True
+    )
+    embed2 = EmbedPython(
+        "sample",
+        "1.3.0",
+        cache_dir=tmp_path / "cache",
+        base_tree=True,
+        extra_wheel_dir=tmp_path,
+    )
+
+    embed2.share_state(embed1)
+
+    assert embed2.cache is embed1.cache
+    assert embed2.downloader.session is embed1.downloader.session
+    assert embed2._launchers is embed1._launchers
+    assert embed2.base_tree_pool is embed1.base_tree_pool
+
+    # Wheel indexes created later are shared too
+    embed1.extra_wheel_dir = tmp_path
+    assert embed2.wheel_index is embed1.wheel_index
+
+    embed3 = EmbedPython("sample", "1.2.0", cache_dir=tmp_path / "other")
+    with pytest.raises(ValueError):
+        embed3.share_state(embed1)
+
+
+def testembed_run_dedup(embedserver, wheelhouse, tmp_path):
+    def create_embed(dedup):
+        embed = EmbedPython(
+            "sample",
+            "1.2.0",
+            cache_dir=tmp_path / "cache",
+            python_version="3.10.11",
+            arch="amd64",
+            cross_build=True,
+            installer="builtin",
+            dedup=dedup,
+        )
+        embed.PYTHON_EMBED_BASEURL = embedserver
+        embed.add_wheel(
+            wheelhouse(
+                "pkga",
+                "1.0",
+                files={
+                    "pkga/__init__.py": "",
+                    "pkga/python310.dll": b"MZ",
+                    "pkga/vcruntime140.dll": b"MZVC",
+                },
+            )
+        )
+        return embed
+
+    dist_dir = tmp_path / "dist"
+    embed = create_embed(True)
+    workdir = embed.run(dist_dir, zip_dist=True)
+
+    assert workdir.joinpath("vcruntime140.dll").exists()
+    assert not workdir.joinpath(
+        "Lib", "site-packages", "pkga", "vcruntime140.dll"
+    ).exists()
+
+    # Not a runtime DLL, may be loaded from its package
+    assert workdir.joinpath("Lib", "site-packages", "pkga", "python310.dll").exists()
+
+    result = json.loads(dist_dir.joinpath("sample-1.2.0.py2win-dedup.json").read_text())
+    assert result["collapsed"] == {
+        "Lib/site-packages/pkga/vcruntime140.dll": "vcruntime140.dll"
+    }
+    assert "pkga" in result["packages"]
+    assert embed.report.to_dict()["counters"]["collapsed_bytes"] == 4
+
+    # Up-to-date
+    embed.run(dist_dir, clean=False, zip_dist=True)
+    assert all(stage["skipped"] for stage in embed.report.to_dict()["stages"])
+
+    # Removed DLLs are restored without deduplication
+    embed = create_embed(False)
+    embed.run(dist_dir, clean=False, zip_dist=True)
+    assert workdir.joinpath("Lib", "site-packages", "pkga", "python310.dll").exists()
+
+
+def testembed_run_offline(embedserver, httpdir, wheelhouse, tmp_path):
+    dirpath, _baseurl = httpdir
+
+    # Local mirror with the layout of python.org
+    mirror_dir = tmp_path / "mirror"
+    mirror_dir.joinpath("3.10.11").mkdir(parents=True)
+    shutil.copy(
+        dirpath / "python-3.10.11-embed-amd64.zip", mirror_dir.joinpath("3.10.11")
+    )
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        installer="builtin",
+        python_mirror=mirror_dir,
+        offline=True,
+    )
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+
+    workdir = embed.run(tmp_path / "dist")
+
+    assert workdir.joinpath("python.exe").exists()
+    assert workdir.joinpath("Lib", "site-packages", "pkga").exists()
+    assert embed.report.to_dict()["counters"].get("bytes_downloaded", 0) == 0
+
+
+def testembed_run_offline_missing(embedserver, tmp_path, monkeypatch):
+    def get(*args, **kwargs):
+        raise AssertionError("network access")
+
+    monkeypatch.setattr("py2win.download.requests.Session.get", get)
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        cross_build=True,
+        offline=True,
+    )
+    embed.PYTHON_EMBED_BASEURL = embedserver
+    embed.add_script("sample", "main", "sample")
+
+    with pytest.raises(IOError) as excinfo:
+        embed.run(tmp_path / "dist")
+
+    assert "python-3.10.11-embed-amd64.zip" in str(excinfo.value)
+    assert "v3.10.11/PC/python.manifest" in str(excinfo.value)
+    assert not tmp_path.joinpath("dist").exists()
+
+
+def testembed_mirrors(tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        python_mirror="https://mirror.example.com/python/",
+        get_pip_url=tmp_path / "get-pip.py",
+        index_url="https://pypi.example.com/simple",
+        offline=False,
+    )
+
+    assert embed.PYTHON_EMBED_BASEURL.format(version="3.10.11", arch="amd64") == (
+        "https://mirror.example.com/python/3.10.11/python-3.10.11-embed-amd64.zip"
+    )
+    assert embed.GET_PIP_URL.startswith("file://")
+    assert embed._pip_index_args() == [
+        "--index-url",
+        "https://pypi.example.com/simple",
+    ]
+
+
+def testembed_run_base_tree(embedserver, wheelhouse, tmp_path):
+    def create_embed():
+        embed = EmbedPython(
+            "sample",
+            "1.2.0",
+            cache_dir=tmp_path / "cache",
+            python_version="3.10.11",
+            arch="amd64",
+            cross_build=True,
+            installer="builtin",
+            base_tree=True,
+        )
+        embed.PYTHON_EMBED_BASEURL = embedserver
+        embed.add_wheel(wheelhouse("pkga", "1.0"))
+        return embed
+
+    workdir1 = create_embed().run(tmp_path / "dist1")
+
+    # Second distribution is cloned from the base tree
+    embed = create_embed()
+    embed._download_python_embedded = lambda workdir: pytest.fail("downloaded")
+    workdir2 = embed.run(tmp_path / "dist2")
+
+    assert workdir2.joinpath("python.exe").exists()
+    assert workdir2.joinpath("Lib", "os.pyc").exists()
+    assert workdir2.joinpath("Lib", "site-packages", "pkga").exists()
+    assert not workdir2.joinpath("python310._pth").exists()
+    assert workdir1.joinpath("Lib", "site-packages", "pkga").exists()
+
+
+def testembed_reset_site_packages_base_tree(tmp_path):
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+        base_tree=True,
+    )
+
+    def build(dirpath):
+        dirpath.joinpath("Lib", "site-packages", "pip").mkdir(parents=True)
+        dirpath.joinpath("Lib", "site-packages", "pip", "__init__.py").touch()
+
+    embed.base_tree_pool.create(embed._base_tree_key(), build)
+
+    workdir = tmp_path / "sample-1.2.0"
+    workdir.joinpath("Lib", "site-packages", "pkga").mkdir(parents=True)
+    workdir.joinpath("Lib", "site-packages.zip").touch()
+
+    embed._reset_site_packages(workdir)
+
+    # pip of the base tree is restored, since it is not installed again
+    site_packages = workdir.joinpath("Lib", "site-packages")
+    assert site_packages.joinpath("pip", "__init__.py").exists()
+    assert not site_packages.joinpath("pkga").exists()
+    assert not workdir.joinpath("Lib", "site-packages.zip").exists()
+
+
+def testembed_find_links(wheelhouse, tmp_path):
+    wheelhouse("pkgb", "1.0")
+    wheelhouse("pkgb", "1.0", tag="cp310-cp310-manylinux1_x86_64")
+    wheelhouse("pkgc", "1.0", tag="cp310-cp310-win_amd64")
+    wheelhouse("unrelated", "1.0")
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        extra_wheel_dir=wheelhouse.dirpath,
+        cache_dir=tmp_path / "cache",
+        python_version="3.10.11",
+        arch="amd64",
+    )
+    embed.add_wheel(wheelhouse("pkga", "1.0", requires=["pkgb"]))
+    embed.add_requirement("pkgc")
+
+    with embed._find_links(embed._project_requirements()) as find_links:
+        filenames = sorted(filepath.name for filepath in find_links.iterdir())
+
+    assert filenames == [
+        "pkgb-1.0-py3-none-any.whl",
+        "pkgc-1.0-cp310-cp310-win_amd64.whl",
+    ]
+    assert not find_links.exists()
+    assert embed.cache.root.joinpath("wheel-indexes").exists()
+
+
+def testembed_build_sdists(wheelhouse, tmp_path, monkeypatch):
+    pytest.importorskip("setuptools")
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+    monkeypatch.setenv("PIP_FIND_LINKS", str(index_dir))
+    monkeypatch.setenv("PIP_NO_BUILD_ISOLATION", "0")
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        wheel_cache_dir=tmp_path / "wheels",
+        python_version="3.10.11",
+        arch="amd64",
+    )
+    embed.add_wheel(wheelhouse("pkga", "1.0"))
+    sdist_filepath = create_sdist(index_dir, "pkgs", "1.0")
+    embed.add_requirement("pkgs==1.0")
+
+    (filepath,) = embed._build_sdists(Path(sys.executable))
+    assert filepath.name == "pkgs-1.0-py3-none-any.whl"
+    assert filepath.is_relative_to(tmp_path / "wheels")
+
+    # Built once, then reused without downloading the packages again
+    sdist_filepath.unlink()
+    assert embed._build_sdists(Path(sys.executable)) == [filepath]
+    assert embed.report.counters["wheels_built"] == 1
+    assert embed.report.counters["wheel_cache_hits"] == 1
+
+    with embed._find_links(embed.requirements, [filepath]) as find_links:
+        assert [path.name for path in find_links.iterdir()] == [filepath.name]
+
+
+def testembed_build_sdists_new_release(tmp_path, monkeypatch):
+    pytest.importorskip("setuptools")
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+    monkeypatch.setenv("PIP_FIND_LINKS", str(index_dir))
+    monkeypatch.setenv("PIP_NO_BUILD_ISOLATION", "0")
+
+    embed = EmbedPython(
+        "sample",
+        "1.2.0",
+        cache_dir=tmp_path / "cache",
+        wheel_cache_dir=tmp_path / "wheels",
+        python_version="3.10.11",
+        arch="amd64",
+    )
+    embed.add_requirement("pkgs>=1.0")
+
+    create_sdist(index_dir, "pkgs", "1.0")
+    (filepath,) = embed._build_sdists(Path(sys.executable))
+    assert filepath.name == "pkgs-1.0-py3-none-any.whl"
+
+    # Not pinned, the new release is resolved and built
+    create_sdist(index_dir, "pkgs", "1.1")
+    (filepath,) = embed._build_sdists(Path(sys.executable))
+    assert filepath.name == "pkgs-1.1-py3-none-any.whl"
+    assert embed.report.counters["wheels_built"] == 2
+
+    # pip installs the cached wheel, not a newer source distribution
+    with embed._pin_wheels([filepath]) as args:
+        assert args[0] == "--constraint"
+        assert Path(args[1]).read_text() == "pkgs==1.1\n"
@@ -0,0 +1,90 @@
+""""""
+
+# Standard library modules.
+import zipfile
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.installer import WheelInstaller, normalize_name
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def installer(tmp_path):
+    return WheelInstaller(tmp_path / "dist", max_workers=4)
+
+
+def testnormalize_name():
+    assert normalize_name("Foo_Bar.baz") == "foo-bar-baz"
+
+
+def testinstall_wheel(installer, wheelhouse):
+    filepath = wheelhouse(
+        "pkga",
+        "1.0",
+        files={
+            "pkga/__init__.py": "",
+            "pkga-1.0.data/scripts/tool.py": "print('tool')",
+            "pkga-1.0.data/data/share/pkga.txt": "data",
+            "pkga-1.0.data/platlib/_pkga.pyd": b"MZ",
+        },
+    )
+
+    distinfo_dir = installer.install_wheel(filepath)
+
+    workdir = installer.workdir
+    assert workdir.joinpath("Lib", "site-packages", "pkga", "__init__.py").exists()
+    assert workdir.joinpath("Lib", "site-packages", "_pkga.pyd").exists()
+    assert workdir.joinpath("Scripts", "tool.py").exists()
+    assert workdir.joinpath("share", "pkga.txt").exists()
+
+    assert distinfo_dir.joinpath("INSTALLER").read_text() == "py2win\n"
+    record = distinfo_dir.joinpath("RECORD").read_text()
+    assert "pkga/__init__.py,sha256=" in record
+    assert "../../Scripts/tool.py,sha256=" in record
+    assert "pkga-1.0.dist-info/RECORD,," in record
+
+
+def testinstall_wheel_upgrade(installer, wheelhouse):
+    installer.install_wheel(
+        wheelhouse("pkga", "1.0", files={"pkga/__init__.py": "", "pkga/old.py": ""})
+    )
+    installer.install_wheel(
+        wheelhouse("pkga", "2.0", files={"pkga/__init__.py": "", "pkga/new.py": ""})
+    )
+
+    site_packages = installer.site_packages
+    assert not site_packages.joinpath("pkga", "old.py").exists()
+    assert site_packages.joinpath("pkga", "new.py").exists()
+    assert not site_packages.joinpath("pkga-1.0.dist-info").exists()
+    assert site_packages.joinpath("pkga-2.0.dist-info").exists()
+
+
+def testinstall_wheel_hash_mismatch(installer, tmp_path):
+    filepath = tmp_path / "pkga-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(filepath, "w") as zf:
+        zf.writestr("pkga/__init__.py", "")
+        zf.writestr("pkga-1.0.dist-info/RECORD", "pkga/__init__.py,sha256=abc,0\n")
+
+    with pytest.raises(IOError):
+        installer.install_wheel(filepath)
+
+
+def testinstall(installer, wheelhouse):
+    filepaths = [wheelhouse("pkg{}".format(i), "1.0") for i in range(20)]
+
+    distinfo_dirs = installer.install(filepaths)
+
+    assert len(distinfo_dirs) == 20
+    for i in range(20):
+        assert installer.site_packages.joinpath("pkg{}".format(i)).exists()
+
+
+def testinstall_duplicate(installer, wheelhouse):
+    filepaths = [wheelhouse("pkga", "1.0"), wheelhouse("pkga", "2.0")]
+
+    with pytest.raises(ValueError):
+        installer.install(filepaths)
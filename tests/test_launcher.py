@@ -0,0 +1,172 @@
+""""""
+
+# Standard library modules.
+import os
+import shutil
+import subprocess
+import sys
+import sysconfig
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.launcher import (
+    stamp_launcher,
+    read_stamp,
+    get_launcher_key,
+    get_launcher_code,
+    get_entry_point_code,
+    compile_launchers,
+    _launcher_libraries,
+)
+from py2win.target import Target
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def launcher_filepath(tmp_path):
+    filepath = tmp_path / "launcher.exe"
+    filepath.write_bytes(b"MZ" + bytes(range(256)) * 10)
+    return filepath
+
+
+def testget_launcher_key():
+    target = Target("3.10.11", "amd64")
+    assert get_launcher_key(target, True) != get_launcher_key(target, False)
+    assert get_launcher_key(target) != get_launcher_key(Target("3.10.11", "win32"))
+    assert get_launcher_key(target) != get_launcher_key(target, variant="pyconfig")
+
+
+def testget_entry_point_code():
+    code = get_entry_point_code("sample.gui", "main", console=False)
+    assert code == "import sample.gui; sample.gui.main()"
+
+    code = get_entry_point_code("sample.console", "main", console=True)
+    assert code.startswith("import sys; sys.argv[0] = sys.executable;")
+
+
+def teststamp_launcher(launcher_filepath, tmp_path):
+    filepath = tmp_path / "sample-console.exe"
+    stamp_launcher(launcher_filepath, filepath, "sämple.console", "main")
+
+    assert filepath.read_bytes().startswith(launcher_filepath.read_bytes())
+
+    values = read_stamp(filepath)
+    assert values["module"] == "sämple.console"
+    assert values["method"] == "main"
+    assert values["code"].endswith("sämple.console.main()")
+
+
+def testread_stamp_not_stamped(launcher_filepath):
+    assert read_stamp(launcher_filepath) is None
+
+
+def teststamp_launcher_invalid(launcher_filepath, tmp_path):
+    with pytest.raises(ValueError):
+        stamp_launcher(launcher_filepath, tmp_path / "a.exe", "sample\0", "main")
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32" or shutil.which("cc") is None, reason="Requires cc"
+)
+def testcompile_launchers(tmp_path, monkeypatch):
+    # The generic launchers only compile on Windows, compile portable code
+    monkeypatch.setattr(
+        "py2win.launcher.get_launcher_code",
+        lambda console, variant: "int main(void) {{ return {0}; }}\n".format(
+            int(console)
+        ),
+    )
+    cwd = os.getcwd()
+
+    filepaths = compile_launchers(
+        tmp_path, [("launcher-console", True), ("launcher-gui", False)]
+    )
+
+    assert os.getcwd() == cwd
+    assert sorted(filepaths) == ["launcher-console", "launcher-gui"]
+    for filepath in filepaths.values():
+        assert filepath.parent == tmp_path.resolve()
+        assert os.access(filepath, os.X_OK)
+
+
+def testlauncher_libraries(monkeypatch):
+    monkeypatch.setattr("py2win.launcher.sys.platform", "win32")
+    assert _launcher_libraries(True) == []
+    assert _launcher_libraries(False) == ["user32"]
+
+
+@pytest.mark.skipif(sys.platform != "win32", reason="Requires Windows")
+@pytest.mark.parametrize("variant", ["py_main", "pyconfig"])
+def testcompile_launchers_windows(tmp_path, variant):
+    filepaths = compile_launchers(
+        tmp_path,
+        [("launcher-console", True), ("launcher-gui", False)],
+        variant=variant,
+    )
+
+    assert sorted(filepaths) == ["launcher-console", "launcher-gui"]
+    for filepath in filepaths.values():
+        assert filepath.exists()
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux")
+    or shutil.which("gcc") is None
+    or not sysconfig.get_config_var("Py_ENABLE_SHARED"),
+    reason="Requires gcc and a shared libpython on Linux",
+)
+@pytest.mark.parametrize("import_site", [True, False])
+@pytest.mark.parametrize("console", [True, False])
+def testpyconfig_launcher(tmp_path, import_site, console):
+    c_filepath = tmp_path / "launcher.c"
+    c_filepath.write_text(get_launcher_code(console, "pyconfig"))
+
+    libdir = sysconfig.get_config_var("LIBDIR")
+    launcher_filepath = tmp_path / "launcher"
+    args = [
+        "gcc",
+        "-o",
+        str(launcher_filepath),
+        str(c_filepath),
+        "-I" + sysconfig.get_path("include"),
+        "-L" + libdir,
+        "-Wl,-rpath," + libdir,
+        "-lpython{}".format(sysconfig.get_config_var("VERSION")),
+    ]
+    subprocess.run(args, check=True)
+
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    bindir.joinpath("sample.py").write_text(
+        "import sys\n"
+        "def main():\n"
+        "    print(repr(sys.argv), 'site' in sys.modules, sys.flags.isolated)\n"
+        "    return 3\n"
+    )
+
+    # Standard library of the running interpreter, entry point next to the
+    # executable
+    stdlib = sysconfig.get_path("stdlib")
+    search_paths = [".", stdlib, os.path.join(stdlib, "lib-dynload")]
+    filepath = bindir / "sample"
+    stamp_launcher(
+        launcher_filepath,
+        filepath,
+        "sample",
+        "main",
+        console,
+        search_paths,
+        import_site,
+    )
+    os.chmod(filepath, 0o755)
+
+    process = subprocess.run(
+        [str(filepath), "--hello", "wörld"], stdout=subprocess.PIPE, text=True
+    )
+
+    assert process.returncode == 3
+    argv = repr([str(filepath), "--hello", "wörld"])
+    assert process.stdout.strip() == "{} {} 1".format(argv, import_site)
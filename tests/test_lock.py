@@ -0,0 +1,65 @@
+""""""
+
+# Standard library modules.
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.lock import LockFile, LockedWheel
+from py2win.target import Target
+
+# Globals and constants variables.
+TARGET = Target("3.10.11", "amd64")
+
+
+@pytest.fixture
+def lock(wheelhouse, monkeypatch):
+    monkeypatch.setenv("PIP_NO_INDEX", "1")
+
+    wheelhouse("pkgb", "1.0")
+    wheelhouse("pkgb", "2.0", tag="cp310-cp310-manylinux1_x86_64")
+    wheelhouse("pkgc", "1.0", tag="cp310-cp310-win_amd64")
+    filepath = wheelhouse("pkga", "1.0", requires=["pkgb"])
+
+    return LockFile.resolve(TARGET, [filepath], ["pkgc"], wheelhouse.dirpath)
+
+
+def testresolve(lock):
+    wheels = lock.get_wheels(TARGET)
+
+    assert [(wheel.name, wheel.version) for wheel in wheels] == [
+        ("pkgb", "1.0"),
+        ("pkgc", "1.0"),
+    ]
+    assert wheels[1].filename == "pkgc-1.0-cp310-cp310-win_amd64.whl"
+    assert len(wheels[1].sha256) == 64
+    assert wheels[1].local_filepath.exists()
+    assert lock.requirements == ["pkgc"]
+
+
+def testget_wheels_unknown_target(lock):
+    with pytest.raises(ValueError):
+        lock.get_wheels(Target("3.10.11", "win32"))
+
+
+def testread_write(lock, tmp_path):
+    filepath = tmp_path / "py2win.lock"
+    lock.write(filepath)
+
+    other = LockFile.read(filepath)
+
+    assert other.requirements == lock.requirements
+    assert other.targets == lock.targets
+    assert isinstance(other.get_wheels(TARGET)[0], LockedWheel)
+
+
+def testupdate(lock):
+    other = LockFile(["pkgc"], {"3.11.4-win32": []})
+    lock.update(other)
+
+    assert lock.get_wheels(Target("3.11.4", "win32")) == []
+    assert len(lock.get_wheels(TARGET)) == 2
+
+    with pytest.raises(ValueError):
+        lock.update(LockFile(["pkgd"]))
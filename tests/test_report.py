@@ -0,0 +1,128 @@
+""""""
+
+# Standard library modules.
+import json
+import time
+import threading
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.report import BuildReport, scan_tree
+from py2win.target import Target
+
+# Globals and constants variables.
+TARGET = Target("3.10.11", "amd64")
+
+
+def testscan_tree(tmp_path):
+    tmp_path.joinpath("a", "b").mkdir(parents=True)
+    tmp_path.joinpath("a", "b", "c.txt").write_bytes(b"abc")
+    tmp_path.joinpath("d.txt").write_bytes(b"de")
+
+    assert scan_tree(tmp_path) == (2, 5)
+    assert scan_tree(tmp_path / "missing") == (0, 0)
+
+
+def testbuild_report(tmp_path):
+    events = []
+    report = BuildReport()
+    report.add_hook(lambda event, data: events.append((event, data)))
+
+    report.increment("cache_hits")
+    with report.stage("python", TARGET, tmp_path):
+        report.increment("bytes_downloaded", 10)
+        tmp_path.joinpath("python.exe").write_bytes(b"MZ")
+    report.skip("packages", TARGET)
+    report.add_target(TARGET, tmp_path)
+    report.finish()
+
+    data = report.to_dict()
+    assert data["counters"] == {"cache_hits": 1, "bytes_downloaded": 10}
+    assert data["wall_time"] >= 0.0
+
+    python, packages = data["stages"]
+    assert python["name"] == "python"
+    assert python["target"] == "3.10.11-amd64"
+    assert python["counters"] == {"bytes_downloaded": 10}
+    assert python["files_written"] == 1
+    assert python["bytes_written"] == 2
+    assert python["wall_time"] >= 0.0
+    assert packages["skipped"]
+
+    assert data["targets"]["3.10.11-amd64"]["tree_files"] == 1
+    assert [event for event, _data in events] == ["stage", "stage", "build"]
+
+    filepath = tmp_path / "report.json"
+    report.write(filepath)
+    assert json.loads(filepath.read_text())["stages"][0]["name"] == "python"
+
+
+def testbuild_report_stage_error():
+    report = BuildReport()
+    report.add_hook(lambda event, data: 1 / 0)  # Hooks must not fail the build
+
+    with pytest.raises(ValueError):
+        with report.stage("python"):
+            raise ValueError
+
+    assert report.to_dict()["stages"][0]["name"] == "python"
+
+
+def testbuild_report_bind():
+    report = BuildReport()
+
+    with report.stage("python", TARGET):
+        func = report.bind(lambda: report.increment("bytes_downloaded", 10))
+        thread = threading.Thread(target=func)
+        thread.start()
+        thread.join()
+
+    assert report.to_dict()["stages"][0]["counters"] == {"bytes_downloaded": 10}
+
+
+def testbuild_report_cpu_time():
+    report = BuildReport()
+
+    def spin(duration):
+        start = time.thread_time()
+        while time.thread_time() - start < duration:
+            pass
+
+    def run_stage(name, duration):
+        with report.stage(name):
+            thread = threading.Thread(target=report.bind(spin), args=(duration,))
+            thread.start()
+            thread.join()
+
+    # The CPU time of concurrent stages is not counted twice
+    threads = [
+        threading.Thread(target=run_stage, args=("python", 0.2)),
+        threading.Thread(target=run_stage, args=("packages", 0.02)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stages = {stage["name"]: stage for stage in report.to_dict()["stages"]}
+    assert stages["python"]["cpu_time"] >= 0.2
+    assert 0.02 <= stages["packages"]["cpu_time"] < 0.2
+    assert stages["packages"]["child_cpu_time"] >= 0.0
+
+
+def testbuild_report_schedule():
+    report = BuildReport()
+    start = report._start
+
+    trace = [
+        {"name": "python", "thread": "t1", "start": start + 1.0, "end": start + 2.0}
+    ]
+    report.add_schedule(trace, TARGET)
+
+    (entry,) = report.to_dict()["schedule"]
+    assert entry["name"] == "python"
+    assert entry["target"] == "3.10.11-amd64"
+    assert entry["start"] == pytest.approx(1.0)
+    assert entry["end"] == pytest.approx(2.0)
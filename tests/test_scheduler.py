@@ -0,0 +1,98 @@
+""""""
+
+# Standard library modules.
+import threading
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.scheduler import (
+    Scheduler,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_CANCELLED,
+)
+
+# Globals and constants variables.
+
+
+def testscheduler():
+    calls = []
+    scheduler = Scheduler()
+    scheduler.add("c", lambda: calls.append("c") or 3, ["a", "b"])
+    scheduler.add("a", lambda: calls.append("a") or 1)
+    scheduler.add("b", lambda: calls.append("b") or 2, ["a"])
+
+    results = scheduler.run()
+
+    assert results == {"a": 1, "b": 2, "c": 3}
+    assert calls == ["a", "b", "c"]
+    assert [entry["status"] for entry in scheduler.trace] == [STATUS_DONE] * 3
+    assert all(entry["end"] >= entry["start"] for entry in scheduler.trace)
+
+
+def testscheduler_concurrent():
+    # Both tasks must run at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5.0)
+    scheduler = Scheduler(max_workers=2)
+    scheduler.add("a", barrier.wait)
+    scheduler.add("b", barrier.wait)
+    scheduler.add("c", lambda: None, ["a", "b"])
+
+    scheduler.run()
+
+    a, b, c = sorted(scheduler.trace, key=lambda entry: entry["name"])
+    assert a["start"] < b["end"] and b["start"] < a["end"]
+    assert c["start"] >= max(a["end"], b["end"])
+
+
+def testscheduler_sequential():
+    calls = []
+    scheduler = Scheduler(max_workers=1)
+    for name in "abcd":
+        scheduler.add(name, lambda name=name: calls.append(name))
+
+    scheduler.run()
+
+    assert calls == ["a", "b", "c", "d"]
+
+
+def testscheduler_error():
+    calls = []
+    scheduler = Scheduler(max_workers=1)
+    scheduler.add("a", lambda: 1 / 0)
+    scheduler.add("b", lambda: calls.append("b"), ["a"])
+    scheduler.add("c", lambda: calls.append("c"))
+
+    with pytest.raises(ZeroDivisionError):
+        scheduler.run()
+
+    # No task is started after the failure
+    assert calls == []
+    statuses = {entry["name"]: entry["status"] for entry in scheduler.trace}
+    assert statuses == {
+        "a": STATUS_FAILED,
+        "b": STATUS_CANCELLED,
+        "c": STATUS_CANCELLED,
+    }
+
+
+def testscheduler_invalid():
+    scheduler = Scheduler()
+    scheduler.add("a", lambda: None)
+    with pytest.raises(ValueError):
+        scheduler.add("a", lambda: None)
+
+    scheduler.add("b", lambda: None, ["missing"])
+    with pytest.raises(ValueError):
+        scheduler.run()
+
+    scheduler = Scheduler()
+    scheduler.add("a", lambda: None, ["b"])
+    scheduler.add("b", lambda: None, ["a"])
+    with pytest.raises(ValueError):
+        scheduler.run()
+
+    with pytest.raises(ValueError):
+        Scheduler(max_workers=0)
@@ -0,0 +1,126 @@
+""""""
+
+# Standard library modules.
+import zipfile
+import py_compile
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.shake import ModuleIndex, find_reachable_modules, shake_tree
+
+# Globals and constants variables.
+
+
+def _write_bytecode(zf, arcname, source, tmp_path):
+    filepath = tmp_path / "module.py"
+    filepath.write_text(source)
+    cfile = py_compile.compile(str(filepath), cfile=str(tmp_path / "module.pyc"))
+    with open(cfile, "rb") as fp:
+        zf.writestr(arcname, fp.read())
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    workdir = tmp_path / "dist"
+    workdir.mkdir()
+
+    # Standard library zip, as bytecode
+    with zipfile.ZipFile(workdir / "python3X.zip", "w") as zf:
+        _write_bytecode(zf, "os.pyc", "import stat\n", tmp_path)
+        _write_bytecode(zf, "stat.pyc", "", tmp_path)
+        _write_bytecode(zf, "encodings/__init__.pyc", "", tmp_path)
+        _write_bytecode(zf, "encodings/utf_8.pyc", "", tmp_path)
+        _write_bytecode(zf, "json/__init__.pyc", "from .decoder import f\n", tmp_path)
+        _write_bytecode(zf, "json/decoder.pyc", "def f(): pass\n", tmp_path)
+        _write_bytecode(zf, "tkinter/__init__.pyc", "", tmp_path)
+        _write_bytecode(zf, "this.pyc", "", tmp_path)
+
+    # Extracted standard library
+    libdir = workdir / "Lib"
+    libdir.joinpath("lib2to3", "fixes").mkdir(parents=True)
+    libdir.joinpath("lib2to3", "__init__.py").write_text("")
+    libdir.joinpath("lib2to3", "fixes", "fix_a.py").write_text("")
+    libdir.joinpath("csv.py").write_text("import re\n")
+    libdir.joinpath("re.py").write_text("")
+
+    # Site-packages
+    site_packages = libdir / "site-packages"
+    site_packages.joinpath("app").mkdir(parents=True)
+    site_packages.joinpath("app", "__init__.py").write_text("")
+    site_packages.joinpath("app", "main.py").write_text(
+        "import json\n"
+        "from . import util\n"
+        "def main():\n"
+        "    from pkga import value\n"
+    )
+    site_packages.joinpath("app", "util.py").write_text("")
+    site_packages.joinpath("pkga").mkdir()
+    site_packages.joinpath("pkga", "__init__.py").write_text("value = 1\n")
+    site_packages.joinpath("plugin.py").write_text("import csv\n")
+
+    site_packages.joinpath("pkgb").mkdir()
+    site_packages.joinpath("pkgb", "__init__.py").write_text("")
+    site_packages.joinpath("pkgb", "_ext.pyd").write_bytes(b"MZ")
+    distinfo_dir = site_packages / "pkgb-1.0.dist-info"
+    distinfo_dir.mkdir()
+    distinfo_dir.joinpath("RECORD").write_text(
+        "pkgb/__init__.py,,\npkgb/_ext.pyd,,\npkgb-1.0.dist-info/RECORD,,\n"
+    )
+
+    return workdir
+
+
+def testmodule_index(workdir):
+    index = ModuleIndex()
+    index.add_zip(workdir / "python3X.zip")
+    index.add_directory(workdir / "Lib")
+
+    assert index.modules["json"].is_package
+    assert index.modules["json.decoder"].kind == "bytecode"
+    assert index.modules["csv"].kind == "source"
+    assert "site-packages" not in index.modules
+    assert sorted(index.children("encodings")) == ["encodings.utf_8"]
+    assert index.get_code("json") is not None
+
+
+def testfind_reachable_modules(workdir):
+    index = ModuleIndex()
+    index.add_zip(workdir / "python3X.zip")
+    index.add_directory(workdir / "Lib" / "site-packages")
+
+    reachable = find_reachable_modules(index, ["app.main"])
+
+    assert {"app", "app.main", "app.util", "json", "json.decoder"} <= reachable
+    assert {"pkga", "os", "stat", "encodings.utf_8"} <= reachable
+    assert "tkinter" not in reachable
+    assert "plugin" not in reachable
+
+
+def testshake_tree(workdir):
+    removed = shake_tree(workdir, ["app.main"], hidden_imports=["plugin"])
+
+    assert set(removed) == {
+        "tkinter",
+        "this.pyc",
+        "lib2to3",
+        "pkgb",
+        "pkgb-1.0.dist-info",
+    }
+
+    with zipfile.ZipFile(workdir / "python3X.zip") as zf:
+        arcnames = zf.namelist()
+    assert "json/decoder.pyc" in arcnames
+    assert "tkinter/__init__.pyc" not in arcnames
+
+    libdir = workdir / "Lib"
+    assert libdir.joinpath("csv.py").exists()
+    assert libdir.joinpath("re.py").exists()
+    assert not libdir.joinpath("lib2to3").exists()
+
+    site_packages = libdir / "site-packages"
+    assert site_packages.joinpath("app", "util.py").exists()
+    assert site_packages.joinpath("plugin.py").exists()
+    assert not site_packages.joinpath("pkgb").exists()
+    assert not site_packages.joinpath("pkgb-1.0.dist-info").exists()
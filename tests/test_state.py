@@ -0,0 +1,46 @@
+""""""
+
+# Standard library modules.
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.state import BuildState, digest_inputs
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def state(tmp_path):
+    return BuildState(tmp_path / "state.json", tmp_path)
+
+
+def testdigest_inputs():
+    assert digest_inputs({"a": 1, "b": [1, 2]}) == digest_inputs({"b": [1, 2], "a": 1})
+    assert digest_inputs({"a": 1}) != digest_inputs({"a": 2})
+
+
+def testis_current(state, tmp_path):
+    assert not state.is_current("stage", {"a": 1})
+
+    tmp_path.joinpath("output.txt").write_text("")
+    state.update("stage", {"a": 1}, ["output.txt"])
+
+    assert state.is_current("stage", {"a": 1})
+    assert not state.is_current("stage", {"a": 2})
+
+    tmp_path.joinpath("output.txt").unlink()
+    assert not state.is_current("stage", {"a": 1})
+
+
+def testsave_load(state, tmp_path):
+    state.update("stage", {"a": 1}, ["output.txt"])
+
+    other = BuildState(tmp_path / "state.json", tmp_path)
+    assert other.digest("stage") == digest_inputs({"a": 1})
+    assert other.outputs("stage") == ["output.txt"]
+
+    other.clear()
+    assert not tmp_path.joinpath("state.json").exists()
+    assert other.digest("stage") is None
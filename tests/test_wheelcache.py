@@ -0,0 +1,110 @@
+""""""
+
+# Standard library modules.
+import shutil
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.wheelcache import WheelBuildCache, is_sdist, target_tag
+from py2win.target import Target
+from py2win.cache import sha256sum
+from conftest import create_sdist
+
+# Globals and constants variables.
+TARGET = Target("3.10.11", "amd64")
+
+
+@pytest.fixture
+def builder(wheelhouse):
+    def build(sdist_filepath, wheel_dir):
+        name, version = sdist_filepath.name[: -len(".tar.gz")].rsplit("-", 1)
+        shutil.copy(wheelhouse(name, version), wheel_dir)
+        build.built.append(sdist_filepath.name)
+
+    build.built = []
+    return build
+
+
+def testis_sdist():
+    assert is_sdist("pkga-1.0.tar.gz")
+    assert is_sdist("pkga-1.0.zip")
+    assert not is_sdist("pkga-1.0-py3-none-any.whl")
+
+
+def testtarget_tag():
+    assert target_tag(TARGET) == "cp310-cp310-win_amd64"
+    assert target_tag(Target("3.11.4", "win32")) == "cp311-cp311-win32"
+
+
+def testwheelcache_get_or_build(builder, tmp_path):
+    cache = WheelBuildCache(tmp_path / "wheels")
+    sdists = [
+        create_sdist(tmp_path, "pkga", "1.0"),
+        create_sdist(tmp_path, "pkgb", "2.0"),
+    ]
+
+    filepaths, built = cache.get_or_build(sdists, TARGET, builder, max_workers=2)
+    assert built == 2
+    assert [filepath.name for filepath in filepaths] == [
+        "pkga-1.0-py3-none-any.whl",
+        "pkgb-2.0-py3-none-any.whl",
+    ]
+    assert all(filepath.is_relative_to(cache.root) for filepath in filepaths)
+
+    # Same sources and target, nothing is built
+    filepaths2, built = cache.get_or_build(sdists, TARGET, builder)
+    assert built == 0
+    assert filepaths2 == filepaths
+
+    # Other target
+    _filepaths, built = cache.get_or_build(
+        sdists[:1], Target("3.11.4", "amd64"), builder
+    )
+    assert built == 1
+    assert sorted(builder.built) == [
+        "pkga-1.0.tar.gz",
+        "pkga-1.0.tar.gz",
+        "pkgb-2.0.tar.gz",
+    ]
+
+
+def testwheelcache_corrupted(builder, tmp_path):
+    cache = WheelBuildCache(tmp_path / "wheels")
+    sdist = create_sdist(tmp_path, "pkga", "1.0")
+
+    (filepath,), _built = cache.get_or_build([sdist], TARGET, builder)
+    filepath.write_bytes(b"corrupted")
+
+    (filepath2,), built = cache.get_or_build([sdist], TARGET, builder)
+    assert built == 1
+    assert filepath2 == filepath
+    assert filepath.read_bytes() != b"corrupted"
+
+
+def testwheelcache_build_no_wheel(tmp_path):
+    cache = WheelBuildCache(tmp_path / "wheels")
+    sdist = create_sdist(tmp_path, "pkga", "1.0")
+
+    with pytest.raises(IOError, match="Expected one wheel"):
+        cache.get_or_build([sdist], TARGET, lambda sdist_filepath, wheel_dir: None)
+
+    assert cache.get(sha256sum(sdist), TARGET) is None
+
+
+def testwheelcache_resolved(builder, tmp_path):
+    cache = WheelBuildCache(tmp_path / "wheels")
+    sdists = [
+        create_sdist(tmp_path, "pkga", "1.0"),
+        create_sdist(tmp_path, "pkgb", "2.0"),
+    ]
+
+    assert cache.get_resolved("key", TARGET) is None
+
+    filepaths, _built = cache.get_or_build(sdists, TARGET, builder)
+    cache.put_resolved("key", sdists)
+
+    assert cache.get_resolved("key", TARGET) == filepaths
+    assert cache.get_resolved("key", Target("3.11.4", "amd64")) is None
+    assert cache.get_resolved("other", TARGET) is None
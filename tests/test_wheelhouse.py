@@ -0,0 +1,111 @@
+""""""
+
+# Standard library modules.
+import os
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.target import Target
+from py2win.wheelhouse import WheelIndex, read_wheel_requires, pinned_versions
+
+# Globals and constants variables.
+TARGET = Target("3.10.11", "amd64")
+
+
+@pytest.fixture
+def index(wheelhouse, tmp_path):
+    return WheelIndex(wheelhouse.dirpath, tmp_path / "index.json")
+
+
+def _filenames(wheels):
+    return [wheel.filename for wheel in wheels]
+
+
+def testread_wheel_requires(wheelhouse):
+    filepath = wheelhouse("pkga", "1.0", requires=["pkgb>=1", "pkgc; extra == 'c'"])
+    assert read_wheel_requires(filepath) == ["pkgb>=1", "pkgc; extra == 'c'"]
+
+
+def testpinned_versions():
+    versions = pinned_versions(
+        ["Pkg_A==1.0", "pkgb>=1.0", "pkgc==1.*", "pkgd==2.0,<3", "./pkge.tar.gz"]
+    )
+    assert {name: str(version) for name, version in versions.items()} == {
+        "pkg-a": "1.0"
+    }
+
+
+def testwheelindex_update(wheelhouse, index, tmp_path):
+    filepath = wheelhouse("pkga", "1.0", tag="cp310-cp310-win_amd64")
+    wheelhouse("pkgb", "2.0")
+
+    assert index.update()
+    wheel = index.wheels[filepath.name]
+    assert wheel.name == "pkga"
+    assert wheel.version == "1.0"
+    assert wheel.tags == ["cp310-cp310-win_amd64"]
+    assert len(wheel.sha256) == 64
+
+    # Nothing changed
+    assert not index.update()
+
+    # Saved index is reused
+    index2 = WheelIndex(wheelhouse.dirpath, tmp_path / "index.json")
+    assert index2.wheels == index.wheels
+    assert not index2.update()
+
+    # Modified and removed wheels
+    wheelhouse.dirpath.joinpath("pkgb-2.0-py3-none-any.whl").unlink()
+    wheelhouse("pkga", "1.0", tag="cp310-cp310-win_amd64", requires=["pkgc"])
+    os.utime(filepath, ns=(0, 0))
+
+    assert index2.update()
+    assert sorted(index2.wheels) == [filepath.name]
+    assert index2.wheels[filepath.name].requires == ["pkgc"]
+
+
+def testwheelindex_update_invalid(wheelhouse, index):
+    wheelhouse("pkga", "1.0")
+    wheelhouse.dirpath.joinpath("broken-1.0-py3-none-any.whl").write_bytes(b"")
+
+    index.update()
+    assert sorted(index.wheels) == ["pkga-1.0-py3-none-any.whl"]
+
+
+def testwheelindex_select(wheelhouse, index):
+    wheelhouse(
+        "pkga",
+        "1.0",
+        requires=[
+            "pkgb>=1.1",
+            "pkgc; sys_platform == 'win32'",
+            "pkgd; sys_platform == 'linux'",
+            "pkge; extra == 'e'",
+        ],
+    )
+    wheelhouse("pkgb", "1.0")
+    wheelhouse("pkgb", "1.2")
+    wheelhouse("pkgc", "1.0", tag="cp310-cp310-win_amd64", requires=["pkgf"])
+    wheelhouse("pkgc", "1.0", tag="cp310-cp310-manylinux1_x86_64")
+    wheelhouse("pkgc", "1.0", tag="cp39-cp39-win_amd64")
+    wheelhouse("pkgd", "1.0")
+    wheelhouse("pkge", "1.0")
+    wheelhouse("pkgf", "1.0", tag="cp38-abi3-win_amd64")
+    wheelhouse("unrelated", "1.0")
+    index.update()
+
+    wheels = index.select(TARGET, ["pkga"])
+    assert _filenames(wheels) == [
+        "pkga-1.0-py3-none-any.whl",
+        "pkgb-1.2-py3-none-any.whl",
+        "pkgc-1.0-cp310-cp310-win_amd64.whl",
+        "pkgf-1.0-cp38-abi3-win_amd64.whl",
+    ]
+
+    wheels = index.select(TARGET, ["pkga", "PKGA[e]"])
+    assert "pkge-1.0-py3-none-any.whl" in _filenames(wheels)
+
+    # Requirements without wheel are left to pip
+    assert index.select(TARGET, ["missing", "pkgd<1"]) == []
@@ -0,0 +1,105 @@
+""""""
+
+# Standard library modules.
+import sys
+import zipfile
+import subprocess
+
+# Third party modules.
+import pytest
+
+# Local modules.
+from py2win.ziplib import repack_stdlib, is_zip_safe, zip_site_packages, write_pth
+from py2win.target import Target
+
+# Globals and constants variables.
+
+
+@pytest.fixture
+def site_packages(tmp_path):
+    site_packages = tmp_path / "site-packages"
+
+    # Pure Python package
+    site_packages.joinpath("pkga", "sub").mkdir(parents=True)
+    site_packages.joinpath("pkga", "__init__.py").write_text("from pkga.sub import f\n")
+    site_packages.joinpath("pkga", "sub", "__init__.py").write_text(
+        "def f():\n    return 'zipped'\n"
+    )
+    site_packages.joinpath("pkga-1.0.dist-info").mkdir()
+
+    # Module
+    site_packages.joinpath("moduleb.py").write_text("VALUE = 2\n")
+
+    # Native extension
+    site_packages.joinpath("pkgc").mkdir()
+    site_packages.joinpath("pkgc", "__init__.py").write_text("")
+    site_packages.joinpath("pkgc", "_ext.pyd").write_bytes(b"MZ")
+
+    # Uses __file__
+    site_packages.joinpath("pkgd").mkdir()
+    site_packages.joinpath("pkgd", "__init__.py").write_text(
+        "import os; os.path.dirname(__file__)\n"
+    )
+
+    # Namespace package
+    site_packages.joinpath("pkge").mkdir()
+    site_packages.joinpath("pkge", "module.py").write_text("")
+
+    return site_packages
+
+
+def testis_zip_safe(site_packages):
+    assert is_zip_safe(site_packages / "pkga")
+    assert is_zip_safe(site_packages / "moduleb.py")
+    assert not is_zip_safe(site_packages / "pkgc")
+    assert not is_zip_safe(site_packages / "pkgd")
+    assert not is_zip_safe(site_packages / "pkge")
+
+
+@pytest.mark.parametrize("compile_bytecode", [True, False])
+def testzip_site_packages(site_packages, tmp_path, compile_bytecode):
+    zip_filepath = tmp_path / "site-packages.zip"
+    names = zip_site_packages(site_packages, zip_filepath, compile_bytecode)
+
+    assert names == ["moduleb.py", "pkga"]
+    assert not site_packages.joinpath("pkga").exists()
+    assert site_packages.joinpath("pkga-1.0.dist-info").exists()
+    assert site_packages.joinpath("pkgc", "_ext.pyd").exists()
+
+    suffix = ".pyc" if compile_bytecode else ".py"
+    with zipfile.ZipFile(zip_filepath) as zf:
+        assert "pkga/sub/__init__" + suffix in zf.namelist()
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+
+    code = "import sys; sys.path.insert(0, sys.argv[1]); import pkga; print(pkga.f())"
+    args = [sys.executable, "-I", "-c", code, str(zip_filepath)]
+    out = subprocess.run(args, check=True, stdout=subprocess.PIPE)
+    assert out.stdout.strip() == b"zipped"
+
+
+def testrepack_stdlib(tmp_path):
+    filepath = tmp_path / "python310.zip"
+    with zipfile.ZipFile(filepath, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("os.pyc", b"os")
+        zf.writestr("lib2to3/__init__.pyc", b"lib2to3")
+
+    libdir = tmp_path / "Lib"
+    repack_stdlib(filepath, libdir, ["lib2to3"])
+
+    with zipfile.ZipFile(filepath) as zf:
+        assert zf.namelist() == ["os.pyc"]
+        assert zf.getinfo("os.pyc").compress_type == zipfile.ZIP_STORED
+    assert libdir.joinpath("lib2to3", "__init__.pyc").exists()
+
+
+def testwrite_pth(tmp_path):
+    target = Target("3.10.11", "amd64")
+    filepath = write_pth(tmp_path, target, ["python310.zip", ".", "Lib/site-packages"])
+
+    assert filepath.name == "python310._pth"
+    assert filepath.read_text().splitlines() == [
+        "python310.zip",
+        ".",
+        "Lib\\site-packages",
+        "import site",
+    ]